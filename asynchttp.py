@@ -0,0 +1,50 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Minimal HTTP client for the asyncio runtime.
+#
+# requests blocks until the whole transfer is done, which freezes everything
+# else on the Pico. This reads the body a chunk at a time, so other tasks keep
+# running while a download is in progress. The connections are httppool's,
+# kept open between requests and shared with the blocking fetches. Each wait
+# for the server (the connect, the headers, each read of the body) times out
+# after timeout_ms, so a stalled server can't hold up the task waiting on it
+# for good.
+
+TIMEOUT_MS = 15000
+
+class Response:
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    # Up to n bytes of the body, b"" at the end
+    async def read(self, n: int) -> bytes:
+        return await self.response.raw.aread(n)
+
+    async def text(self) -> str:
+        return (await self.response.raw.aread()).decode()
+
+    async def close(self) -> None:
+        self.response.close()
+
+# Splits a URL into (ssl, host, port, path)
+def split_url(url: str) -> tuple:
+    scheme, _, rest = url.partition("://")
+    if scheme not in ("http", "https"):
+        raise ValueError(f"unsupported url {url}")
+    host, slash, path = rest.partition("/")
+    path = slash + path if slash else "/"
+    use_ssl = scheme == "https"
+    port = 443 if use_ssl else 80
+    if ":" in host:
+        host, port_str = host.split(":", 1)
+        port = int(port_str)
+    return use_ssl, host, port, path
+
+# Sends a GET and returns once the status and headers have arrived
+async def get(url: str, headers: dict = None, timeout_ms: int = TIMEOUT_MS) -> Response:
+    # here, as httppool imports this module for split_url
+    import httppool
+    return Response(await httppool.aget(url, headers, timeout_ms))
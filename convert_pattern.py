@@ -0,0 +1,52 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Host tool: converts text patterns to the binary pattern format.
+#
+#   python convert_pattern.py ledpatternC1.txt ledpatternC2.txt ...
+#
+# Each input is written next to itself with a .led extension.
+
+import argparse
+import os
+import time
+
+import patternbin
+from patternparser import PatternParser
+
+def convert(path: str, rle: bool, default_ms: int) -> str:
+    with open(path, "rb") as f:
+        text = f.read()
+
+    start = time.perf_counter()
+    parser = PatternParser()
+    parser.feed(text)
+    frames = parser.finish()
+    parse_time = time.perf_counter() - start
+
+    data = patternbin.dump(frames, rle = rle, default_ms = default_ms)
+
+    start = time.perf_counter()
+    patternbin.load(data)
+    load_time = time.perf_counter() - start
+
+    out_path = os.path.splitext(path)[0] + ".led"
+    with open(out_path, "wb") as f:
+        f.write(data)
+
+    print(f"{path}: {len(frames)} frames, {len(text)} -> {len(data)} bytes, "
+          f"parse {parse_time * 1000:.3f} ms -> load {load_time * 1000:.3f} ms, wrote {out_path}")
+    return out_path
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Convert text LED patterns to the binary format")
+    parser.add_argument("paths", nargs = "+", help = "text pattern files")
+    parser.add_argument("--no-rle", action = "store_true", help = "store repeated frames individually")
+    parser.add_argument("--default-ms", type = int, default = 0, help = "default frame time, 0 for the player's")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        convert(path, not args.no_rle, args.default_ms)
+
+if __name__ == "__main__":
+    main()
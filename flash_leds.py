@@ -3,12 +3,32 @@
 # version 20230602
 
 import machine
-from time import sleep_ms
-import requests
-import json
-
-# Requires Python 3.12
-# type LEDArray = list[list[list[bool]]]
+import network
+from time import sleep_ms, ticks_ms, ticks_diff
+import httppool
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import asynchttp
+from ledframes import PatternFrames
+from ledgpio import CubeOutput
+from ledrefresh import RefreshEngine
+from patternparser import PatternParser
+import patternbin
+import patterncache
+import timeservice
+from framescheduler import FrameScheduler, DROP
+import metrics
+import framegc
+import patternregistry
+from livestream import LiveReceiver
+from fleetsync import FleetMember, Timeline
+try:
+    # registers the built-in demo patterns
+    import pico_pattern_demo
+except ImportError:
+    pass
 
 #layers
 LAYER = [9,8,7,6]
@@ -19,311 +39,580 @@ GRID_3D = [[17, 16, 0, 1],
            [21, 20, 4, 5],
            [26, 22, 28, 27]]
 
+PATTERN_URL = "https://raw.githubusercontent.com/oshah81/PicoExperiments/main/ledpattern{}.txt"
+TIME_URL = "https://pi.hole/tpbulb/timestr.flask"
+
+# Shown when there's neither a download nor a cached copy
+FALLBACK_PATTERN = """1111 1111 1111 1111  1111 1111 1111 1111  1111 1111 1111 1111
+1111 1111 1111 1111  1111 1111 1111 1111  1111 1111 1111 1111  """
+
+# Bytes read from the network per parser step
+CHUNK_SIZE = 256
+
+# Name of a registered pattern to play instead of the download, e.g. "demo"
+# or "pattern_6", or None for the download
+PATTERN = None
+
+FRAME_MS = 250
+
+# Port to accept live frames on (see livestream), None for no live mode.
+# While frames keep coming they replace the pattern.
+LIVE_PORT = None
+# How often the stream is checked while it's live
+LIVE_POLL_MS = 2
+
+# Port to listen for a fleet coordinator on (see fleetsync), None to play
+# independently. In a fleet, patterns come from the coordinator and frames
+# follow the shared clock.
+FLEET_PORT = None
+# How long to wait for the fleet's pattern before downloading it instead
+FLEET_WAIT_MS = 3000
+# Longest sleep between fleet checks
+FLEET_POLL_MS = 50
+# what to do with frames whose time has already passed, see framescheduler
+FRAME_POLICY = DROP
+
+# asyncio runtime timings
+CYCLE_MS = 3_600_000
+PATTERN_REFRESH_MS = 600_000
+NIGHT_RETRY_MS = 60_000
+
+# Pin table and layer masks, built once by init_layers
+_output: CubeOutput = None
+# Timer that multiplexes the layers from a frame buffer
+_refresh: RefreshEngine = None
+# Live frame socket, kept from one cycle to the next. A changed script is
+# run over this one (see program.supervise), so the old socket is closed
+# first to free the port for the new one.
+if globals().get("_live") is not None:
+    _live.close()
+_live: LiveReceiver = None
+# Fleet socket and shared clock, kept and replaced likewise
+if globals().get("_fleet") is not None:
+    _fleet.close()
+_fleet: FleetMember = None
+# Parsed patterns by URL, kept while the script stays loaded
+_patterns: dict = {}
+
 # Main program
 def innerprogram(COLOUR :str, endFlagger) -> None:
 
     # Main program
     init_layers()
     clear_leds()
-
-    led_pattern = get_led_pattern(COLOUR)
-    if not is_night_time(COLOUR):
-        prog_loop(led_pattern, endFlagger)
+    start_fleet(COLOUR)
+
+    led_pattern = patternregistry.get(PATTERN) if PATTERN else None
+    if led_pattern is None:
+        led_pattern = fleet_pattern(FLEET_WAIT_MS)
+    if led_pattern is None:
+        led_pattern = get_led_pattern(COLOUR)
+    night = is_night_time(COLOUR)
+    # nothing is fetched again this cycle; the TLS sessions are kept for the
+    # next one
+    httppool.close()
+    if not night:
+        # run for an hour, or until night starts
+        prog_loop(led_pattern, endFlagger, min(3_600_000, timeservice.ms_until_change(COLOUR)))
         clear_leds()
     else:
-        night_wait(2000, 1_800_000, endFlagger)
+        night_wait(2000, timeservice.ms_until_change(COLOUR), endFlagger)
     return
 
+# What the asyncio tasks share. The network tasks replace pattern and night,
+# and the render task picks the change up at its next frame. pattern is
+# anything patternregistry.frames plays.
+class _Runtime:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.night = False
+        self.live = False
+
+# asyncio version of innerprogram. Rendering, the pattern refresh and the
+# day/night check run as separate tasks, so a slow download never holds up
+# a frame. Returns after an hour, or when endFlagger says so.
+async def ainnerprogram(COLOUR: str, endFlagger) -> None:
+    init_layers()
+    clear_leds()
+    start_fleet(COLOUR)
+
+    # start on whatever we already have; the refresh task fetches the rest
+    chosen = patternregistry.get(PATTERN) if PATTERN else None
+    runtime = _Runtime(chosen or _cached_pattern(PATTERN_URL.format(COLOUR)))
+    tasks = [
+        asyncio.create_task(render_task(runtime, endFlagger)),
+        asyncio.create_task(night_task(runtime, COLOUR)),
+    ]
+    if chosen is None:
+        tasks.append(asyncio.create_task(pattern_task(runtime, COLOUR)))
+    if _live is not None:
+        tasks.append(asyncio.create_task(live_task(runtime)))
+    if _fleet is not None:
+        tasks.append(asyncio.create_task(fleet_task(runtime)))
+    # timed against the clock, as each sleep wakes late by however long the
+    # other tasks ran
+    start = ticks_ms()
+    try:
+        while ticks_diff(ticks_ms(), start) < CYCLE_MS:
+            if endFlagger():
+                break
+            httppool.prune()
+            await asyncio.sleep(0.1)
+    finally:
+        for task in tasks:
+            task.cancel()
+        _refresh.stop()
+        clear_leds()
+
+async def render_task(runtime: _Runtime, endFlagger) -> None:
+    schedule = None
+    while not endFlagger():
+        pattern = runtime.pattern
+        if runtime.live:
+            # live_task shows the frames
+            _refresh.start()
+            schedule = None
+            await asyncio.sleep(0.05)
+            continue
+        if pattern is None or runtime.night:
+            _refresh.stop()
+            schedule = None
+            await asyncio.sleep(1)
+            continue
+
+        _refresh.start()
+        if _fleet is not None and _fleet.synced() and isinstance(pattern, PatternFrames):
+            await fleet_render(runtime, pattern, endFlagger)
+            schedule = None
+            continue
+        if schedule is None:
+            schedule = FrameScheduler(FRAME_POLICY)
+        # as in prog_loop, nothing per frame allocates for a table, and
+        # garbage is collected while waiting for the next deadline
+        cursor = patternregistry.FrameCursor(pattern, FRAME_MS)
+        while runtime.pattern is pattern and not (runtime.night or runtime.live or endFlagger()):
+            if _fleet is not None and _fleet.synced() and cursor.table:
+                break
+            if not cursor.next():
+                # an empty pattern mustn't keep the other tasks from running
+                await asyncio.sleep(FRAME_MS / 1000)
+                continue
+            if schedule.advance(cursor.ms):
+                metrics.count("dropped_frames")
+                continue
+            light_up_leds(cursor.frame)
+            metrics.frame(schedule.jitter_ms)
+            framegc.idle(schedule.remaining_ms())
+            await asyncio.sleep(schedule.remaining_ms() / 1000)
+
+# Shows live frames as they arrive, taking over from render_task until the
+# stream stops
+async def live_task(runtime: _Runtime) -> None:
+    while True:
+        if _live.poll():
+            if not runtime.live:
+                print("live stream started")
+                runtime.live = True
+            light_up_leds(_live.frame)
+        elif runtime.live and not _live.active():
+            print("live stream stopped")
+            runtime.live = False
+            _live.reset()
+        await asyncio.sleep(LIVE_POLL_MS / 1000)
+
+# render_task while in a fleet: frames are picked by their place on the
+# shared clock
+async def fleet_render(runtime: _Runtime, pattern: PatternFrames, endFlagger) -> None:
+    timeline = Timeline(pattern, FRAME_MS)
+    while runtime.pattern is pattern and not (runtime.night or runtime.live or endFlagger()):
+        if not _fleet.synced():
+            return
+        index, left = timeline.at(_fleet.now())
+        light_up_leds(pattern[index])
+        await asyncio.sleep(min(left, FLEET_POLL_MS) / 1000)
+
+# Picks up each new pattern the coordinator sends
+async def fleet_task(runtime: _Runtime) -> None:
+    while True:
+        _fleet.poll()
+        pattern = _fleet.current()
+        if pattern is not None and runtime.pattern is not pattern:
+            runtime.pattern = pattern
+        await asyncio.sleep(FLEET_POLL_MS / 1000)
+
+async def pattern_task(runtime: _Runtime, colour: str) -> None:
+    while True:
+        # straight after boot Wi-Fi may still be coming up; play what's on
+        # flash meanwhile, or the fallback if there's nothing
+        if not _online():
+            if runtime.pattern is None:
+                runtime.pattern = _pattern_obtained(PATTERN_URL.format(colour), None)
+            await asyncio.sleep(1)
+            continue
+        # the fleet's copy saves a download
+        if _fleet is None or _fleet.current() is None:
+            runtime.pattern = await fetch_led_pattern(colour)
+        await asyncio.sleep(PATTERN_REFRESH_MS / 1000)
+
+# Sleeps until the next switch between day and night, waking early only to
+# resync the clock
+async def night_task(runtime: _Runtime, colour: str) -> None:
+    while True:
+        # the clock can't be set until Wi-Fi is up, and trying would hold up
+        # the first frames
+        if timeservice.needs_sync() and not _online():
+            await asyncio.sleep(1)
+            continue
+        wait = NIGHT_RETRY_MS
+        try:
+            await timeservice.async_ensure_synced(TIME_URL)
+            runtime.night = report_night(colour)
+            wait = min(timeservice.ms_until_change(colour), timeservice.RESYNC_MS)
+        except Exception as e:
+            print(f"time check failed: {e}")
+        await asyncio.sleep(wait / 1000)
+
+# Waits for timeout ms, checking endFlagger every poll_time ms
 def night_wait(poll_time, timeout, endFlagger):
-    nchecks = timeout // poll_time
-    while (nchecks > 0):
-        sleep_ms(poll_time)
+    while (timeout > 0):
+        sleep_ms(min(poll_time, timeout))
+        metrics.poll()
         if (endFlagger()):
             return
-        nchecks -= 1
-
-
-def prog_loop(led_pattern: list[list[list[list[bool]]]], endFlagger) -> None:
-    time_delta = 10
-    current_time = 0
-    led_time = 0
-
-    while current_time < 3600000:
-        for frame in led_pattern:
-            # Always restart after an hour
-            sleep_ms(time_delta)
+        timeout -= poll_time
+
+
+# The refresh timer keeps the layers scanning; this loop only swaps frames in,
+# once per frame on an absolute deadline. Frames play for their own duration
+# and repeat count if the pattern gives them, FRAME_MS and once otherwise.
+# led_pattern is a PatternFrames or a procedural pattern, see patternregistry.
+# For a table nothing here allocates from one frame to the next, and garbage
+# from elsewhere is collected while waiting for a deadline (see framegc).
+def prog_loop(led_pattern, endFlagger, duration_ms: int = 3_600_000) -> None:
+    if _fleet is not None and _fleet.synced() and isinstance(led_pattern, PatternFrames):
+        fleet_loop(led_pattern, endFlagger, duration_ms)
+        return
+    schedule = FrameScheduler(FRAME_POLICY)
+    cursor = patternregistry.FrameCursor(led_pattern, FRAME_MS)
+    # only tables are allocation free, see patternregistry
+    check = cursor.table
+
+    _refresh.start()
+    try:
+        while schedule.elapsed_ms() < duration_ms:
+            if check:
+                framegc.begin()
+            if not cursor.next():
+                sleep_ms(FRAME_MS)
+                continue
+            if schedule.advance(cursor.ms):
+                metrics.count("dropped_frames")
+                continue
+            # Update LEDs
+            light_up_leds(cursor.frame)
+            # only the frame itself is checked; status requests and the
+            # first frame's milestone allocate, and that's fine
+            if check:
+                framegc.end()
+            metrics.frame(schedule.jitter_ms)
+            metrics.poll()
+            framegc.idle(schedule.remaining_ms())
+            schedule.sleep()
             if endFlagger():
                 return
-            current_time += time_delta
-            if (current_time - led_time > 250):
-                # Update LEDs
-                led_time += 250
-                light_up_leds(frame)
-
+            if _live is not None and _live.poll():
+                play_live(lambda: endFlagger() or schedule.elapsed_ms() >= duration_ms)
+                schedule.restart()
+    finally:
+        _refresh.stop()
+        if schedule.late_frames:
+            print(f"{schedule.late_frames} late frames, {schedule.dropped_frames} dropped")
+
+
+# prog_loop for a fleet. Each frame is picked by its place on the shared
+# clock, so every cube shows the same frame at the same time, and a new
+# pattern from the coordinator takes over as soon as it is complete.
+def fleet_loop(led_pattern: PatternFrames, endFlagger, duration_ms: int) -> None:
+    timeline = Timeline(led_pattern, FRAME_MS)
+    start = ticks_ms()
+    _refresh.start()
+    try:
+        while ticks_diff(ticks_ms(), start) < duration_ms and not endFlagger():
+            _fleet.poll()
+            pattern = _fleet.current()
+            if pattern is not None and pattern is not led_pattern:
+                led_pattern = pattern
+                timeline = Timeline(led_pattern, FRAME_MS)
+            index, left = timeline.at(_fleet.now())
+            light_up_leds(led_pattern[index])
+            metrics.poll()
+            sleep_ms(min(left, FLEET_POLL_MS))
+            if _live is not None and _live.poll():
+                play_live(lambda: endFlagger() or ticks_diff(ticks_ms(), start) >= duration_ms)
+    finally:
+        _refresh.stop()
+
+# Shows live frames until the stream stops or stop() says so
+def play_live(stop) -> None:
+    print("live stream started")
+    light_up_leds(_live.frame)
+    while _live.active() and not stop():
+        if _live.poll():
+            light_up_leds(_live.frame)
+        metrics.poll()
+        sleep_ms(LIVE_POLL_MS)
+    _live.reset()
+    print("live stream stopped")
+
+def start_fleet(colour: str) -> None:
+    global _fleet
+    if not FLEET_PORT or _fleet is not None:
+        return
+    try:
+        member = FleetMember(colour, FLEET_PORT)
+        member.start()
+        _fleet = member
+        metrics.source("fleet_beacons", lambda: _fleet.beacons)
+    except OSError as e:
+        print(f"fleet mode not started: {e}")
+
+# The fleet's pattern, waiting up to wait_ms for it. None outside a fleet or
+# if it doesn't come.
+def fleet_pattern(wait_ms: int) -> PatternFrames:
+    if _fleet is None:
+        return None
+    start = ticks_ms()
+    while True:
+        _fleet.poll()
+        pattern = _fleet.current()
+        if pattern is not None or ticks_diff(ticks_ms(), start) >= wait_ms:
+            return pattern
+        sleep_ms(FLEET_POLL_MS)
 
 def init_layers() -> None:
+    global _output, _refresh, _live
     onboard = machine.Pin("LED", machine.Pin.OUT)
     onboard.off()
 
-    for pin in LAYER:
-        machine.Pin(pin, machine.Pin.OUT)
-
-    for x in range(4):
-        for z in range(4):
-            machine.Pin(GRID_3D[x][z], machine.Pin.OUT)
+    if _output is None:
+        _output = CubeOutput(LAYER, GRID_3D)
+        _refresh = RefreshEngine(_output)
+        metrics.source("pin_writes", lambda: _output.writes)
+        metrics.source("pin_writes_skipped", lambda: _output.skipped)
+        metrics.source("scans", lambda: _refresh.scans)
+        metrics.source("gc_collections", lambda: framegc.collections)
+        metrics.source("gc_worst_us", lambda: framegc.worst_us)
+        metrics.source("http_connects", lambda: httppool.pool().connects)
+        metrics.source("http_reuses", lambda: httppool.pool().reuses)
+        metrics.source("http_resumed", lambda: httppool.pool().resumed)
+        metrics.source("http_last_ms", lambda: httppool.pool().last_ms)
+
+    if LIVE_PORT and _live is None:
+        try:
+            receiver = LiveReceiver(LIVE_PORT)
+            receiver.start()
+            _live = receiver
+            metrics.source("live_frames", lambda: _live.received)
+        except OSError as e:
+            print(f"live mode not started: {e}")
 
 
 def enable_layer(layer: int) -> None:
-    a = machine.Pin(LAYER[layer])
-    a.on()
+    _output.set_layer(layer, True)
 
 def disable_layer(layer: int) -> None:
-    a = machine.Pin(LAYER[layer])
-    a.off()
+    _output.set_layer(layer, False)
 
+# Direct single voxel control. Switches the other layers off first, so only
+# layer y is lit afterwards.
 def light_on(y: int, x: int, z: int) -> None:
-    enable_layer(y)
-    a = machine.Pin(GRID_3D[x][z])
-    a.on()
+    _output.select_layer(y)
+    _output.set_column(x * 4 + z, True)
     
 def light_off(y: int, x: int, z: int) -> None:
-    enable_layer(y)
-    a = machine.Pin(GRID_3D[x][z])
-    a.off()
+    _output.select_layer(y)
+    _output.set_column(x * 4 + z, False)
 
 def clear_leds() -> None:
-    
-    for x in range(4):
-        for z in range(4):
-            a = machine.Pin(GRID_3D[x][z])
-            a.off()
-            sleep_ms(0)
+    _output.off()
+
+# True once Wi-Fi is up
+def _online() -> bool:
+    return network.WLAN(network.STA_IF).isconnected()
 
+# Day or night from the local clock. The clock is synced on first use and
+# every few hours after that.
 def is_night_time(colour) -> bool:
-    status : int
-    datestr : str
-    response = requests.get(f"https://pi.hole/tpbulb/timestr.flask")
-    response_txt = response.text
-    print(f"timestr returned {response_txt}")
-    json_struct = json.loads(response_txt)
-    status = int(json_struct["status"])
-
-    if status != 0:
-        print(f"datetime api returned error")
-        return False
-
-    datestr = json_struct["datestr"]
-    # cur_hour = datetime.fromisoformat(date).hour
-    cur_hour = get_timezone_corrected_hour(datestr)
-
-    # blue turns off one hour earlier
-    is_night = \
-        (cur_hour < 8 or cur_hour > 21) \
-        if colour == "C3" else \
-        (cur_hour < 7 or cur_hour > 22)
-
-    print(f"current hour of {cur_hour}, means {'night' if is_night else 'day'}")
+    timeservice.ensure_synced(TIME_URL)
+    return report_night(colour)
+
+def report_night(colour) -> bool:
+    is_night = timeservice.is_night(colour)
+    now = timeservice.local_seconds()
+    print(f"local time {now // 3600:02}:{now // 60 % 60:02}, means {'night' if is_night else 'day'}")
     if is_night:
-        print("Night mode. Sleeping for half an hour")
+        print(f"Night mode. Sleeping for {timeservice.ms_until_change(colour) // 60000} minutes")
     return is_night
 
-# Turns a plain text string into a pattern string suitable for light_up_leds
-def process_pattern_txt(pattern: str) -> list[list[list[list[bool]]]]:
-    flag = False
-    frame = []
-    row = []
-    depth = []
-    col = []
-    for c in pattern:
-        if c == " ":
-            if not flag:
-                flag = True
-                depth.append(col)
-                col = []
-            else:
-                flag = False
-                row.append(depth)
-                depth = []
-                col = []
-                continue
-        else:
-            flag = False
-            
-        if c == "0":
-            col.append(False)
-            continue
-        if c == "1":
-            col.append(True)
-            continue
-        if c == "\r":
-            continue
-        if c == "\n":
-            if len(col) > 0:
-                depth.append(col)
-            if len(depth) > 0:
-                row.append(depth)
-
-            frame.append(row)
-            row = []
-            depth = []
-            col = []
-            continue
- 
-    if len(col) > 0:
-        depth.append(col)
-    if len(depth) > 0:
-        row.append(depth)
+# Turns a plain text string into a pattern suitable for light_up_leds
+def process_pattern_txt(pattern: str) -> PatternFrames:
+    parser = PatternParser()
+    parser.feed(pattern)
+    return parser.finish()
+
+# Reads up to len(view) bytes, stopping early only at the end of the stream
+def read_into(raw, view: memoryview) -> int:
+    pos = 0
+    while pos < len(view):
+        n = raw.readinto(view[pos:])
+        if not n:
+            break
+        pos += n
+    return pos
+
+# Reads a pattern from an HTTP response, in either the binary or text format.
+# Text is fed to the parser one fixed size chunk at a time.
+def read_pattern(response) -> PatternFrames:
+    chunk = bytearray(CHUNK_SIZE)
+    view = memoryview(chunk)
+    raw = response.raw
+
+    n = read_into(raw, view[:patternbin.HEADER_SIZE])
+    if patternbin.is_binary(view[:n]):
+        data = bytearray(patternbin.pattern_size(view[:n]))
+        data[:n] = view[:n]
+        n += read_into(raw, memoryview(data)[n:])
+        if n < len(data):
+            raise OSError(f"pattern download cut short, {n} of {len(data)} bytes")
+        return patternbin.load(data)
+
+    parser = PatternParser()
+    while n:
+        parser.feed(view[:n])
+        n = raw.readinto(chunk)
+    return parser.finish()
+
+# Reads a pattern from an asynchttp response, like read_pattern
+async def read_pattern_async(response) -> PatternFrames:
+    head = b""
+    while len(head) < patternbin.HEADER_SIZE:
+        chunk = await response.read(patternbin.HEADER_SIZE - len(head))
+        if not chunk:
+            break
+        head += chunk
+
+    if patternbin.is_binary(head):
+        data = bytearray(patternbin.pattern_size(head))
+        data[:len(head)] = head
+        pos = len(head)
+        while pos < len(data):
+            chunk = await response.read(min(CHUNK_SIZE, len(data) - pos))
+            if not chunk:
+                break
+            data[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        if pos < len(data):
+            raise OSError(f"pattern download cut short, {pos} of {len(data)} bytes")
+        return patternbin.load(data)
+
+    parser = PatternParser()
+    chunk = head
+    while chunk:
+        parser.feed(chunk)
+        chunk = await response.read(CHUNK_SIZE)
+    return parser.finish()
+
+# The pattern we already have for a URL, from memory or flash, or None
+def _cached_pattern(url: str) -> PatternFrames:
+    cached = _patterns.get(url)
+    if cached is None:
+        cached = patterncache.load(url)
+    return cached
+
+def _pattern_failed(e: Exception, cached: PatternFrames) -> PatternFrames:
+    print(e)
+    if cached is not None:
+        metrics.count("cache_hits")
+        print("pattern not obtained. using cached pattern")
+    else:
+        print("pattern not obtained. using fallback pattern")
+    return cached
 
-    frame.append(row)
-    return frame
+def _pattern_obtained(url: str, pattern: PatternFrames) -> PatternFrames:
+    if pattern is None or len(pattern) == 0:
+        pattern = process_pattern_txt(FALLBACK_PATTERN)
+    else:
+        _patterns[url] = pattern
+    print(f"pattern is {len(pattern)} frames, {len(pattern.buf)} bytes")
+    return pattern
 
 # Function to retrieve the LED pattern from a web server
-def get_led_pattern(colour : str) -> list[list[list[list[bool]]]]:
-    pattern_str = """1111 1111 1111 1111  1111 1111 1111 1111  1111 1111 1111 1111
-1111 1111 1111 1111  1111 1111 1111 1111  1111 1111 1111 1111  """
-
+# The last good copy is kept on flash and revalidated with a conditional GET.
+def get_led_pattern(colour : str) -> PatternFrames:
+    url = PATTERN_URL.format(colour)
+    cached = _cached_pattern(url)
+    headers = patterncache.conditional_headers(patterncache.load_meta(url)) if cached is not None else {}
+
+    pattern = None
+    start = ticks_ms()
     try:
         # raise OSError("Unable to connect.")
-        response = requests.get(f"https://raw.githubusercontent.com/oshah81/PicoExperiments/main/ledpattern{colour}.txt")
-        pattern_str = response.text
-        print(f"pattern {colour} obtained.")
+        response = httppool.get(url, headers)
+        try:
+            if response.status_code == 304:
+                pattern = cached
+                metrics.count("cache_hits")
+                print(f"pattern {colour} unchanged.")
+            elif response.status_code == 200:
+                pattern = read_pattern(response)
+                if not patterncache.usable(pattern):
+                    raise OSError(f"pattern {colour} has no frames")
+                print(f"pattern {colour} obtained.")
+                patterncache.store(url, pattern, response.headers)
+            else:
+                raise OSError(f"pattern request returned {response.status_code}")
+        finally:
+            response.close()
+        metrics.fetch_done(start)
     except Exception as e:
-        print(e)
-        print("pattern not obtained. using fallback pattern")
-
-    pattern = process_pattern_txt(pattern_str)
-    parsed_pattern = json.dumps(pattern).replace("]", "]\n")
-    print(f"pattern is {parsed_pattern}")
-    return pattern
-
-# Function to light up LEDs based on the pattern
-def light_up_leds(pattern: list[list[list[bool]]]) -> None:
-
-    for x in range(4):
-        for y in range(4):
-            for z in range(4):
-                # print(f"({x}, {y}, {z}) is {pattern[x][y]}")
-                switched = pattern[x][y][z]
-                if not switched:
-                    light_off(x, y, z)
-                else:
-                    light_on(x, y, z)
-
-    # Update the LEDs
-    return
-
+        metrics.count("fetch_errors")
+        pattern = _pattern_failed(e, cached)
 
+    return _pattern_obtained(url, pattern)
 
+# get_led_pattern for the asyncio runtime
+async def fetch_led_pattern(colour : str) -> PatternFrames:
+    url = PATTERN_URL.format(colour)
+    cached = _cached_pattern(url)
+    headers = patterncache.conditional_headers(patterncache.load_meta(url)) if cached is not None else {}
 
-# datetime reimplementation:
-#
-# All because Micropython doesn't have datetime.fromisoformat().
-#
-# Fine I'll vibe code it myself.
-#
-# prompt from Claude AI:
-# I need to parse a ISO 8601 datetime that was sent from a python web server using datetime.toisoformat(). And in the client,
-# I need to parse out that datetime to extract the (timezone corrected) hour from it. However, the client is using Micropython,
-# where datetime.fromisoformat() is not available. That means you need to rebuild datetime.fromisoformat() from scratch - but you
-# can take shortcuts in validation because I can guarantee that the only datetime you need to read is one generated from a full
-# python datetime.toisoformat()
-# further commands dealt with standardising comments, removing the re import and not using ljust (also unavailable in micropython).
-
-def parse_isoformat(iso_string):
-    # Parse ISO 8601 datetime string generated by Python's datetime.isoformat()
-    # Returns a tuple: (year, month, day, hour, minute, second, microsecond, tz_offset_seconds)
-    
-    # Remove 'T' separator and split date/time parts
-    if 'T' in iso_string:
-        date_part, time_part = iso_string.split('T')
-    else:
-        # Handle space separator (alternative format)
-        date_part, time_part = iso_string.split(' ')
-    
-    # Parse date part: YYYY-MM-DD
-    year, month, day = map(int, date_part.split('-'))
-    
-    # Handle timezone offset
-    tz_offset_seconds = 0
-    if '+' in time_part:
-        time_part, tz_part = time_part.rsplit('+', 1)
-        tz_offset_seconds = parse_timezone_offset('+' + tz_part)
-    elif time_part.count('-') > 0 and time_part.rfind('-') > 2:  # Avoid date separator
-        time_part, tz_part = time_part.rsplit('-', 1)
-        tz_offset_seconds = parse_timezone_offset('-' + tz_part)
-    elif time_part.endswith('Z'):
-        time_part = time_part[:-1]
-        tz_offset_seconds = 0
-    
-    # Parse time part: HH:MM:SS[.ffffff]
-    time_components = time_part.split(':')
-    hour = int(time_components[0])
-    minute = int(time_components[1])
-    
-    # Handle seconds and microseconds
-    second = 0
-    microsecond = 0
-    if len(time_components) > 2:
-        sec_part = time_components[2]
-        if '.' in sec_part:
-            sec_str, microsec_str = sec_part.split('.')
-            second = int(sec_str)
-            # Pad or truncate to 6 digits
-            while len(microsec_str) < 6:
-                microsec_str += '0'
-            microsec_str = microsec_str[:6]
-            microsecond = int(microsec_str)
-        else:
-            second = int(sec_part)
-    
-    return (year, month, day, hour, minute, second, microsecond, tz_offset_seconds)
-
-def parse_timezone_offset(tz_str):
-    # Parse timezone offset string like +05:30 or -08:00
-    # Returns offset in seconds
-    
-    if tz_str in ('Z', '+00:00', '-00:00'):
-        return 0
-    
-    sign = 1 if tz_str[0] == '+' else -1
-    tz_str = tz_str[1:]  # Remove sign
-    
-    if ':' in tz_str:
-        hours, minutes = map(int, tz_str.split(':'))
-    else:
-        # Handle formats like +0530 or +05
-        if len(tz_str) == 4:
-            hours = int(tz_str[:2])
-            minutes = int(tz_str[2:])
-        elif len(tz_str) == 2:
-            hours = int(tz_str)
-            minutes = 0
-        else:
-            hours = int(tz_str)
-            minutes = 0
-    
-    return sign * (hours * 3600 + minutes * 60)
+    pattern = None
+    start = ticks_ms()
+    try:
+        response = await asynchttp.get(url, headers)
+        try:
+            if response.status_code == 304:
+                pattern = cached
+                metrics.count("cache_hits")
+                print(f"pattern {colour} unchanged.")
+            elif response.status_code == 200:
+                pattern = await read_pattern_async(response)
+                if not patterncache.usable(pattern):
+                    raise OSError(f"pattern {colour} has no frames")
+                print(f"pattern {colour} obtained.")
+                patterncache.store(url, pattern, response.headers)
+            else:
+                raise OSError(f"pattern request returned {response.status_code}")
+        finally:
+            await response.close()
+        metrics.fetch_done(start)
+    except Exception as e:
+        metrics.count("fetch_errors")
+        pattern = _pattern_failed(e, cached)
 
-def get_timezone_corrected_hour(iso_string):
-    # Extract the timezone-corrected hour from an ISO 8601 datetime string
-    # Returns the hour (0-23) adjusted for the timezone
-    
-    year, month, day, hour, minute, second, microsecond, tz_offset_seconds = parse_isoformat(iso_string)
-    
-    # Convert to total minutes for easier calculation
-    total_minutes = hour * 60 + minute
-    
-    # Adjust for timezone (convert offset to minutes)
-    tz_offset_minutes = tz_offset_seconds // 60
-    total_minutes += tz_offset_minutes
-    
-    # Handle day rollover
-    total_minutes = total_minutes % (24 * 60)
-    if total_minutes < 0:
-        total_minutes += 24 * 60
-    
-    # Extract the corrected hour
-    corrected_hour = total_minutes // 60
-    
-    return corrected_hour
+    return _pattern_obtained(url, pattern)
 
+# Function to light up LEDs based on the pattern
+# The frame is shown from the next refresh scan onwards.
+def light_up_leds(pattern: memoryview) -> None:
+    _refresh.swap(pattern)
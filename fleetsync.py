@@ -0,0 +1,269 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Keeps a fleet of cubes playing in step.
+#
+# A coordinator (host/fleet_coordinator.py, or any board running Coordinator)
+# broadcasts over UDP:
+#   beacons, every BEACON_MS: the pattern epoch, and the shared clock in ms
+#     since that epoch started
+#   patterns, in the binary pattern format, split into CHUNK byte pieces and
+#     tagged with the colour they are for and the epoch they belong to
+#
+# Every cube plays its frames by position on the shared clock instead of on
+# its own schedule, so the whole fleet shows frame n at the same moment. A
+# new epoch restarts the clock at 0, so new patterns start together. Patterns
+# are fetched once by the coordinator and broadcast, rather than downloaded by
+# each cube. They are sent again every few beacons for cubes that join late or
+# lose a piece.
+#
+# Each datagram, little endian:
+#   0   magic b"LEDF"
+#   4   version (1)
+#   5   type, BEACON or PATTERN
+#   6   colour, 4 bytes padded with zeros, empty for beacons
+#   10  epoch (32-bit)
+#   14  BEACON:  clock ms (32-bit)
+#       PATTERN: total size (32-bit), offset (32-bit), data
+
+import select
+import socket
+import struct
+from time import ticks_ms, ticks_diff, ticks_add
+import patternbin
+from ledframes import FRAME_BYTES
+
+MAGIC = b"LEDF"
+VERSION = 1
+BEACON = 1
+PATTERN = 2
+FLEET_PORT = 5006
+BEACON_MS = 1000
+# patterns are sent again every this many beacons
+PATTERN_EVERY = 5
+CHUNK = 1024
+# Largest pattern a cube will take: this many frames at the most bits per
+# voxel, with repeat counts and frame times. Anything claiming to be bigger
+# is dropped rather than allocated.
+MAX_FRAMES = 2000
+MAX_PATTERN_BYTES = patternbin.HEADER_SIZE + MAX_FRAMES * (FRAME_BYTES * patternbin.MAX_BITS + 4)
+# a cube without a beacon for this long plays on its own clock
+LOST_MS = 5000
+# A beacon this far behind the clock a cube keeps resets it outright. Smaller
+# differences are put down to network delay and only pull the clock back by
+# 1 ms per beacon, which is still far more than crystal drift.
+MAX_SKEW_MS = 50
+
+_HEADER = "<4sBB4sI"
+HEADER_SIZE = 14
+
+def _colour_bytes(colour: str) -> bytes:
+    return (colour.encode() + b"\0\0\0\0")[:4]
+
+def beacon_packet(epoch: int, clock_ms: int) -> bytes:
+    return struct.pack(_HEADER + "I", MAGIC, VERSION, BEACON, b"", epoch, clock_ms & 0xFFFFFFFF)
+
+def pattern_packets(colour: str, epoch: int, data) -> list:
+    packets = []
+    for offset in range(0, len(data), CHUNK):
+        packets.append(struct.pack(_HEADER + "II", MAGIC, VERSION, PATTERN, _colour_bytes(colour),
+                                   epoch, len(data), offset) + bytes(data[offset:offset + CHUNK]))
+    return packets
+
+
+# Frame positions on a clock. Frames with repeats take up their time once per
+# repeat.
+class Timeline:
+    def __init__(self, frames, default_ms: int):
+        self.frames = frames
+        # end of each frame in ms from the start of the pattern
+        self.ends = []
+        total = 0
+        for index in range(len(frames)):
+            total += frames.duration(index, default_ms) * frames.repeat(index)
+            self.ends.append(total)
+        self.total = total
+
+    # Returns (frame index, ms until the next frame) at clock_ms
+    def at(self, clock_ms: int) -> tuple:
+        if self.total <= 0:
+            return 0, 1000
+        t = clock_ms % self.total
+        ends = self.ends
+        low = 0
+        high = len(ends) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if ends[middle] > t:
+                high = middle
+            else:
+                low = middle + 1
+        return low, ends[low] - t
+
+
+class FleetMember:
+    def __init__(self, colour: str, port: int = FLEET_PORT, host: str = "0.0.0.0"):
+        self.colour = _colour_bytes(colour)
+        self.port = port
+        self.host = host
+        self.sock = None
+        self.poller = None
+        self.epoch = -1
+        # shared clock at the local tick base_ticks
+        self.base_clock = 0
+        self.base_ticks = 0
+        self.beacons = 0
+        # pattern being put together: epoch, buffer, pieces received
+        self._epoch = -1
+        self._data = None
+        self._have = None
+        # the newest complete pattern and its epoch
+        self.pattern = None
+        self.pattern_epoch = -1
+
+    def start(self) -> None:
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(addr)
+        self.sock.setblocking(False)
+        self.poller = select.poll()
+        self.poller.register(self.sock, select.POLLIN)
+        print(f"fleet member on port {self.port}")
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.poller.unregister(self.sock)
+            self.sock.close()
+            self.sock = None
+
+    def synced(self) -> bool:
+        return self.beacons > 0 and ticks_diff(ticks_ms(), self.base_ticks) < LOST_MS
+
+    # Shared clock in ms since the epoch started
+    def now(self) -> int:
+        return self.base_clock + ticks_diff(ticks_ms(), self.base_ticks)
+
+    # The pattern for the current epoch, or None until it has all come
+    def current(self):
+        if self.pattern_epoch == self.epoch:
+            return self.pattern
+        return None
+
+    # Handles everything waiting, without blocking
+    def poll(self) -> None:
+        if self.sock is None:
+            return
+        while self.poller.poll(0):
+            data = self.sock.recv(HEADER_SIZE + 8 + CHUNK)
+            if len(data) < HEADER_SIZE + 4:
+                continue
+            magic, version, kind, colour, epoch = struct.unpack_from(_HEADER, data, 0)
+            if magic != MAGIC or version != VERSION:
+                continue
+            if kind == BEACON:
+                self._beacon(epoch, struct.unpack_from("<I", data, HEADER_SIZE)[0])
+            elif kind == PATTERN and colour == self.colour and len(data) >= HEADER_SIZE + 8:
+                total, offset = struct.unpack_from("<II", data, HEADER_SIZE)
+                self._piece(epoch, total, offset, memoryview(data)[HEADER_SIZE + 8:])
+
+    def _beacon(self, epoch: int, clock_ms: int) -> None:
+        now = ticks_ms()
+        predicted = self.base_clock + ticks_diff(now, self.base_ticks)
+        error = clock_ms - predicted
+        if epoch != self.epoch or self.beacons == 0 or error > 0 or error < -MAX_SKEW_MS:
+            self.base_clock = clock_ms
+        else:
+            self.base_clock = predicted - 1
+        self.base_ticks = now
+        self.epoch = epoch
+        self.beacons += 1
+
+    def _piece(self, epoch: int, total: int, offset: int, chunk) -> None:
+        if epoch == self.pattern_epoch or offset % CHUNK or offset + len(chunk) > total:
+            return
+        if total > MAX_PATTERN_BYTES:
+            return
+        if epoch != self._epoch or self._data is None or len(self._data) != total:
+            self._data = None
+            self._have = None
+            try:
+                self._data = bytearray(total)
+                self._have = bytearray((total + CHUNK - 1) // CHUNK)
+            except MemoryError:
+                self._data = None
+                self._have = None
+                self._epoch = -1
+                print(f"fleet pattern of {total} bytes doesn't fit")
+                return
+            self._epoch = epoch
+        self._data[offset:offset + len(chunk)] = chunk
+        self._have[offset // CHUNK] = 1
+        for have in self._have:
+            if not have:
+                return
+        try:
+            self.pattern = patternbin.load(self._data)
+            self.pattern_epoch = epoch
+            print(f"fleet pattern for epoch {epoch}, {len(self.pattern)} frames")
+        except ValueError as e:
+            print(f"fleet pattern rejected: {e}")
+        self._data = None
+        self._have = None
+        self._epoch = -1
+
+
+class Coordinator:
+    # targets: where to send, normally the broadcast address
+    def __init__(self, targets: list = None, beacon_ms: int = BEACON_MS):
+        self.targets = targets or [("255.255.255.255", FLEET_PORT)]
+        self.beacon_ms = beacon_ms
+        self.epoch = 0
+        # the shared clock, added up on each read, as a single ticks_diff
+        # wraps after about 6 days
+        self._clock = 0
+        self._clock_at = ticks_ms()
+        self.patterns = {}
+        self.sent = 0
+        self._next = self._clock_at
+        self._beacons = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    # Starts a new epoch with patterns, colour -> binary pattern
+    def set_patterns(self, patterns: dict) -> None:
+        self.patterns = patterns
+        self.epoch += 1
+        self._clock = 0
+        self._clock_at = ticks_ms()
+        self._next = self._clock_at
+        self._beacons = 0
+
+    # ms since the epoch started
+    def clock(self) -> int:
+        now = ticks_ms()
+        self._clock += ticks_diff(now, self._clock_at)
+        self._clock_at = now
+        return self._clock
+
+    def _send(self, packet: bytes) -> None:
+        for target in self.targets:
+            self.sock.sendto(packet, target)
+            self.sent += 1
+
+    # Sends whatever is due. Returns ms until something is next due.
+    def poll(self) -> int:
+        wait = ticks_diff(self._next, ticks_ms())
+        if wait > 0:
+            return wait
+        if self._beacons % PATTERN_EVERY == 0:
+            for colour in self.patterns:
+                for packet in pattern_packets(colour, self.epoch, self.patterns[colour]):
+                    self._send(packet)
+        self._send(beacon_packet(self.epoch, self.clock()))
+        self._beacons += 1
+        self._next = ticks_add(self._next, self.beacon_ms)
+        return self.beacon_ms
+
+    def close(self) -> None:
+        self.sock.close()
@@ -0,0 +1,71 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Garbage collection on the render loop's terms.
+#
+# MicroPython collects whenever an allocation finds the heap full, which in a
+# render loop means partway through a frame. While it runs nothing else does,
+# the refresh timer's callbacks included, so a layer is held for the length of
+# the collection: a visible stutter at a random moment. The render loop
+# allocates nothing per frame, so garbage only comes from fetches, status
+# requests and the like, and idle() clears it in the time left before the
+# next frame's deadline. It only collects when there is enough time for it and
+# enough garbage to be worth it, so in steady state it never runs at all.
+#
+# With CHECK on, begin() and end() bracket a frame and end() raises if the
+# heap grew in between, after printing mem_info(). It needs gc.mem_alloc, so
+# on CPython both do nothing, as does idle().
+
+import gc
+from time import ticks_us, ticks_diff
+try:
+    from micropython import mem_info
+except ImportError:
+    mem_info = None
+
+# Check every frame for allocations
+CHECK = False
+# A collection with the heap mostly empty takes about this long on a Pico W.
+# Less idle time than this and it waits for the next frame.
+COLLECT_MS = 5
+# Collect once this much has been allocated since the last collection
+COLLECT_BYTES = 4096
+
+collections = 0
+# longest collection so far
+worst_us = 0
+
+_mem_alloc = getattr(gc, "mem_alloc", None)
+# heap in use after the last collection, and at the start of the frame
+_after = 0
+_before = 0
+
+# Collects if it's worth it and remaining_ms allows. Returns True if it did.
+def idle(remaining_ms: int) -> bool:
+    global collections, worst_us, _after
+    if _mem_alloc is None or remaining_ms < COLLECT_MS:
+        return False
+    if _mem_alloc() - _after < COLLECT_BYTES:
+        return False
+    start = ticks_us()
+    gc.collect()
+    took = ticks_diff(ticks_us(), start)
+    _after = _mem_alloc()
+    collections += 1
+    if took > worst_us:
+        worst_us = took
+    return True
+
+def begin() -> None:
+    global _before
+    if CHECK and _mem_alloc is not None:
+        _before = _mem_alloc()
+
+def end() -> None:
+    if CHECK and _mem_alloc is not None:
+        used = _mem_alloc() - _before
+        # a collection in between makes it negative, which proves nothing
+        if used > 0:
+            if mem_info is not None:
+                mem_info()
+            raise AssertionError(f"{used} bytes allocated during a frame")
@@ -0,0 +1,60 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Frame timing against absolute deadlines.
+#
+# Each frame's deadline is the previous deadline plus its duration, all
+# measured from one start tick, so time spent rendering or in the end check
+# never accumulates into drift. The player sleeps once per frame, straight to
+# the deadline.
+#
+# When a frame's whole slot has already passed by the time it comes up:
+#   DROP      skips it, so the animation stays in step with the clock
+#   CATCH_UP  shows it anyway with no wait, until the player is back on time
+
+from time import ticks_ms, ticks_add, ticks_diff, sleep_ms
+
+DROP = 0
+CATCH_UP = 1
+
+class FrameScheduler:
+    def __init__(self, policy: int = DROP):
+        self.policy = policy
+        self.start = ticks_ms()
+        self.deadline = self.start
+        self.late_frames = 0
+        self.dropped_frames = 0
+        # how far after the start of its slot the current frame came up
+        self.jitter_ms = 0
+
+    def elapsed_ms(self) -> int:
+        return ticks_diff(ticks_ms(), self.start)
+
+    # Starts the next frame's slot, duration_ms long. Returns True if the
+    # frame should be skipped.
+    def advance(self, duration_ms: int) -> bool:
+        now = ticks_ms()
+        self.jitter_ms = ticks_diff(now, self.deadline)
+        self.deadline = ticks_add(self.deadline, duration_ms)
+        if ticks_diff(now, self.deadline) < 0:
+            return False
+        self.late_frames += 1
+        if self.policy == DROP:
+            self.dropped_frames += 1
+            return True
+        return False
+
+    # Times the next frame from now, after the player has been paused.
+    # elapsed_ms still counts from the start.
+    def restart(self) -> None:
+        self.deadline = ticks_ms()
+
+    def remaining_ms(self) -> int:
+        remaining = ticks_diff(self.deadline, ticks_ms())
+        return remaining if remaining > 0 else 0
+
+    # Sleeps until the end of the current frame's slot
+    def sleep(self) -> None:
+        remaining = self.remaining_ms()
+        if remaining:
+            sleep_ms(remaining)
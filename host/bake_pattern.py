@@ -0,0 +1,91 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Host tool: runs procedural patterns once and writes them out as frame
+# tables in the binary pattern format.
+#
+#   python host/bake_pattern.py demo pattern_6 ...
+#   python host/bake_pattern.py --all
+#
+# Each pattern is written to <name>.led. A frame that is the same as the one
+# before it is merged into it, its time added on, since the cube shows the
+# same thing either way; patternbin then stores repeated runs once. On the
+# Pico, patternregistry.register_file("demo", "demo.led") replaces the
+# generator with the table, and playback does no work per frame beyond the
+# lookup.
+
+import argparse
+import os
+
+import emulator
+emulator.install()
+
+import patternbin
+import patternregistry
+from ledframes import PatternFrames, FRAME_BYTES
+# registers the demo patterns
+import pico_pattern_demo
+
+DEFAULT_MS = 250
+# Stops endless generators
+MAX_FRAMES = 100_000
+
+def bake(name: str, default_ms: int = DEFAULT_MS, max_frames: int = MAX_FRAMES) -> tuple:
+    pattern = patternregistry.get(name)
+    if pattern is None:
+        raise ValueError(f"no pattern called {name}")
+
+    frames = None
+    previous = None
+    generated = 0
+    for frame, duration in patternregistry.frames(pattern, default_ms):
+        if generated >= max_frames:
+            print(f"{name}: stopped after {max_frames} frames")
+            break
+        generated += 1
+        frame = bytes(frame)
+        if frame == previous:
+            total = frames.duration(len(frames) - 1, default_ms) + duration
+            if total <= 0xFFFF:
+                frames.set_duration(len(frames) - 1, total)
+                continue
+        if frames is None:
+            frames = PatternFrames(bits = len(frame) // FRAME_BYTES)
+        index = frames.new_frame()
+        frames.buf[index * frames.frame_bytes:(index + 1) * frames.frame_bytes] = frame
+        frames.set_duration(index, duration)
+        previous = frame
+    return frames or PatternFrames(), generated
+
+def report(name: str, frames: PatternFrames, generated: int, data) -> None:
+    unique = len(set(bytes(frame) for frame in frames))
+    total_ms = sum(frames.duration(i, 0) * frames.repeat(i) for i in range(len(frames)))
+    print(f"{name}: {generated} frames generated, {len(frames)} after merging, {unique} distinct, "
+          f"{total_ms / 1000:.2f} s, {len(data)} bytes")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Bake procedural LED patterns into binary frame tables")
+    parser.add_argument("names", nargs = "*", help = "registered pattern names")
+    parser.add_argument("--all", action = "store_true", help = "bake every registered procedural pattern")
+    parser.add_argument("--default-ms", type = int, default = DEFAULT_MS, help = "time for frames that don't give one")
+    parser.add_argument("--max-frames", type = int, default = MAX_FRAMES, help = "frames to take from endless patterns")
+    parser.add_argument("--out", default = ".", help = "output directory")
+    args = parser.parse_args()
+
+    names = args.names
+    if args.all:
+        names = [name for name in patternregistry.names()
+                 if not isinstance(patternregistry.get(name), PatternFrames)]
+    if not names:
+        parser.error(f"name patterns to bake, from {', '.join(patternregistry.names())}")
+
+    for name in names:
+        frames, generated = bake(name, args.default_ms, args.max_frames)
+        data = patternbin.dump(frames)
+        path = os.path.join(args.out, name + ".led")
+        with open(path, "wb") as f:
+            f.write(data)
+        report(name, frames, generated, data)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Pattern parser and loader benchmark. Runs under CPython, and on the Pico
+# copied there with the rest.
+#
+#   python host/bench_parser.py [results.json] [max frames]
+#
+# Synthetic patterns of 10 frames up to max frames (100k on the host, 1000 on
+# the Pico) are generated in three shapes: clean, ragged (short rows, extra
+# spaces, blank lines) and CRLF. Each is run through process_pattern_txt and
+# read_pattern, the binary copy through read_pattern too, and the old nested
+# list json.dumps log line is timed against the one printed now.
+#
+# Memory is the peak traced by tracemalloc under CPython, and the drop in
+# gc.mem_free() across the run on MicroPython, which misses anything freed
+# before the end. Results go to a JSON file so runs can be compared.
+
+import gc
+import io
+import json
+import sys
+import time
+
+_MICROPYTHON = sys.implementation.name == "micropython"
+
+if not _MICROPYTHON:
+    # flash_leds needs the mock machine/requests modules on the host
+    import emulator
+    emulator.install()
+    import tracemalloc
+
+import flash_leds
+import patternbin
+from ledframes import get_voxel
+
+SIZES = [10, 100, 1000, 10_000, 100_000]
+SHAPES = ["clean", "ragged", "crlf"]
+
+def _now_us() -> int:
+    if _MICROPYTHON:
+        return time.ticks_us()
+    return time.perf_counter_ns() // 1000
+
+def _elapsed_us(start: int) -> int:
+    if _MICROPYTHON:
+        return time.ticks_diff(time.ticks_us(), start)
+    return _now_us() - start
+
+# Small LCG, so the same patterns come out on every implementation
+class _Random:
+    def __init__(self, seed: int):
+        self.state = seed
+
+    def next(self, n: int) -> int:
+        self.state = (self.state * 1103515245 + 12345) & 0x7FFFFFFF
+        return (self.state >> 16) % n
+
+def make_pattern(frames: int, shape: str = "clean", seed: int = 1) -> bytearray:
+    rand = _Random(seed)
+    newline = b"\r\n" if shape == "crlf" else b"\n"
+    out = bytearray()
+    for _ in range(frames):
+        for layer in range(4):
+            if layer:
+                out.extend(b"  ")
+            for row in range(4):
+                if row:
+                    out.extend(b" ")
+                cols = 4
+                if shape == "ragged" and rand.next(4) == 0:
+                    cols = rand.next(4)
+                for _ in range(cols):
+                    out.append(0x31 if rand.next(2) else 0x30)
+        if shape == "ragged":
+            out.extend(b"  " * rand.next(2))
+            if rand.next(8) == 0:
+                out.extend(newline)
+        out.extend(newline)
+    return out
+
+class _Response:
+    def __init__(self, data):
+        self.raw = io.BytesIO(data)
+
+# Runs fn(arg) once, returning (result, us, bytes of memory)
+def measure(fn, arg):
+    gc.collect()
+    if _MICROPYTHON:
+        free = gc.mem_free()
+        start = _now_us()
+        result = fn(arg)
+        us = _elapsed_us(start)
+        return result, us, free - gc.mem_free()
+    tracemalloc.start()
+    start = _now_us()
+    result = fn(arg)
+    us = _elapsed_us(start)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, us, peak
+
+# The pattern as the nested lists flash_leds used to keep, [frame][layer][row][col]
+def legacy_lists(pattern) -> list:
+    return [[[[get_voxel(frame, layer, row, col) for col in range(4)] for row in range(4)]
+             for layer in range(4)] for frame in pattern]
+
+def _legacy_log(legacy: list) -> str:
+    return json.dumps(legacy).replace("]", "]\n")
+
+def _current_log(pattern) -> str:
+    return f"pattern is {len(pattern)} frames, {len(pattern.buf)} bytes"
+
+def _text_parse(data):
+    return flash_leds.process_pattern_txt(data.decode())
+
+def _stream_parse(data):
+    return flash_leds.read_pattern(_Response(data))
+
+def _record(results: list, name: str, shape: str, frames: int, size: int, us: int, mem: int) -> None:
+    seconds = max(us, 1) / 1_000_000
+    entry = {
+        "name": name,
+        "shape": shape,
+        "frames": frames,
+        "bytes": size,
+        "us": us,
+        "frames_per_s": round(frames / seconds),
+        "kb_per_s": round(size / 1024 / seconds, 1),
+        "memory": mem,
+    }
+    results.append(entry)
+    print(f"{name:14} {shape:6} {frames:7} frames {size:9} bytes  {us / 1000:10.2f} ms  "
+          f"{entry['frames_per_s']:9} frames/s  {mem:10} bytes")
+
+def run(max_frames: int) -> list:
+    results = []
+    for frames in SIZES:
+        if frames > max_frames:
+            break
+        for shape in SHAPES:
+            data = make_pattern(frames, shape)
+            pattern, us, mem = measure(_text_parse, data)
+            _record(results, "process_text", shape, frames, len(data), us, mem)
+            pattern, us, mem = measure(_stream_parse, data)
+            _record(results, "read_pattern", shape, frames, len(data), us, mem)
+            del data
+
+            if shape == "clean":
+                binary = patternbin.dump(pattern, rle = False)
+                loaded, us, mem = measure(_stream_parse, binary)
+                _record(results, "read_binary", shape, frames, len(binary), us, mem)
+                del binary, loaded
+
+                _, us, mem = measure(_current_log, pattern)
+                _record(results, "log_summary", shape, frames, len(pattern.buf), us, mem)
+                try:
+                    legacy = legacy_lists(pattern)
+                    _, us, mem = measure(_legacy_log, legacy)
+                    _record(results, "log_json", shape, frames, len(pattern.buf), us, mem)
+                    del legacy
+                except MemoryError:
+                    print(f"log_json       {shape:6} {frames:7} frames  out of memory")
+            del pattern
+    return results
+
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else "bench_parser.json"
+    max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else (1000 if _MICROPYTHON else SIZES[-1])
+
+    results = run(max_frames)
+    report = {
+        "implementation": sys.implementation.name,
+        "version": sys.version,
+        "time": time.time(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f)
+    print(f"results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Render benchmark on the host, using the mock machine module.
+#
+#   python host/bench_render.py [--demo-seconds N] [--trace FILE]
+#
+# light_up_leds: every frame of the ledpattern*.txt files is swapped into the
+# refresh engine and scanned once, timing both and counting register writes.
+#
+# pico_pattern_demo: the demo patterns play through the same path on a
+# virtual clock, so frame times take no real time, until --demo-seconds of
+# pattern time have passed.
+#
+# --trace writes the demo's GPIO transitions as CSV (us, pin levels in hex).
+
+import argparse
+import glob
+import os
+import time
+
+import emulator
+emulator.install()
+
+import machine
+import flash_leds
+from patternparser import PatternParser
+
+def load_patterns() -> list:
+    patterns = []
+    for path in sorted(glob.glob(os.path.join(emulator.REPO_DIR, "ledpattern*.txt"))):
+        parser = PatternParser()
+        with open(path, "rb") as f:
+            parser.feed(f.read())
+        patterns.append((os.path.basename(path), parser.finish()))
+    return patterns
+
+def bench_light_up_leds(rounds: int) -> None:
+    machine.reset_stats()
+    flash_leds.init_layers()
+    print(f"init_layers: {machine.pin_constructions} pins built")
+    refresh = flash_leds._refresh
+    for name, frames in load_patterns():
+        machine.reset_stats(trace_on = False)
+        swap_ns = 0
+        scan_ns = 0
+        for _ in range(rounds):
+            for frame in frames:
+                start = time.perf_counter_ns()
+                flash_leds.light_up_leds(frame)
+                middle = time.perf_counter_ns()
+                for _ in range(4):
+                    refresh.tick()
+                swap_ns += middle - start
+                scan_ns += time.perf_counter_ns() - middle
+        n = rounds * len(frames)
+        print(f"light_up_leds {name}: {n} frames, {swap_ns / n / 1000:.2f} us swap, "
+              f"{scan_ns / n / 1000:.2f} us scan, {machine.register_writes / n:.1f} register writes/frame, "
+              f"{machine.pin_writes} pin writes")
+    refresh.stop()
+
+def bench_demo(seconds: float, trace_path: str) -> None:
+    import pico_pattern_demo
+    import patternregistry
+
+    flash_leds.init_layers()
+    refresh = flash_leds._refresh
+    emulator.use_virtual_clock(seconds)
+    machine.reset_stats(trace_on = True)
+    frames = 0
+    elapsed_ns = 0
+    try:
+        while True:
+            for frame, duration in patternregistry.frames(pico_pattern_demo.demo, flash_leds.FRAME_MS):
+                start = time.perf_counter_ns()
+                flash_leds.light_up_leds(frame)
+                for _ in range(4):
+                    refresh.tick()
+                elapsed_ns += time.perf_counter_ns() - start
+                frames += 1
+                time.sleep_ms(duration)
+    except emulator.OutOfTime:
+        pass
+    refresh.stop()
+
+    frames = max(frames, 1)
+    print(f"pico_pattern_demo: {emulator.virtual_us() / 1e6:.1f} s of pattern, {frames} frames, "
+          f"{elapsed_ns / frames / 1000:.2f} us/frame, {machine.register_writes / frames:.1f} register writes/frame, "
+          f"{len(machine.trace)} transitions")
+
+    if trace_path:
+        with open(trace_path, "w") as f:
+            f.write("us,gpio\n")
+            for us, level in machine.trace:
+                f.write(f"{us},{level:08x}\n")
+        print(f"trace written to {trace_path}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Benchmark LED rendering on the host")
+    parser.add_argument("--rounds", type = int, default = 1000, help = "passes over each pattern file")
+    parser.add_argument("--demo-seconds", type = float, default = 120, help = "pattern time to run the demo for")
+    parser.add_argument("--trace", help = "CSV file for the demo's GPIO trace")
+    args = parser.parse_args()
+
+    bench_light_up_leds(args.rounds)
+    bench_demo(args.demo_seconds, args.trace)
+
+if __name__ == "__main__":
+    main()
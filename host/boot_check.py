@@ -0,0 +1,86 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Measures time to first frame from a cold and a warm boot, with Wi-Fi that
+# takes a while to come up.
+#
+#   python host/boot_check.py [wifi seconds] [run seconds]
+#
+# The first boot has nothing on flash, so it waits for Wi-Fi and the script
+# as it always did. The second finds the script and pattern the first one
+# cached, plays them straight away, and switches to fresh content once the
+# network is up. The local server stands in for pi.hole and GitHub.
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import emulator
+emulator.install()
+
+import network
+import rp2
+import metrics
+import program
+from localserver import LocalServer
+
+# flash_leds as served to the cube, pointed at the local server
+def write_site(site: str, base_url: str) -> None:
+    with open(os.path.join(emulator.REPO_DIR, "flash_leds.py")) as f:
+        source = f.read()
+    lines = []
+    for line in source.splitlines():
+        if line.startswith("PATTERN_URL = "):
+            line = f'PATTERN_URL = "{base_url}/ledpattern{{}}.txt"'
+        elif line.startswith("TIME_URL = "):
+            line = f'TIME_URL = "{base_url}/timestr.flask"'
+        lines.append(line)
+    with open(os.path.join(site, "ledscriptC1.txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    shutil.copy(os.path.join(emulator.REPO_DIR, "ledpatternC1.txt"), site)
+
+def boot(name: str, seconds: float) -> dict:
+    # power on: Wi-Fi down, nothing pressed, nothing in memory but flash
+    network.WLAN(network.STA_IF).active(False)
+    rp2.bootsel = 0
+    program.EndFlag = False
+    for key in ("ainnerprogram", "innerprogram"):
+        program.__dict__.pop(key, None)
+
+    presser = threading.Timer(seconds, lambda: setattr(rp2, "bootsel", 1))
+    presser.start()
+    print(f"--- {name} boot")
+    metrics.boot(time.ticks_ms())
+    wifi = program.start_wifi("ssid", "password")
+    try:
+        program.supervise(wifi, "ssid", "password", "C1")
+    finally:
+        presser.cancel()
+        metrics.stop()
+    return dict(metrics.boot_times)
+
+def main() -> None:
+    network.CONNECT_MS = int(float(sys.argv[1]) * 1000) if len(sys.argv) > 1 else 3000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else network.CONNECT_MS / 1000 + 3
+
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as flash:
+        with LocalServer(site) as server:
+            write_site(site, server.base_url)
+            program.SCRIPT_URL = server.base_url + "/ledscript{}.txt"
+            os.chdir(flash)
+            cold = boot("cold", seconds)
+            cold_requests = server.requests
+            warm = boot("warm", seconds)
+            warm_requests = server.requests - cold_requests
+
+    print(f"wifi takes {network.CONNECT_MS} ms")
+    for name, times, requests in (("cold", cold, cold_requests), ("warm", warm, warm_requests)):
+        print(f"{name}: first frame {times['first_frame_ms']} ms, online {times['online_ms']} ms, {requests} requests")
+    if warm["first_frame_ms"] is None or warm["first_frame_ms"] > 500 or not warm_requests:
+        sys.exit("instant on check failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Lets the Pico code run under CPython.
+#
+# install() puts the mock MicroPython modules in host/mock (machine, rp2,
+# network, ntptime, micropython, requests) ahead of everything else on the
+# import path, and adds MicroPython's extra time functions to time.
+#
+# use_virtual_clock() makes every sleep return at once and move a virtual
+# clock forward instead, so code that sleeps between frames can be run far
+# faster than real time. With a budget, the sleep that would pass it raises
+# OutOfTime, which is how endless loops are stopped.
+
+import os
+import sys
+import time
+
+MOCK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# MicroPython's ticks wrap around at 2**30
+TICKS_PERIOD = 1 << 30
+
+def ticks_ms() -> int:
+    return int(time.monotonic() * 1000) & (TICKS_PERIOD - 1)
+
+def ticks_us() -> int:
+    return int(time.monotonic() * 1_000_000) & (TICKS_PERIOD - 1)
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & (TICKS_PERIOD - 1)
+
+def ticks_diff(a: int, b: int) -> int:
+    return ((a - b + TICKS_PERIOD // 2) & (TICKS_PERIOD - 1)) - TICKS_PERIOD // 2
+
+def sleep_ms(ms: int) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+def sleep_us(us: int) -> None:
+    if us > 0:
+        time.sleep(us / 1_000_000)
+
+class OutOfTime(Exception):
+    pass
+
+# virtual time in us, None while the real clock is used
+_virtual_us = None
+_budget_us = None
+# sleeps taken on the virtual clock
+sleeps = 0
+
+def _virtual_ticks_ms() -> int:
+    return (_virtual_us // 1000) & (TICKS_PERIOD - 1)
+
+def _virtual_ticks_us() -> int:
+    return _virtual_us & (TICKS_PERIOD - 1)
+
+def _virtual_clock_us() -> int:
+    return _virtual_us
+
+def _virtual_sleep_us(us: int) -> None:
+    global _virtual_us, sleeps
+    sleeps += 1
+    if us <= 0:
+        return
+    if _budget_us is not None and _virtual_us + us > _budget_us:
+        _virtual_us = _budget_us
+        raise OutOfTime()
+    _virtual_us += int(us)
+
+def _virtual_sleep_ms(ms: int) -> None:
+    _virtual_sleep_us(ms * 1000)
+
+def _virtual_sleep(seconds: float) -> None:
+    _virtual_sleep_us(round(seconds * 1_000_000))
+
+# Starts the virtual clock at 0. budget_s limits how long it may run.
+# Modules that do "from time import ..." must be imported after this.
+def use_virtual_clock(budget_s: float = None) -> None:
+    global _virtual_us, _budget_us, sleeps
+    import machine
+    _virtual_us = 0
+    sleeps = 0
+    _budget_us = None if budget_s is None else int(budget_s * 1_000_000)
+    time.ticks_ms = _virtual_ticks_ms
+    time.ticks_us = _virtual_ticks_us
+    time.sleep = _virtual_sleep
+    time.sleep_ms = _virtual_sleep_ms
+    time.sleep_us = _virtual_sleep_us
+    machine.clock_us = _virtual_clock_us
+
+def virtual_us() -> int:
+    return _virtual_us
+
+def install() -> None:
+    for path in (REPO_DIR, MOCK_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = sleep_ms
+    time.sleep_us = sleep_us
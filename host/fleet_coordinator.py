@@ -0,0 +1,85 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Runs a fleet: broadcasts the shared clock and each colour's pattern to the
+# cubes on the network, which need FLEET_PORT set in flash_leds.
+#
+#   python host/fleet_coordinator.py C1=ledpatternC1.txt C2=https://.../ledpatternC2.txt
+#   python host/fleet_coordinator.py C1=demo --target 192.168.1.255
+#
+# Each pattern is a text or binary pattern file, a URL, or the name of a
+# registered procedural pattern, which is baked first. Patterns are fetched
+# once, here, instead of by every cube. Edit a file and press enter to load
+# everything again and start the fleet on a new epoch.
+
+import argparse
+import os
+import select
+import sys
+import urllib.request
+
+import emulator
+emulator.install()
+
+import fleetsync
+import patternbin
+import patternregistry
+from bake_pattern import bake
+from patternparser import PatternParser
+import pico_pattern_demo
+
+# A pattern as bytes in the binary format
+def load(source: str) -> bytes:
+    if source.startswith("http://") or source.startswith("https://"):
+        with urllib.request.urlopen(source, timeout = 10) as response:
+            data = response.read()
+    elif os.path.exists(source):
+        with open(source, "rb") as f:
+            data = f.read()
+    elif patternregistry.get(source) is not None:
+        return patternbin.dump(bake(source)[0])
+    else:
+        raise SystemExit(f"{source} is not a file, URL or one of {', '.join(patternregistry.names())}")
+    if patternbin.is_binary(data):
+        return data
+    parser = PatternParser()
+    parser.feed(data)
+    return patternbin.dump(parser.finish())
+
+def load_all(pairs: list) -> dict:
+    patterns = {}
+    for pair in pairs:
+        colour, sep, source = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"{pair}: give patterns as COLOUR=source")
+        patterns[colour] = load(source)
+        print(f"{colour}: {source}, {len(patterns[colour])} bytes")
+    return patterns
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Keep a fleet of cubes in step")
+    parser.add_argument("patterns", nargs = "+", help = "COLOUR=pattern file, URL or registered name")
+    parser.add_argument("--target", action = "append", help = "address to send to, repeatable (default broadcast)")
+    parser.add_argument("--port", type = int, default = fleetsync.FLEET_PORT)
+    parser.add_argument("--beacon-ms", type = int, default = fleetsync.BEACON_MS)
+    args = parser.parse_args()
+
+    targets = [(target, args.port) for target in (args.target or ["255.255.255.255"])]
+    coordinator = fleetsync.Coordinator(targets, args.beacon_ms)
+    coordinator.set_patterns(load_all(args.patterns))
+    print(f"epoch {coordinator.epoch}, sending to {', '.join(t[0] for t in targets)} port {args.port}")
+    try:
+        while True:
+            wait = coordinator.poll()
+            # enter reloads the patterns
+            if select.select([sys.stdin], [], [], wait / 1000)[0]:
+                sys.stdin.readline()
+                coordinator.set_patterns(load_all(args.patterns))
+                print(f"epoch {coordinator.epoch}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coordinator.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Simulates a fleet on loopback: a coordinator and a few cubes, each a
+# FleetMember with its clock deliberately off, in one process.
+#
+#   python host/fleet_sim.py [cubes] [seconds]
+#
+# Loopback has no broadcast, so the coordinator sends to each cube's port in
+# turn. Every cube gets its colour's pattern without downloading it, the
+# cubes' clocks agree to within a couple of ms, frame for frame they show the
+# same thing, and a cube that joins late catches up with the rest. Halfway
+# through a new epoch is started, which every cube must follow.
+
+import sys
+import time
+
+import emulator
+emulator.install()
+
+import fleetsync
+import patternbin
+from patternparser import PatternParser
+
+BASE_PORT = 5106
+MAX_SPREAD_MS = 5
+
+def make_pattern(lines: int, ms: int) -> bytes:
+    parser = PatternParser()
+    for i in range(lines):
+        row = " ".join("1111" if r == i % 4 else "0000" for r in range(4))
+        parser.feed(f"{row}  {row}  0000 0000 0000 0000  {'1111 ' * 3}{i % 2}000 @{ms}\n")
+    return patternbin.dump(parser.finish())
+
+def main() -> None:
+    cubes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 6
+    colours = [f"C{i + 1}" for i in range(cubes)]
+    patterns = {colour: make_pattern(40 + 20 * i, 50) for i, colour in enumerate(colours)}
+
+    coordinator = fleetsync.Coordinator([("127.0.0.1", BASE_PORT + i) for i in range(cubes + 1)], beacon_ms = 200)
+    coordinator.set_patterns(patterns)
+    members = []
+    for i, colour in enumerate(colours):
+        member = fleetsync.FleetMember(colour, BASE_PORT + i, "127.0.0.1")
+        member.start()
+        # as if the cube had been running on its own for a while
+        member.base_clock = 12345 * (i + 1)
+        members.append(member)
+    # the late joiner plays the first colour too
+    late = fleetsync.FleetMember(colours[0], BASE_PORT + cubes, "127.0.0.1")
+
+    spreads = []
+    mismatches = 0
+    epochs = 1
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < seconds:
+            elapsed = time.monotonic() - start
+            if late.sock is None and elapsed > seconds / 3:
+                late.start()
+                members.append(late)
+            if epochs == 1 and elapsed > seconds / 2:
+                coordinator.set_patterns({colour: make_pattern(30, 70) for colour in colours})
+                epochs = 2
+            coordinator.poll()
+            for member in members:
+                member.poll()
+            synced = [m for m in members if m.synced() and m.current() is not None]
+            if len(synced) == len(members) and members[-1] is late:
+                clocks = [m.now() for m in synced]
+                spreads.append(max(clocks) - min(clocks))
+                # the first cube and the late joiner play the same colour
+                first = fleetsync.Timeline(members[0].current(), 250).at(members[0].now())[0]
+                second = fleetsync.Timeline(late.current(), 250).at(late.now())[0]
+                if first != second and spreads[-1] == 0:
+                    mismatches += 1
+            time.sleep(0.005)
+    finally:
+        coordinator.close()
+        for member in members:
+            member.close()
+
+    failed = False
+    for member, colour in zip(members, colours + ["late " + colours[0]]):
+        pattern = member.current()
+        frames = len(pattern) if pattern is not None else 0
+        print(f"{colour}: epoch {member.epoch}, {member.beacons} beacons, {frames} frames, clock {member.now()} ms")
+        if member.epoch != coordinator.epoch or pattern is None:
+            failed = True
+    if spreads:
+        print(f"clock spread: {len(spreads)} samples, worst {max(spreads)} ms, "
+              f"mean {sum(spreads) / len(spreads):.2f} ms, {mismatches} frame mismatches")
+    print(f"{coordinator.sent} datagrams sent")
+    if failed or not spreads or max(spreads) > MAX_SPREAD_MS or mismatches:
+        sys.exit("fleet check failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Checks httppool against the local server: connections kept between
+# requests, bodies with a Content-Length, chunked and empty (304), a
+# connection the server dropped while idle, asynchttp fetches on the same
+# connections, and with openssl to hand, all that over TLS and TLS sessions
+# resumed on new connections.
+#
+#   python host/httppool_check.py [requests]
+
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import emulator
+emulator.install()
+
+import asynchttp
+import httppool
+from localserver import LocalServer
+
+def fetch_all(pool: httppool.Pool, base_url: str, count: int) -> list:
+    times = []
+    for i in range(count):
+        response = pool.get(f"{base_url}/ledpatternC1.txt")
+        body = response.content
+        assert response.status_code == 200, response.status_code
+        assert body, "empty body"
+        times.append(response.elapsed_ms)
+    return times
+
+# asynchttp fetches while another task counts event loop turns, which stop
+# if a fetch blocks
+async def fetch_async(url: str, expected: bytes) -> int:
+    turns = 0
+    async def count_turns():
+        nonlocal turns
+        while True:
+            turns += 1
+            await asyncio.sleep(0)
+    counter = asyncio.create_task(count_turns())
+    try:
+        for query in ("", "?chunked"):
+            response = await asynchttp.get(url + query)
+            body = b""
+            while True:
+                chunk = await response.read(100)
+                if not chunk:
+                    break
+                body += chunk
+            await response.close()
+            assert response.status_code == 200 and body == expected, f"async body{query} differs"
+    finally:
+        counter.cancel()
+    return turns
+
+def check_async(server, expected: bytes) -> None:
+    url = f"{server.base_url}/ledpatternC1.txt"
+    pool = httppool.pool()
+    pool.close()
+    connections = server.connections
+    # the blocking fetch's connection carries on in the event loop
+    assert pool.get(url).content == expected
+    turns = asyncio.run(fetch_async(url, expected))
+    assert server.connections == connections + 1, "asynchttp didn't reuse the connection"
+    # and a new one is made without blocking
+    pool.close()
+    turns += asyncio.run(fetch_async(url, expected))
+    assert server.connections == connections + 2
+    assert pool.get(url).content == expected
+    assert server.connections == connections + 2, "connection from the event loop not reused"
+    print(f"{url.split(':')[0]}: asynchttp on the pooled connections, {turns} event loop turns meanwhile")
+    pool.close()
+
+def check_plain(count: int) -> None:
+    with open(os.path.join(emulator.REPO_DIR, "ledpatternC1.txt"), "rb") as f:
+        expected = f.read()
+
+    with LocalServer(emulator.REPO_DIR) as server:
+        pool = httppool.Pool()
+        times = fetch_all(pool, server.base_url, count)
+        assert server.connections == 1, f"{server.connections} connections for {count} requests"
+        print(f"http: {count} requests on {server.connections} connection, "
+              f"first {times[0]} ms, then up to {max(times[1:] or [0])} ms")
+
+        response = pool.get(f"{server.base_url}/ledpatternC1.txt?chunked")
+        assert response.content == expected, "chunked body differs"
+        etag = response.headers["ETag"]
+        response = pool.get(f"{server.base_url}/ledpatternC1.txt", {"If-None-Match": etag})
+        assert response.status_code == 304 and response.raw.done, "304 not finished"
+
+        # read in pieces as read_pattern does, then stopped part way
+        response = pool.get(f"{server.base_url}/ledpatternC1.txt")
+        buf = bytearray(100)
+        got = response.raw.readinto(buf)
+        assert bytes(buf[:got]) == expected[:got]
+        response.close()
+        pool.get(f"{server.base_url}/ledpatternC1.txt?drop").content
+        assert server.connections == 2, "connection kept after an unfinished body"
+
+        retries = pool.retries
+        reuses = pool.reuses
+        assert pool.get(f"{server.base_url}/ledpatternC1.txt").content == expected
+        assert pool.retries == retries + 1, "dropped connection not retried"
+        assert pool.reuses == reuses, "failed reuse counted"
+        assert server.connections == 3
+        print(f"http: chunked, 304, unfinished body and dropped connection handled, "
+              f"{server.connections} connections for {server.requests} requests")
+        pool.close()
+        check_async(server, expected)
+
+def make_cert(folder: str) -> str:
+    path = os.path.join(folder, "cert.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-keyout", path, "-out", path],
+                   check = True, capture_output = True)
+    return path
+
+def check_tls(count: int) -> None:
+    if shutil.which("openssl") is None:
+        print("https: skipped, no openssl to make a certificate")
+        return
+    with tempfile.TemporaryDirectory() as folder:
+        certfile = make_cert(folder)
+        with LocalServer(emulator.REPO_DIR, certfile = certfile) as server:
+            pool = httppool.Pool()
+            times = fetch_all(pool, server.base_url, 1)
+            first = pool.last_connect_ms
+            times += fetch_all(pool, server.base_url, count - 1)
+            assert server.connections == 1, f"{server.connections} connections for {count} requests"
+            # as if the server had timed the connection out
+            pool.close()
+            fetch_all(pool, server.base_url, 1)
+            print(f"https: {count} requests on 1 connection, first {times[0]} ms, "
+                  f"then up to {max(times[1:] or [0])} ms; new connection {first} ms to connect, "
+                  f"{pool.last_connect_ms} ms with the session resumed: {pool.resumed > 0}")
+            pool.close()
+            with open(os.path.join(emulator.REPO_DIR, "ledpatternC1.txt"), "rb") as f:
+                check_async(server, f.read())
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    check_plain(count)
+    check_tls(count)
+    print("ok")
+
+if __name__ == "__main__":
+    main()
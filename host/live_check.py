@@ -0,0 +1,84 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Checks the live mode on loopback.
+#
+#   python host/live_check.py [port]
+#
+# First a receiver on its own: 60 fps of changing frames, where every frame
+# the receiver holds must be one that was sent whole. Then prog_loop with
+# live mode on: a stream arrives partway through a pattern, takes over, and
+# the pattern carries on once the stream stops.
+
+import sys
+import threading
+import time
+
+import emulator
+emulator.install()
+
+import flash_leds
+import livestream
+from live_sender import send
+from patternparser import PatternParser
+
+# Every frame different, all bits in use
+def changing_frames():
+    for i in range(100_000):
+        yield bytes((i * 37 + j * 11) & 0xFF for j in range(8)), 0
+
+def check_receiver(port: int) -> None:
+    receiver = livestream.LiveReceiver(port, "127.0.0.1", timeout_ms = 300)
+    receiver.start()
+    result = {}
+    sender = threading.Thread(target = lambda: result.update(sent = send(("127.0.0.1", port), changing_frames, 60, 1)))
+    sender.start()
+    seen = []
+    while sender.is_alive() or receiver.poll():
+        if receiver.poll():
+            seen.append(bytes(receiver.frame))
+        time.sleep(0.002)
+    sender.join()
+    sent = set(result["sent"])
+    torn = [frame for frame in seen if frame not in sent]
+    print(f"receiver: {len(result['sent'])} sent, {receiver.received} received, {len(seen)} picked up, "
+          f"{receiver.stale} stale, {receiver.invalid} invalid, {len(torn)} torn")
+    time.sleep(0.35)
+    print(f"receiver: active {receiver.active()} after the stream stopped")
+    receiver.close()
+    if torn or receiver.active():
+        sys.exit("live receiver check failed")
+
+def check_prog_loop(port: int) -> None:
+    parser = PatternParser()
+    parser.feed("1111 0000 0000 0000\n0000 1111 0000 0000\n")
+    pattern = parser.finish()
+
+    flash_leds.LIVE_PORT = port
+    flash_leds.FRAME_MS = 20
+    flash_leds.init_layers()
+    flash_leds._live.host = "127.0.0.1"
+    flash_leds._live.timeout_ms = 300
+
+    def stream():
+        time.sleep(0.3)
+        send(("127.0.0.1", port), changing_frames, 30, 0.5)
+    sender = threading.Thread(target = stream)
+    sender.start()
+    flash_leds.prog_loop(pattern, lambda: False, 2000)
+    sender.join()
+
+    live = flash_leds._live
+    last = bytes(flash_leds._refresh.raw)
+    resumed = last in (bytes(pattern[0]), bytes(pattern[1]))
+    print(f"prog_loop: {live.received} live frames shown, pattern resumed {resumed}")
+    if not live.received or not resumed:
+        sys.exit("live prog_loop check failed")
+
+def main() -> None:
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else livestream.LIVE_PORT
+    check_receiver(port)
+    check_prog_loop(port)
+
+if __name__ == "__main__":
+    main()
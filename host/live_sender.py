@@ -0,0 +1,70 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Reference sender for the live mode: pushes a pattern to a cube as live
+# frames at a fixed rate.
+#
+#   python host/live_sender.py <pico address> ledpatternC1.txt --fps 30
+#   python host/live_sender.py <pico address> pattern_6 --seconds 60
+#
+# The pattern is a text or binary pattern file, or the name of a registered
+# procedural pattern. It is played in a loop, one frame per tick, ignoring
+# frame times.
+
+import argparse
+import os
+import socket
+import time
+
+import emulator
+emulator.install()
+
+import livestream
+import patternregistry
+import pico_pattern_demo
+
+def load(source: str):
+    if os.path.exists(source):
+        return patternregistry.register_file(source, source)
+    pattern = patternregistry.get(source)
+    if pattern is None:
+        raise SystemExit(f"{source} is neither a file nor one of {', '.join(patternregistry.names())}")
+    return pattern
+
+# Sends frames from pattern to addr at fps for seconds. Returns the frames
+# sent, as bytes, in order.
+def send(addr: tuple, pattern, fps: float = 30, seconds: float = 10) -> list:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = []
+    interval = 1 / fps
+    start = time.monotonic()
+    deadline = start
+    try:
+        while True:
+            for frame, _ in patternregistry.frames(pattern, 0):
+                if time.monotonic() - start >= seconds:
+                    return sent
+                frame = bytes(frame)
+                sock.sendto(livestream.pack(frame, len(sent), len(frame) // 8), addr)
+                sent.append(frame)
+                deadline += interval
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        sock.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Stream a pattern to a cube as live frames")
+    parser.add_argument("host", help = "cube address")
+    parser.add_argument("pattern", help = "pattern file or registered pattern name")
+    parser.add_argument("--port", type = int, default = livestream.LIVE_PORT)
+    parser.add_argument("--fps", type = float, default = 30)
+    parser.add_argument("--seconds", type = float, default = 10)
+    args = parser.parse_args()
+
+    sent = send((args.host, args.port), load(args.pattern), args.fps, args.seconds)
+    print(f"{len(sent)} frames sent in {args.seconds} s")
+
+if __name__ == "__main__":
+    main()
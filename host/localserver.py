@@ -0,0 +1,111 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Local stand-in for the pattern and time servers.
+#
+# Serves the files in a directory with an ETag (answering If-None-Match with
+# 304), and /timestr.flask in the same JSON shape as the real endpoint. It
+# speaks HTTP/1.1 and keeps connections open, as the real servers do; a query
+# of ?chunked sends the body chunked instead of with a Content-Length, and
+# ?drop closes the connection after the response without saying so, as a
+# server timing out an idle connection does. With a certfile it serves HTTPS.
+
+import datetime
+import hashlib
+import json
+import os
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def handle(self) -> None:
+        # a client that gives up on a body part way resets the connection
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass
+
+    def log_message(self, format, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, headers: dict = None) -> None:
+        chunked = self.path.endswith("?chunked") and status == 200
+        self.send_response(status)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+        for key in headers or {}:
+            self.send_header(key, headers[key])
+        self.end_headers()
+        if self.path.endswith("?drop"):
+            self.close_connection = True
+        if not chunked:
+            self.wfile.write(body)
+            return
+        for offset in range(0, len(body), 1000):
+            piece = body[offset:offset + 1000]
+            self.wfile.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self) -> None:
+        self.server.requests += 1
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/timestr.flask"):
+            now = datetime.datetime.now().astimezone()
+            self._send(200, json.dumps({"status": 0, "datestr": now.isoformat()}).encode())
+            return
+
+        file_path = os.path.join(self.server.root, os.path.basename(path))
+        try:
+            with open(file_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self._send(404, b"not found")
+            return
+
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        self._send(200, body, {"ETag": etag})
+
+class LocalServer:
+    def __init__(self, root: str, verbose: bool = False, certfile: str = None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.root = root
+        self.httpd.verbose = verbose
+        self.httpd.requests = 0
+        self.httpd.connections = 0
+        self.port = self.httpd.server_address[1]
+        scheme = "http"
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side = True)
+            scheme = "https"
+        self.base_url = f"{scheme}://127.0.0.1:{self.port}"
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    @property
+    def connections(self) -> int:
+        return self.httpd.connections
+
+    def __enter__(self):
+        threading.Thread(target = self.httpd.serve_forever, daemon = True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
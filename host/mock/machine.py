@@ -0,0 +1,154 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Mock of MicroPython's machine module for running on the host.
+#
+# GPIO levels are kept in one int, gpio, whether they're written through Pin
+# objects or the SIO set/clear registers via mem32.
+#
+# Every change of level is appended to trace as (time in us, gpio) while
+# tracing is on, and Pin constructions and writes are counted, so render code
+# can be measured. reset_stats() clears all of it.
+
+import threading
+import time
+
+# level of every GPIO, bit n for pin n
+gpio = 0
+
+SIO_GPIO_OUT_SET = 0xd0000014
+SIO_GPIO_OUT_CLR = 0xd0000018
+
+pin_constructions = 0
+# Pin.on/off/value writes, and mem32 register writes
+pin_writes = 0
+register_writes = 0
+# (us, gpio) after each change of level
+trace = []
+tracing = False
+
+# Clock for the trace. The emulator swaps in its virtual clock.
+def clock_us() -> int:
+    return time.perf_counter_ns() // 1000
+
+
+def _set_pins(set_mask: int, clear_mask: int) -> None:
+    global gpio
+    level = (gpio & ~clear_mask) | set_mask
+    if level != gpio:
+        gpio = level
+        if tracing:
+            trace.append((clock_us(), level))
+
+def reset_stats(trace_on: bool = None) -> None:
+    global pin_constructions, pin_writes, register_writes, tracing
+    pin_constructions = 0
+    pin_writes = 0
+    register_writes = 0
+    trace.clear()
+    if trace_on is not None:
+        tracing = trace_on
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, pin, mode = -1, pull = -1, value = None):
+        global pin_constructions
+        pin_constructions += 1
+        self.pin = pin
+        # named pins such as "LED" aren't GPIOs
+        self.mask = 1 << pin if isinstance(pin, int) else 0
+        if value is not None:
+            self.value(value)
+
+    def on(self) -> None:
+        global pin_writes
+        pin_writes += 1
+        _set_pins(self.mask, 0)
+
+    def off(self) -> None:
+        global pin_writes
+        pin_writes += 1
+        _set_pins(0, self.mask)
+
+    def value(self, v = None):
+        if v is None:
+            return 1 if gpio & self.mask else 0
+        if v:
+            self.on()
+        else:
+            self.off()
+
+
+class _Mem32:
+    def __setitem__(self, address: int, value: int) -> None:
+        global register_writes
+        register_writes += 1
+        if address == SIO_GPIO_OUT_SET:
+            _set_pins(value, 0)
+        elif address == SIO_GPIO_OUT_CLR:
+            _set_pins(0, value)
+
+    def __getitem__(self, address: int) -> int:
+        return 0
+
+mem32 = _Mem32()
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id = -1, **kwargs):
+        self._stop = None
+        if kwargs:
+            self.init(**kwargs)
+
+    # The callback runs on a thread, as soft timer callbacks run between
+    # bytecodes on the Pico
+    def init(self, mode = PERIODIC, freq = None, period = None, callback = None) -> None:
+        self.deinit()
+        interval = 1 / freq if freq else (period or 1000) / 1000
+        stop = threading.Event()
+        self._stop = stop
+
+        def run():
+            deadline = time.monotonic()
+            while not stop.is_set():
+                deadline += interval
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    stop.wait(delay)
+                if stop.is_set():
+                    break
+                callback(self)
+                if mode == Timer.ONE_SHOT:
+                    break
+
+        threading.Thread(target = run, daemon = True).start()
+
+    def deinit(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+
+# The host clock is already right, so setting the RTC is ignored
+class RTC:
+    def datetime(self, value = None):
+        if value is not None:
+            return None
+        t = time.gmtime()
+        return (t[0], t[1], t[2], t[6], t[3], t[4], t[5], 0)
+
+
+class SoftReset(Exception):
+    pass
+
+def soft_reset() -> None:
+    raise SoftReset()
+
+def reset() -> None:
+    raise SoftReset()
@@ -0,0 +1,16 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Mock of MicroPython's micropython module.
+
+def const(value):
+    return value
+
+def schedule(func, arg) -> None:
+    func(arg)
+
+def alloc_emergency_exception_buf(size: int) -> None:
+    pass
+
+def mem_info(verbose = None) -> None:
+    pass
@@ -0,0 +1,47 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Mock of MicroPython's network module. The host's own network is used, so
+# the WLAN always connects, after CONNECT_MS to stand in for association and
+# DHCP. As on the Pico, every WLAN for an interface shares one state.
+
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+CONNECT_MS = 0
+
+_states = {}
+
+class WLAN:
+    PM_NONE = 0
+    PM_PERFORMANCE = 1
+    PM_POWERSAVE = 2
+
+    def __init__(self, interface: int = STA_IF):
+        self._state = _states.setdefault(interface, {"active": False, "connected_at": None})
+
+    def active(self, is_active = None):
+        if is_active is None:
+            return self._state["active"]
+        self._state["active"] = is_active
+        if not is_active:
+            self._state["connected_at"] = None
+
+    def connect(self, ssid: str = None, key: str = None) -> None:
+        if self._state["active"]:
+            self._state["connected_at"] = time.monotonic() + CONNECT_MS / 1000
+
+    def disconnect(self) -> None:
+        self._state["connected_at"] = None
+
+    def isconnected(self) -> bool:
+        connected_at = self._state["connected_at"]
+        return connected_at is not None and time.monotonic() >= connected_at
+
+    def config(self, *args, **kwargs):
+        return None
+
+    def ifconfig(self) -> tuple:
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
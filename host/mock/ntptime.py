@@ -0,0 +1,14 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Mock of MicroPython's ntptime module. The host clock is already right.
+
+host = "pool.ntp.org"
+timeout = 1
+
+def time() -> int:
+    import time as _time
+    return int(_time.time())
+
+def settime() -> None:
+    pass
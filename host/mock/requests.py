@@ -0,0 +1,48 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Mock of MicroPython's requests module on top of urllib, with the same
+# subset of the API: status_code, headers, text, content, raw and close().
+
+import io
+import urllib.request
+import urllib.error
+
+class Response:
+    def __init__(self, status_code: int, headers: dict, body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.raw = io.BytesIO(body)
+        self._body = body
+
+    @property
+    def content(self) -> bytes:
+        return self._body
+
+    @property
+    def text(self) -> str:
+        return self._body.decode()
+
+    def json(self):
+        import json
+        return json.loads(self._body)
+
+    def close(self) -> None:
+        self.raw.close()
+
+def request(method: str, url: str, data = None, json = None, headers = None, stream = None, timeout = None) -> Response:
+    if json is not None:
+        import json as _json
+        data = _json.dumps(json).encode()
+    req = urllib.request.Request(url, data = data, headers = headers or {}, method = method)
+    try:
+        with urllib.request.urlopen(req, timeout = timeout) as f:
+            return Response(f.status, dict(f.headers), f.read())
+    except urllib.error.HTTPError as e:
+        return Response(e.code, dict(e.headers), e.read())
+
+def get(url: str, **kwargs) -> Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,12 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Mock of MicroPython's rp2 module. Set bootsel to 1 to press the button.
+
+bootsel = 0
+
+def country(code: str = None) -> str:
+    return code or "GB"
+
+def bootsel_button() -> int:
+    return bootsel
@@ -0,0 +1,337 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Host library: patterns as NumPy arrays, for building variants of an
+# animation without editing it by hand. Needs NumPy, so it isn't for the Pico.
+# Import it from a script in host/ after emulator.install(), which puts the
+# Pico modules it builds on on the path.
+#
+# An animation is a uint8 array of shape (N, 4, 4, 4), indexed
+# [frame, layer, row, col] the same way as the text format and ledframes,
+# holding each voxel's level (0 or 1 for on/off patterns). Frame times go
+# alongside in a uint16 array of shape (N,), 0 meaning the player's default.
+# Repeat counts are expanded on reading, one entry per frame shown, so every
+# transform works on plain arrays; writers fold identical frames back into
+# repeats.
+#
+#   levels, durations = patternarray.read("ledpatternC1.txt")
+#   spun = patternarray.spin(levels)
+#   both = patternarray.combine(spun, patternarray.mirror(levels, "col"), "xor")
+#   patternarray.write("ledpatternC4.led", both, durations)
+#
+# Everything works on whole animations at once, so 100k frames take
+# milliseconds. Reading text is vectorized for lines in the usual layout
+# ("0101 0101 1010 1010  ..." with optional @ms and *n); any other line goes
+# through PatternParser, so the result is always the same as on the Pico.
+
+import os
+
+import numpy as np
+
+import patternbin
+from ledframes import PatternFrames
+from patternparser import PatternParser
+
+AXES = {"layer": 1, "row": 2, "col": 3}
+
+# Characters of a frame in the usual layout: 4 layers of 4 rows of 4 voxels,
+# one space between rows and two between layers
+_LINE_CHARS = 4 * (4 * 4 + 3) + 3 * 2
+# position of voxel (layer, row, col) in such a line
+_VOXEL_CHARS = np.array([layer * 21 + row * 5 + col
+                         for layer in range(4) for row in range(4) for col in range(4)])
+_SPACE_CHARS = np.setdiff1d(np.arange(_LINE_CHARS), _VOXEL_CHARS)
+
+# level of each character, -1 for characters that aren't one
+_LEVELS = np.full(256, -1, dtype = np.int16)
+_LEVELS[ord("0"):ord("9") + 1] = np.arange(10)
+_LEVELS[ord("a"):ord("f") + 1] = np.arange(10, 16)
+_LEVELS[ord("A"):ord("F") + 1] = np.arange(10, 16)
+_DIGITS = np.frombuffer(b"0123456789abcdef", dtype = np.uint8)
+
+_BIT_WEIGHTS = (1 << np.arange(16)).astype(np.uint16)
+
+
+# Smallest bits per voxel that holds every level in levels
+def bits_for(levels: np.ndarray) -> int:
+    top = int(levels.max()) if levels.size else 0
+    if top > 15:
+        raise ValueError(f"level {top} is more than 4 bits")
+    return max(1, top.bit_length())
+
+def from_frames(frames: PatternFrames, expand: bool = True) -> tuple:
+    count = len(frames)
+    bits = frames.bits
+    raw = np.frombuffer(frames.buf, dtype = np.uint8, count = count * frames.frame_bytes)
+    values = raw.reshape(count, bits, 4, 2).astype(np.uint16)
+    values = values[..., 0] | (values[..., 1] << 8)
+    planes = (values[..., None] >> np.arange(16, dtype = np.uint16)) & 1
+    weights = (1 << np.arange(bits, dtype = np.uint16))[None, :, None, None]
+    levels = (planes * weights).sum(axis = 1, dtype = np.uint16).astype(np.uint8).reshape(count, 4, 4, 4)
+
+    if frames.durations is not None:
+        durations = np.frombuffer(frames.durations, dtype = "<u2", count = count).astype(np.uint16)
+    else:
+        durations = np.full(count, frames.default_ms, dtype = np.uint16)
+    if expand and frames.repeats is not None:
+        repeats = np.frombuffer(frames.repeats, dtype = "<u2", count = count)
+        levels = np.repeat(levels, repeats, axis = 0)
+        durations = np.repeat(durations, repeats)
+    return levels, durations
+
+# Folds runs of identical frames with the same time into repeat counts
+def _runs(levels: np.ndarray, durations: np.ndarray) -> tuple:
+    count = len(levels)
+    if count == 0:
+        return np.zeros(0, dtype = np.intp), np.zeros(0, dtype = np.intp)
+    flat = levels.reshape(count, -1)
+    same = (flat[1:] == flat[:-1]).all(axis = 1) & (durations[1:] == durations[:-1])
+    starts = np.flatnonzero(np.concatenate(([True], ~same)))
+    repeats = np.diff(np.append(starts, count))
+    # a run longer than a repeat count holds is split
+    if repeats.max() > 0xFFFF:
+        starts = np.concatenate([np.arange(start, start + repeat, 0xFFFF) for start, repeat in zip(starts, repeats)])
+        repeats = np.diff(np.append(starts, count))
+    return starts, repeats
+
+def to_frames(levels: np.ndarray, durations: np.ndarray = None, bits: int = None, fold: bool = True) -> PatternFrames:
+    levels = np.asarray(levels, dtype = np.uint8)
+    count = len(levels)
+    if bits is None:
+        bits = bits_for(levels)
+    if durations is None:
+        durations = np.zeros(count, dtype = np.uint16)
+    durations = np.asarray(durations, dtype = np.uint16)
+
+    repeats = None
+    if fold:
+        starts, repeats = _runs(levels, durations)
+        levels = levels[starts]
+        durations = durations[starts]
+        count = len(starts)
+
+    levels = np.minimum(levels, (1 << bits) - 1).reshape(count, 1, 4, 16)
+    planes = (levels >> np.arange(bits, dtype = np.uint8)[None, :, None, None]) & 1
+    values = (planes.astype(np.uint16) * _BIT_WEIGHTS).sum(axis = 3, dtype = np.uint16)
+    frames = PatternFrames(count, bytearray(values.astype("<u2").tobytes()), bits)
+    if durations.any():
+        frames.durations = bytearray(durations.astype("<u2").tobytes())
+    if repeats is not None and (repeats != 1).any():
+        frames.repeats = bytearray(repeats.astype("<u2").tobytes())
+    return frames
+
+
+# The line's frame characters and timing, or None if it isn't in the usual
+# layout
+def _split_line(line: bytes):
+    line = line.rstrip(b" \r")
+    if len(line) < _LINE_CHARS or b"#" in line:
+        return None
+    duration = -1
+    repeat = -1
+    rest = line[_LINE_CHARS:]
+    if rest:
+        if rest[0] != 0x20:
+            return None
+        for token in rest.split():
+            number = token[1:]
+            if number and not number.isdigit():
+                return None
+            if token[0] == 0x40:
+                duration = int(number or 0)
+            elif token[0] == 0x2A:
+                repeat = int(number or 0)
+                if repeat < 1:
+                    raise ValueError(f"repeat count {repeat} must be at least 1")
+            else:
+                return None
+    return line[:_LINE_CHARS], duration, repeat
+
+def read_text(data) -> tuple:
+    if isinstance(data, str):
+        data = data.encode()
+    bits = 1
+    started = False
+    # lines in the usual layout, and their frame times
+    fast = []
+    timing = []
+    # frames from other lines, one (levels, duration) each
+    slow = []
+    # per frame in order: index into fast, or -1 - index into slow, and how
+    # many times it repeats
+    order = []
+    counts = []
+    for line in data.split(b"\n"):
+        split = _split_line(line)
+        if split is not None:
+            chars, duration, repeat = split
+            order.append(len(fast))
+            counts.append(repeat if repeat >= 0 else 1)
+            fast.append(chars)
+            timing.append(duration)
+            started = True
+            continue
+        parser = PatternParser()
+        if bits > 1:
+            parser.feed(f"#bits {bits}\n")
+        parser.feed(line)
+        frames = parser.finish()
+        if len(frames):
+            levels, durations = from_frames(frames)
+            for index in range(len(levels)):
+                order.append(-1 - len(slow))
+                counts.append(1)
+                slow.append((levels[index], durations[index]))
+            started = True
+        elif frames.bits != bits:
+            if started:
+                raise ValueError("#bits must come before the first frame")
+            bits = frames.bits
+
+    levels = np.zeros((len(fast) + len(slow), 4, 4, 4), dtype = np.uint8)
+    durations = np.zeros(len(fast) + len(slow), dtype = np.uint16)
+    if fast:
+        chars = np.frombuffer(b"".join(fast), dtype = np.uint8).reshape(len(fast), _LINE_CHARS)
+        voxels = _LEVELS[chars[:, _VOXEL_CHARS]]
+        good = (chars[:, _SPACE_CHARS] == 0x20).all(axis = 1) & (voxels >= 0).all(axis = 1)
+        if bits == 1:
+            good &= (voxels <= 1).all(axis = 1)
+        levels[:len(fast)] = np.minimum(voxels, (1 << bits) - 1).reshape(len(fast), 4, 4, 4)
+        durations[:len(fast)] = np.maximum(np.array(timing), 0)
+        # the odd line that only looked right goes through the parser
+        for i in np.flatnonzero(~good):
+            parser = PatternParser()
+            parser.feed(f"#bits {bits}\n".encode() + fast[i])
+            levels[i] = from_frames(parser.finish())[0][0]
+    for i, (frame, duration) in enumerate(slow):
+        levels[len(fast) + i] = frame
+        durations[len(fast) + i] = duration
+
+    order = np.array(order, dtype = np.intp)
+    order[order < 0] = len(fast) - 1 - order[order < 0]
+    counts = np.array(counts, dtype = np.intp)
+    # most files have no repeats or odd lines, and are used as they are
+    if not slow and (counts == 1).all():
+        return levels, durations
+    return np.repeat(levels[order], counts, axis = 0), np.repeat(durations[order], counts)
+
+def write_text(levels: np.ndarray, durations: np.ndarray = None, bits: int = None) -> bytes:
+    levels = np.asarray(levels, dtype = np.uint8)
+    if bits is None:
+        bits = bits_for(levels)
+    if durations is None:
+        durations = np.zeros(len(levels), dtype = np.uint16)
+    starts, repeats = _runs(levels, np.asarray(durations))
+    count = len(starts)
+
+    chars = np.full((count, _LINE_CHARS), 0x20, dtype = np.uint8)
+    chars[:, _VOXEL_CHARS] = _DIGITS[np.minimum(levels[starts], (1 << bits) - 1).reshape(count, 64)]
+    header = f"#bits {bits}\n".encode() if bits > 1 else b""
+    durations = np.asarray(durations)[starts]
+    if not durations.any() and (repeats == 1).all():
+        chars = np.concatenate([chars, np.full((count, 1), 0x0A, dtype = np.uint8)], axis = 1)
+        return header + chars.tobytes()
+
+    lines = []
+    for line, duration, repeat in zip(chars, durations.tolist(), repeats.tolist()):
+        line = line.tobytes()
+        if duration:
+            line += b" @%d" % duration
+        if repeat != 1:
+            line += b" *%d" % repeat
+        lines.append(line)
+    return header + b"\n".join(lines) + b"\n"
+
+# Reads a text or binary pattern file
+def read(path: str) -> tuple:
+    with open(path, "rb") as f:
+        data = f.read()
+    if patternbin.is_binary(data):
+        return from_frames(patternbin.load(data))
+    return read_text(data)
+
+# Writes the binary format for .led files and text for anything else
+def write(path: str, levels: np.ndarray, durations: np.ndarray = None, bits: int = None) -> int:
+    if os.path.splitext(path)[1] == ".led":
+        data = patternbin.dump(to_frames(levels, durations, bits), rle = False)
+    else:
+        data = write_text(levels, durations, bits)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+# Transforms. Each returns a new animation; axis is "layer", "row" or "col".
+
+# Quarter turns about an axis, turning the other two
+def rotate(levels: np.ndarray, turns: int = 1, axis: str = "layer") -> np.ndarray:
+    plane = [a for a in (1, 2, 3) if a != AXES[axis]]
+    return np.rot90(levels, turns, axes = plane)
+
+def mirror(levels: np.ndarray, axis: str = "col") -> np.ndarray:
+    return np.flip(levels, AXES[axis])
+
+# Moves every frame by offset voxels along axis, wrapping round or letting
+# voxels fall off the edge
+def shift(levels: np.ndarray, offset: int, axis: str = "col", wrap: bool = True) -> np.ndarray:
+    if wrap:
+        return np.roll(levels, offset, AXES[axis])
+    out = np.zeros_like(levels)
+    source = [slice(None)] * 4
+    target = [slice(None)] * 4
+    if offset >= 0:
+        source[AXES[axis]] = slice(0, max(4 - offset, 0))
+        target[AXES[axis]] = slice(min(offset, 4), 4)
+    else:
+        source[AXES[axis]] = slice(min(-offset, 4), 4)
+        target[AXES[axis]] = slice(0, max(4 + offset, 0))
+    out[tuple(target)] = levels[tuple(source)]
+    return out
+
+# Moves frame n by n * step voxels along axis, so the animation scrolls
+def scroll(levels: np.ndarray, step: int = 1, axis: str = "layer", wrap: bool = True) -> np.ndarray:
+    count = len(levels)
+    a = AXES[axis]
+    source = np.arange(4)[None, :] - (np.arange(count) * step)[:, None]
+    shape = [count, 1, 1, 1]
+    shape[a] = 4
+    index = (source % 4).reshape(shape)
+    out = np.take_along_axis(levels, np.broadcast_to(index, levels.shape), a)
+    if not wrap:
+        out = np.where(((source >= 0) & (source < 4)).reshape(shape), out, 0).astype(levels.dtype)
+    return out
+
+# One full turn about an axis, a quarter turn every frames_per_turn frames
+def spin(levels: np.ndarray, frames_per_turn: int = 1, axis: str = "layer") -> np.ndarray:
+    out = levels.copy()
+    turn = (np.arange(len(levels)) // frames_per_turn) % 4
+    for turns in (1, 2, 3):
+        chosen = turn == turns
+        out[chosen] = rotate(levels[chosen], turns, axis)
+    return out
+
+def invert(levels: np.ndarray, bits: int = 1) -> np.ndarray:
+    return ((1 << bits) - 1 - levels).astype(np.uint8)
+
+# Lengthens or shortens an animation to count frames, looping it
+def loop(levels: np.ndarray, count: int) -> np.ndarray:
+    return levels[np.arange(count) % len(levels)]
+
+_OPS = {
+    "or": np.maximum,
+    "max": np.maximum,
+    "and": np.minimum,
+    "min": np.minimum,
+    "xor": lambda a, b: np.where((a > 0) ^ (b > 0), np.maximum(a, b), 0),
+    "sub": lambda a, b: np.where(b > 0, 0, a),
+    # b drawn on top of a, wherever b is lit
+    "over": lambda a, b: np.where(b > 0, b, a),
+}
+
+# Composites two animations frame by frame. The shorter one loops to the
+# length of the longer.
+def combine(a: np.ndarray, b: np.ndarray, op: str = "or") -> np.ndarray:
+    if op not in _OPS:
+        raise ValueError(f"unknown op {op}, not one of {', '.join(_OPS)}")
+    count = max(len(a), len(b))
+    return _OPS[op](loop(a, count), loop(b, count)).astype(np.uint8)
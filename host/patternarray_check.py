@@ -0,0 +1,124 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Checks patternarray against PatternParser and patternbin, and times it on
+# long animations.
+#
+#   python host/patternarray_check.py [frames]
+#
+# Every way of reading must give exactly what the Pico would play, and every
+# write must read back the same. Needs NumPy.
+
+import random
+import sys
+import time
+
+import emulator
+emulator.install()
+
+import numpy as np
+
+import patternarray
+import patternbin
+from patternparser import PatternParser
+
+# The parser's result, repeats expanded
+def reference(text: bytes) -> tuple:
+    parser = PatternParser()
+    parser.feed(text)
+    return patternarray.from_frames(parser.finish())
+
+def same(name: str, got: tuple, expected: tuple) -> bool:
+    ok = np.array_equal(got[0], expected[0]) and np.array_equal(got[1], expected[1])
+    if not ok:
+        print(f"{name}: MISMATCH, {len(got[0])} frames against {len(expected[0])}")
+    return ok
+
+def random_line(rng: random.Random, bits: int, ragged: bool = True) -> str:
+    digits = "0123456789abcdef"[:1 << bits] if bits > 1 else "01"
+    layers = [" ".join("".join(rng.choice(digits) for _ in range(4)) for _ in range(4)) for _ in range(4)]
+    line = "  ".join(layers)
+    roll = rng.random()
+    if roll < 0.1:
+        line += f" @{rng.randrange(0, 2000)}"
+    elif roll < 0.15:
+        line += f" @{rng.randrange(1, 500)} *{rng.randrange(1, 4)}"
+    elif roll < 0.2 and ragged:
+        # ragged: a voxel too many or too few
+        line = line[:rng.randrange(len(line))] + rng.choice(["", "1", "  ", " 9", "#x"])
+    elif roll < 0.22 and ragged:
+        line = "# comment " + line
+    if rng.random() < 0.1:
+        line += "\r"
+    return line
+
+def random_text(rng: random.Random, lines: int, bits: int, ragged: bool = True) -> bytes:
+    header = f"#bits {bits}\n" if bits > 1 else ""
+    return (header + "\n".join(random_line(rng, bits, ragged) for _ in range(lines)) + "\n").encode()
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ok = True
+
+    for path in ["ledpatternC1.txt", "ledpatternC2.txt", "ledpatternC3.txt"]:
+        with open(emulator.REPO_DIR + "/" + path, "rb") as f:
+            text = f.read()
+        ok &= same(path, patternarray.read_text(text), reference(text))
+
+    rng = random.Random(1)
+    for bits in (1, 2, 4):
+        for trial in range(20):
+            text = random_text(rng, rng.randrange(1, 60), bits)
+            levels, durations = patternarray.read_text(text)
+            ok &= same(f"random {bits} bit", (levels, durations), reference(text))
+            # writes read back the same, through both formats
+            ok &= same("text round trip", reference(patternarray.write_text(levels, durations, bits)), (levels, durations))
+            data = patternbin.dump(patternarray.to_frames(levels, durations, bits), rle = False)
+            ok &= same("binary round trip", patternarray.from_frames(patternbin.load(data)), (levels, durations))
+
+    levels, durations = patternarray.read_text(random_text(rng, 200, 2))
+    for axis in patternarray.AXES:
+        ok &= np.array_equal(patternarray.rotate(levels, 4, axis), levels)
+        ok &= np.array_equal(patternarray.mirror(patternarray.mirror(levels, axis), axis), levels)
+        ok &= np.array_equal(patternarray.shift(patternarray.shift(levels, 1, axis), -1, axis), levels)
+        scrolled = patternarray.scroll(levels, 1, axis)
+        ok &= np.array_equal(scrolled[4::4], patternarray.scroll(levels[4::4], 0, axis))
+        ok &= np.array_equal(scrolled[1], patternarray.shift(levels, 1, axis)[1])
+    ok &= np.array_equal(patternarray.combine(levels, levels, "xor"), np.zeros_like(levels))
+    # a frame shown no times is refused by both, as the Pico would have
+    # nothing to play
+    zero = random_line(rng, 1, ragged = False).split(" @")[0].encode() + b" *0\n"
+    for read in (patternarray.read_text, reference):
+        try:
+            read(zero)
+            print(f"{read.__name__}: accepted a repeat count of 0")
+            ok = False
+        except ValueError:
+            pass
+    if not ok:
+        sys.exit("patternarray check failed")
+    print("matches PatternParser and patternbin")
+
+    # a long authored pattern: the usual layout, some frame times and repeats
+    text = random_text(random.Random(2), count, 1, ragged = False)
+    start = time.perf_counter()
+    levels, durations = patternarray.read_text(text)
+    read_time = time.perf_counter() - start
+    start = time.perf_counter()
+    both = patternarray.combine(patternarray.spin(levels), patternarray.scroll(patternarray.mirror(levels), 1), "xor")
+    transform_time = time.perf_counter() - start
+    start = time.perf_counter()
+    text = patternarray.write_text(both, durations)
+    write_time = time.perf_counter() - start
+    start = time.perf_counter()
+    data = patternbin.dump(patternarray.to_frames(both, durations), rle = False)
+    binary_time = time.perf_counter() - start
+    start = time.perf_counter()
+    patternarray.from_frames(patternbin.load(data))
+    load_time = time.perf_counter() - start
+    print(f"{len(levels)} frames: read text {read_time * 1000:.0f} ms, spin+scroll+mirror+xor {transform_time * 1000:.0f} ms, "
+          f"write text {write_time * 1000:.0f} ms, write binary {binary_time * 1000:.0f} ms, "
+          f"read binary {load_time * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
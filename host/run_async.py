@@ -0,0 +1,53 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Runs the asyncio runtime from flash_leds/program on the host, with the
+# mock machine modules and a local server standing in for GitHub and pi.hole.
+#
+#   python host/run_async.py [seconds] [colour]
+
+import os
+import sys
+import tempfile
+
+import emulator
+emulator.install()
+
+import asyncio
+import flash_leds
+import program
+from localserver import LocalServer
+
+async def run(seconds: float, colour: str) -> None:
+    # run_async watches BOOTSEL; pretend it's pressed once the time is up
+    import rp2
+    async def press_later():
+        await asyncio.sleep(seconds)
+        rp2.bootsel = 1
+
+    presser = asyncio.create_task(press_later())
+    program.ainnerprogram = flash_leds.ainnerprogram
+    wifi = program.network.WLAN(program.network.STA_IF)
+    wifi.active(True)
+    wifi.connect()
+    await program.run_async(wifi, "ssid", "password", colour)
+    presser.cancel()
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    colour = sys.argv[2] if len(sys.argv) > 2 else "C1"
+    flash_leds.FRAME_MS = 50
+    flash_leds.PATTERN_REFRESH_MS = 1000
+
+    with LocalServer(emulator.REPO_DIR) as server, tempfile.TemporaryDirectory() as cache:
+        os.chdir(cache)
+        flash_leds.PATTERN_URL = server.base_url + "/ledpattern{}.txt"
+        flash_leds.TIME_URL = server.base_url + "/timestr.flask"
+        asyncio.run(run(seconds, colour))
+
+        refresh = flash_leds._refresh
+        print(f"{seconds} s: {refresh.scans} scans, {refresh.layers_changed} layer updates, "
+              f"{refresh.frames_skipped} repeated frames skipped, {server.requests} requests")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Checks the metrics status endpoint on loopback, and what recording costs.
+#
+#   python host/status_check.py [port]
+
+import json
+import socket
+import sys
+import threading
+import time
+import urllib.request
+
+import emulator
+emulator.install()
+
+import metrics
+
+def query(port: int, results: dict) -> None:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout = 5) as response:
+        results["http"] = json.loads(response.read())
+
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.settimeout(5)
+    udp.sendto(b"\n", ("127.0.0.1", port))
+    results["udp"] = json.loads(udp.recvfrom(2048)[0])
+    udp.close()
+
+def main() -> None:
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else metrics.STATUS_PORT
+
+    rounds = 100_000
+    start = time.perf_counter()
+    for i in range(rounds):
+        metrics.frame(i & 31)
+    per_frame = (time.perf_counter() - start) / rounds
+    metrics.fetch_done(time.ticks_ms() - 120)
+    metrics.count("cache_hits")
+    metrics.source("pin_writes", lambda: 1234)
+
+    metrics.serve(port, "127.0.0.1")
+    results = {}
+    client = threading.Thread(target = query, args = (port, results))
+    client.start()
+    polls = 0
+    poll_start = time.perf_counter()
+    while client.is_alive():
+        metrics.poll()
+        polls += 1
+    poll_time = time.perf_counter() - poll_start
+    client.join()
+    metrics.stop()
+
+    for kind in ("http", "udp"):
+        status = results.get(kind)
+        if status is None:
+            sys.exit(f"no {kind} reply")
+        print(f"{kind}: {status['frames']} frames, {status['late_frames']} late, jitter {status['jitter']}, "
+              f"fetch {status['fetch_last_ms']} ms, {status['cache_hits']} cache hits, "
+              f"{status['pin_writes']} pin writes")
+    print(f"metrics.frame {per_frame * 1e6:.2f} us, idle poll {poll_time / polls * 1e6:.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# HTTP client that keeps its connections.
+#
+# requests opens a new connection for every request and closes it after, so
+# each fetch from pi.hole or GitHub pays for a DNS lookup, a TCP connect and a
+# full TLS handshake, which on a Pico W takes longer than the transfer itself.
+# This speaks HTTP/1.1 and keeps one connection per host open between
+# requests, for both runtimes: get blocks as requests does, and aget (behind
+# asynchttp.get) waits on the same connections without holding up the event
+# loop. So the script fetched before a cycle and the time fetched during it
+# can share a connection to pi.hole whichever runtime the script uses.
+#
+# The request is written once, as coroutines. For get the socket blocks, so
+# they never have to wait and run to the end in a single step; for aget the
+# socket doesn't, and while it has nothing for them they sleep POLL_MS and
+# try again.
+#
+# When a connection has gone anyway (the server closed it while it sat idle),
+# the TLS session from it is offered on the next one where the ssl module
+# takes one, so the server can skip most of the handshake. That's CPython:
+# MicroPython's wrap_socket has no session argument, so on the Pico a new
+# connection is always a full handshake and keeping them is the saving.
+#
+# Only GET, with the same subset of the requests API the rest of the code
+# uses: status_code, headers, text, content, json(), raw and close(). The body
+# is read from the connection as it is asked for (raw.aread and
+# raw.areadinto after aget); raw.readinto reads no further than the end of
+# the body, and once it's all been read the connection goes back in the pool.
+# A response closed before then takes its connection with it.
+#
+# Every response has elapsed_ms, the time from sending the request to having
+# the headers, and connect_ms, the part of that spent connecting (0 when a
+# pooled connection was used). The pool counts connects, reuses and resumed
+# TLS sessions.
+
+import socket
+import select
+import errno
+from time import ticks_ms, ticks_diff
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+try:
+    import ssl
+except ImportError:
+    ssl = None
+from asynchttp import split_url
+from patterncache import get_header
+
+TIMEOUT_S = 10
+# Connections idle longer than this have most likely been closed by the
+# server, so they're closed here too rather than tried first
+IDLE_MS = 30000
+# Each open TLS connection holds tens of kB of buffers on a Pico W
+MAX_CONNECTIONS = 2
+# How long aget sleeps before trying a socket that wasn't ready again
+POLL_MS = 10
+# Read buffer of each connection, which is as long as a header line can be
+BUF_SIZE = 1024
+
+# How ssl says a non-blocking socket isn't ready
+_WANT = ()
+if ssl is not None and hasattr(ssl, "SSLWantReadError"):
+    _WANT = (ssl.SSLWantReadError, ssl.SSLWantWriteError)
+
+def _would_block(e: OSError) -> bool:
+    return isinstance(e, _WANT) or e.errno in (errno.EAGAIN, errno.EINPROGRESS)
+
+# Runs a request coroutine for get. The socket blocks, so it's done in one
+# step.
+def _run(coro):
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    coro.close()
+    raise OSError("blocking request had to wait")
+
+def _tls_context():
+    if ssl is None or not hasattr(ssl, "SSLContext"):
+        return None
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    # as requests does: the servers are on the LAN or well known, and the Pico
+    # has no certificate store to check against
+    try:
+        context.check_hostname = False
+    except AttributeError:
+        pass
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class Connection:
+    def __init__(self, key: tuple, raw):
+        self.key = key
+        self.raw = raw
+        self._use(raw)
+        self.buf = bytearray(BUF_SIZE)
+        # what's been read into buf and not used yet
+        self.start = 0
+        self.end = 0
+        self.blocking = True
+        self.timeout_ms = TIMEOUT_S * 1000
+        self.used_ms = ticks_ms()
+        self.requests = 0
+        self.resumed = False
+
+    def _use(self, sock) -> None:
+        self.sock = sock
+        # MicroPython's sockets only have readinto and write, CPython's
+        # recv_into and send
+        self._recv = getattr(sock, "recv_into", None) or sock.readinto
+        self._send = getattr(sock, "send", None) or sock.write
+
+    # Blocking up to timeout_ms for get, not at all for aget
+    def set_blocking(self, blocking: bool, timeout_ms: int) -> None:
+        # MicroPython's TLS sockets have no settimeout, but go by the one of
+        # the socket under them
+        target = self.sock if hasattr(self.sock, "settimeout") else self.raw
+        target.settimeout(timeout_ms / 1000 if blocking else 0)
+        self.blocking = blocking
+        self.timeout_ms = timeout_ms
+
+    # Waits before another try of a socket that wasn't ready, or gives up
+    # once it's been timeout_ms since the first
+    async def _wait(self, since: int) -> None:
+        if self.blocking or ticks_diff(ticks_ms(), since) > self.timeout_ms:
+            raise OSError(errno.ETIMEDOUT)
+        await asyncio.sleep(POLL_MS / 1000)
+
+    async def connect(self, addr) -> None:
+        try:
+            self.raw.connect(addr)
+        except OSError as e:
+            if not _would_block(e):
+                raise
+            poller = select.poll()
+            poller.register(self.raw, select.POLLOUT)
+            since = ticks_ms()
+            while not poller.poll(0):
+                await self._wait(since)
+
+    # Switches to the TLS socket wrapped around raw and finishes the
+    # handshake, if wrap_socket left it to be done
+    async def start_tls(self, sock) -> None:
+        self._use(sock)
+        # MicroPython has no do_handshake and does it on the first read or
+        # write instead
+        if not self.blocking and hasattr(sock, "do_handshake"):
+            since = ticks_ms()
+            while True:
+                try:
+                    sock.do_handshake()
+                    break
+                except OSError as e:
+                    if not _would_block(e):
+                        raise
+                await self._wait(since)
+        self.resumed = bool(getattr(sock, "session_reused", False))
+
+    async def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        since = ticks_ms()
+        while len(view):
+            try:
+                n = self._send(view)
+            except OSError as e:
+                if not _would_block(e):
+                    raise
+                n = None
+            if n:
+                view = view[n:]
+            else:
+                await self._wait(since)
+
+    async def _recv_into(self, view) -> int:
+        since = ticks_ms()
+        while True:
+            try:
+                n = self._recv(view)
+            except OSError as e:
+                if not _would_block(e):
+                    raise
+                n = None
+            if n is not None:
+                return n
+            await self._wait(since)
+
+    # A line up to and including its b"\n", or what's left at the end of the
+    # connection
+    async def readline(self) -> bytes:
+        while True:
+            pending = bytes(memoryview(self.buf)[self.start:self.end])
+            i = pending.find(b"\n")
+            if i >= 0:
+                self.start += i + 1
+                return pending[:i + 1]
+            if self.start == 0 and self.end == len(self.buf):
+                raise OSError("header line too long")
+            if self.start:
+                memoryview(self.buf)[:len(pending)] = pending
+                self.start = 0
+                self.end = len(pending)
+            n = await self._recv_into(memoryview(self.buf)[self.end:])
+            if not n:
+                self.start = self.end
+                return pending
+            self.end += n
+
+    async def readinto(self, view) -> int:
+        if self.start < self.end:
+            n = min(len(view), self.end - self.start)
+            view[:n] = memoryview(self.buf)[self.start:self.start + n]
+            self.start += n
+            return n
+        return await self._recv_into(view)
+
+    def session(self):
+        try:
+            return getattr(self.sock, "session", None)
+        except Exception:
+            return None
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+# The body of a response, read straight from the connection
+class Body:
+    def __init__(self, pool, conn: Connection, length: int, chunked: bool, keep: bool):
+        self.pool = pool
+        self.conn = conn
+        # bytes left in the body, or in the current chunk when chunked;
+        # -1 reads to the end of the connection
+        self.left = length
+        self.chunked = chunked
+        self.keep = keep
+        self.done = False
+        if chunked:
+            self.left = 0
+        elif length == 0:
+            self._finish()
+
+    def _finish(self) -> None:
+        self.done = True
+        conn = self.conn
+        self.conn = None
+        if conn is None:
+            return
+        if self.keep:
+            self.pool.release(conn)
+        else:
+            conn.close()
+
+    async def _next_chunk(self) -> None:
+        line = await self.conn.readline()
+        if not line:
+            raise OSError("connection closed in a chunked body")
+        self.left = int(line.split(b";", 1)[0].strip(), 16)
+        if self.left == 0:
+            # trailers, then the blank line that ends the body
+            while True:
+                line = await self.conn.readline()
+                if not line or line == b"\r\n":
+                    break
+            self._finish()
+
+    # Reads up to len(buf) bytes of the body into buf. Returns 0 at the end.
+    async def areadinto(self, buf) -> int:
+        if self.done or len(buf) == 0:
+            return 0
+        if self.chunked and self.left == 0:
+            await self._next_chunk()
+            if self.done:
+                return 0
+        view = memoryview(buf)
+        if self.left >= 0 and self.left < len(view):
+            view = view[:self.left]
+        n = await self.conn.readinto(view)
+        if not n:
+            if self.left > 0:
+                self.close()
+                raise OSError("connection closed in the body")
+            self._finish()
+            return 0
+        if self.left >= 0:
+            self.left -= n
+            if self.left == 0:
+                if self.chunked:
+                    # the CRLF after each chunk
+                    await self.conn.readline()
+                else:
+                    self._finish()
+        return n
+
+    def readinto(self, buf) -> int:
+        return _run(self.areadinto(buf))
+
+    # Reads up to n bytes, or the rest of the body
+    async def aread(self, n: int = -1) -> bytes:
+        if n >= 0:
+            buf = bytearray(n)
+            return bytes(buf[:await self.areadinto(buf)])
+        chunks = []
+        buf = bytearray(1024)
+        while True:
+            got = await self.areadinto(buf)
+            if not got:
+                break
+            chunks.append(bytes(buf[:got]))
+        return b"".join(chunks)
+
+    def read(self, n: int = -1) -> bytes:
+        return _run(self.aread(n))
+
+    # Gives up on the rest of the body, and the connection with it
+    def close(self) -> None:
+        if self.conn is not None:
+            self.pool.closed(self.conn)
+            self.conn.close()
+            self.conn = None
+        self.done = True
+
+
+class Response:
+    def __init__(self, status_code: int, headers: dict, body: Body, elapsed_ms: int, connect_ms: int):
+        self.status_code = status_code
+        self.headers = headers
+        self.raw = body
+        self.elapsed_ms = elapsed_ms
+        self.connect_ms = connect_ms
+        self._content = None
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self.raw.read()
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+    def close(self) -> None:
+        if not self.raw.done:
+            self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Pool:
+    def __init__(self, timeout: float = TIMEOUT_S, max_connections: int = MAX_CONNECTIONS):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # (ssl, host, port) -> idle Connection
+        self._idle = {}
+        # (host, port) -> TLS session from the last connection there
+        self._sessions = {}
+        self._context = None
+        self.connects = 0
+        self.reuses = 0
+        self.resumed = 0
+        self.retries = 0
+        self.last_ms = 0
+        self.last_connect_ms = 0
+
+    async def _connect(self, key: tuple, blocking: bool, timeout_ms: int) -> Connection:
+        use_ssl, host, port = key
+        addr = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][-1]
+        conn = Connection(key, socket.socket(socket.AF_INET, socket.SOCK_STREAM))
+        try:
+            conn.set_blocking(blocking, timeout_ms)
+            await conn.connect(addr)
+            if use_ssl:
+                await conn.start_tls(self._wrap(conn.raw, host, port, blocking))
+        except BaseException:
+            conn.close()
+            raise
+        if conn.resumed:
+            self.resumed += 1
+        self.connects += 1
+        return conn
+
+    # Wraps a socket for TLS, leaving the handshake to Connection.start_tls
+    # when it mustn't block
+    def _wrap(self, sock, host: str, port: int, blocking: bool):
+        if self._context is None:
+            self._context = _tls_context()
+        if self._context is None:
+            # older MicroPython: ssl.wrap_socket, which always does the
+            # handshake there and then
+            return ssl.wrap_socket(sock, server_hostname = host)
+        session = self._sessions.get((host, port))
+        if session is not None:
+            try:
+                return self._context.wrap_socket(sock, server_hostname = host, session = session,
+                                                 do_handshake_on_connect = blocking)
+            except TypeError:
+                pass
+        return self._context.wrap_socket(sock, server_hostname = host,
+                                         do_handshake_on_connect = blocking)
+
+    def _forget(self, conn: Connection) -> None:
+        session = conn.session()
+        if session is not None:
+            self._sessions[conn.key[1:]] = session
+        conn.close()
+
+    # Closes the connections that have sat idle longer than IDLE_MS. Called
+    # before each request, and by the asyncio runtime as it plays, so a
+    # connection isn't left holding its buffers until the next fetch.
+    def prune(self) -> None:
+        now = ticks_ms()
+        for key in [key for key in self._idle if ticks_diff(now, self._idle[key].used_ms) > IDLE_MS]:
+            self._forget(self._idle.pop(key))
+
+    # Called by Body once a response has been read to the end
+    def release(self, conn: Connection) -> None:
+        conn.used_ms = ticks_ms()
+        session = conn.session()
+        if session is not None:
+            self._sessions[conn.key[1:]] = session
+        old = self._idle.pop(conn.key, None)
+        if old is not None:
+            old.close()
+        while len(self._idle) >= self.max_connections:
+            oldest = None
+            for key in self._idle:
+                if oldest is None or ticks_diff(self._idle[key].used_ms, self._idle[oldest].used_ms) < 0:
+                    oldest = key
+            self._forget(self._idle.pop(oldest))
+        self._idle[conn.key] = conn
+
+    # Called by Body when it gives up on a connection
+    def closed(self, conn: Connection) -> None:
+        session = conn.session()
+        if session is not None:
+            self._sessions[conn.key[1:]] = session
+
+    async def _send(self, conn: Connection, host: str, port: int, path: str, headers: dict) -> tuple:
+        default_port = 443 if conn.key[0] else 80
+        lines = [f"GET {path} HTTP/1.1",
+                 f"Host: {host}" if port == default_port else f"Host: {host}:{port}",
+                 "Connection: keep-alive"]
+        for key in headers:
+            lines.append(f"{key}: {headers[key]}")
+        await conn.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+        status_line = await conn.readline()
+        parts = status_line.split(None, 2)
+        if len(parts) < 2:
+            raise OSError(f"bad status line {status_line}")
+        response_headers = {}
+        while True:
+            line = await conn.readline()
+            if not line or line == b"\r\n":
+                break
+            key, _, value = line.decode().partition(":")
+            response_headers[key.strip()] = value.strip()
+        return parts[0], int(parts[1]), response_headers
+
+    async def _request(self, url: str, headers: dict, blocking: bool, timeout_ms: int) -> Response:
+        use_ssl, host, port, path = split_url(url)
+        key = (use_ssl, host, port)
+        start = ticks_ms()
+        connect_ms = 0
+        self.prune()
+        conn = self._idle.pop(key, None)
+        while True:
+            fresh = conn is None
+            if fresh:
+                conn = await self._connect(key, blocking, timeout_ms)
+                connect_ms = ticks_diff(ticks_ms(), start)
+            try:
+                conn.set_blocking(blocking, timeout_ms)
+                version, status_code, response_headers = await self._send(conn, host, port, path, headers)
+                if not fresh:
+                    self.reuses += 1
+                break
+            except Exception:
+                self._forget(conn)
+                # a pooled connection the server had already closed; try once
+                # more on a new one
+                if fresh:
+                    raise
+                self.retries += 1
+                conn = None
+            except BaseException:
+                # cancelled part way through
+                self._forget(conn)
+                raise
+        conn.requests += 1
+
+        connection = (get_header(response_headers, "Connection") or "").lower()
+        keep = (version == b"HTTP/1.1" and connection != "close") or connection == "keep-alive"
+        chunked = "chunked" in (get_header(response_headers, "Transfer-Encoding") or "").lower()
+        length = get_header(response_headers, "Content-Length")
+        if status_code == 304 or status_code == 204 or 100 <= status_code < 200:
+            length = 0
+        elif chunked:
+            length = -1
+        elif length is not None:
+            length = int(length)
+        else:
+            # the body runs to the end of the connection
+            length = -1
+            keep = False
+        body = Body(self, conn, length, chunked, keep)
+
+        self.last_ms = ticks_diff(ticks_ms(), start)
+        self.last_connect_ms = connect_ms
+        return Response(status_code, response_headers, body, self.last_ms, connect_ms)
+
+    # Sends a GET and returns once the status and headers have arrived
+    def get(self, url: str, headers: dict = None) -> Response:
+        return _run(self._request(url, headers or {}, True, int(self.timeout * 1000)))
+
+    # get for the asyncio runtime. Each wait for the server gives up after
+    # timeout_ms; read the body with raw.aread or raw.areadinto.
+    async def aget(self, url: str, headers: dict = None, timeout_ms: int = None) -> Response:
+        return await self._request(url, headers or {}, False, timeout_ms or int(self.timeout * 1000))
+
+    # Closes every pooled connection. TLS sessions are kept.
+    def close(self) -> None:
+        for key in self._idle:
+            self._forget(self._idle[key])
+        self._idle = {}
+
+_pool = Pool()
+
+def pool() -> Pool:
+    return _pool
+
+def get(url: str, headers: dict = None) -> Response:
+    return _pool.get(url, headers)
+
+async def aget(url: str, headers: dict = None, timeout_ms: int = None) -> Response:
+    return await _pool.aget(url, headers, timeout_ms)
+
+def prune() -> None:
+    _pool.prune()
+
+def close() -> None:
+    _pool.close()
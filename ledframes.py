@@ -0,0 +1,114 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Compact storage for 4x4x4 cube patterns.
+#
+# Every frame is 64 bits (8 bytes) and all frames of an animation live in one
+# shared bytearray, instead of a list of lists of bools per voxel.
+#
+# Layout of a frame: layer l occupies bytes 2l and 2l+1, read as a little
+# endian 16-bit value. Within that value, voxel (row, col) is bit row*4 + col.
+# row indexes GRID_3D and col indexes GRID_3D[row], so a layer value is exactly
+# the set of columns that should be lit while that layer is enabled.
+#
+# Frames with brightness levels have 2-4 bits per voxel, stored as that many
+# 8-byte bit-planes one after the other, least significant first. Plane p of
+# a frame holds bit p of every voxel's level, and is shown for a time
+# proportional to 2**p (binary code modulation, see ledrefresh).
+#
+# Patterns can also carry a repeat count and a playback time in ms per frame.
+# Both are little endian 16-bit values in their own buffers, and are None when
+# the pattern doesn't specify them. A frame time of 0 means the default.
+
+FRAME_BYTES = 8
+
+class PatternFrames:
+    def __init__(self, count: int = 0, buf = None, bits: int = 1):
+        self.bits = bits
+        self.frame_bytes = FRAME_BYTES * bits
+        self.buf = bytearray(count * self.frame_bytes) if buf is None else buf
+        self.count = count
+        self.repeats = None
+        self.durations = None
+        # frame time for frames without their own, 0 to use the player's
+        self.default_ms = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    # Returns a zero-copy view of one frame's bytes, all its planes
+    def __getitem__(self, index: int) -> memoryview:
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("frame index out of range")
+        start = index * self.frame_bytes
+        return memoryview(self.buf)[start:start + self.frame_bytes]
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    # Appends an all-off frame and returns its index
+    def new_frame(self) -> int:
+        self.buf.extend(bytes(self.frame_bytes))
+        if self.durations is not None:
+            self.durations.extend(b"\0\0")
+        if self.repeats is not None:
+            self.repeats.extend(b"\1\0")
+        self.count += 1
+        return self.count - 1
+
+    def repeat(self, index: int) -> int:
+        if self.repeats is None:
+            return 1
+        return self.repeats[index * 2] | (self.repeats[index * 2 + 1] << 8)
+
+    def duration(self, index: int, default: int) -> int:
+        if self.durations is None:
+            return self.default_ms or default
+        return (self.durations[index * 2] | (self.durations[index * 2 + 1] << 8)) or self.default_ms or default
+
+    # The tables are created on first use, with defaults for earlier frames
+    def set_repeat(self, index: int, count: int) -> None:
+        if self.repeats is None:
+            self.repeats = bytearray(b"\1\0" * self.count)
+        count = max(1, min(count, 0xFFFF))
+        self.repeats[index * 2] = count & 0xFF
+        self.repeats[index * 2 + 1] = count >> 8
+
+    def set_duration(self, index: int, duration_ms: int) -> None:
+        if self.durations is None:
+            self.durations = bytearray(2 * self.count)
+        duration_ms = min(duration_ms, 0xFFFF)
+        self.durations[index * 2] = duration_ms & 0xFF
+        self.durations[index * 2 + 1] = duration_ms >> 8
+
+    def set_voxel(self, index: int, layer: int, row: int, col: int, on: bool = True) -> None:
+        self.set_level(index, layer, row, col, (1 << self.bits) - 1 if on else 0)
+
+    def set_level(self, index: int, layer: int, row: int, col: int, level: int) -> None:
+        offset = index * self.frame_bytes + layer * 2 + (row >> 1)
+        bit = 1 << ((row & 1) * 4 + col)
+        for plane in range(self.bits):
+            if level & (1 << plane):
+                self.buf[offset] |= bit
+            else:
+                self.buf[offset] &= ~bit & 0xFF
+            offset += FRAME_BYTES
+
+
+# 16-bit column mask of one layer of a frame
+def layer_bits(frame, layer: int) -> int:
+    return frame[layer * 2] | (frame[layer * 2 + 1] << 8)
+
+def get_voxel(frame, layer: int, row: int, col: int) -> bool:
+    return (layer_bits(frame, layer) >> (row * 4 + col)) & 1 == 1
+
+# Brightness level of a voxel, 0 to 2**bits - 1
+def get_level(frame, bits: int, layer: int, row: int, col: int) -> int:
+    level = 0
+    for plane in range(bits):
+        if (layer_bits(frame[plane * FRAME_BYTES:], layer) >> (row * 4 + col)) & 1:
+            level |= 1 << plane
+    return level
@@ -0,0 +1,160 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# GPIO output for the cube.
+#
+# Pin objects are built once from the LAYER/GRID_3D tables, and a whole layer
+# is written with the RP2040 SIO set/clear registers. Lighting a layer costs
+# at most two register writes, instead of a Pin construction and a write per
+# voxel.
+#
+# The output remembers which pins it has driven high, and only writes the
+# pins that change. Registers with nothing to change aren't written at all
+# and are counted in skipped.
+#
+# MockCubeOutput keeps the same interface without touching hardware, so
+# render cost can be measured under CPython.
+
+try:
+    import machine
+except ImportError:
+    machine = None
+
+# RP2040 single-cycle IO registers. Writing a mask sets/clears only those pins.
+SIO_GPIO_OUT_SET = 0xd0000014
+SIO_GPIO_OUT_CLR = 0xd0000018
+
+class CubeOutput:
+    def __init__(self, layers: list[int], grid: list[list[int]]):
+        self.pin_constructions = 0
+        self.writes = 0
+        self.skipped = 0
+        # pins currently driven high
+        self.shown = 0
+
+        self.layer_pins = [self._make_pin(pin) for pin in layers]
+        # indexed by row * 4 + col, the same bit order as ledframes
+        self.column_pins = [self._make_pin(grid[row][col]) for row in range(4) for col in range(4)]
+
+        self.layer_masks = [1 << pin for pin in layers]
+        self.all_layers = 0
+        for mask in self.layer_masks:
+            self.all_layers |= mask
+        self.column_masks = [1 << grid[row][col] for row in range(4) for col in range(4)]
+        self.all_columns = 0
+        for mask in self.column_masks:
+            self.all_columns |= mask
+
+        # 16-bit layer value -> GPIO mask, looked up one byte at a time
+        self._low = [self._byte_mask(grid, 0, b) for b in range(256)]
+        self._high = [self._byte_mask(grid, 2, b) for b in range(256)]
+
+    @staticmethod
+    def _byte_mask(grid: list[list[int]], first_row: int, value: int) -> int:
+        mask = 0
+        for bit in range(8):
+            if value & (1 << bit):
+                mask |= 1 << grid[first_row + (bit >> 2)][bit & 3]
+        return mask
+
+    def _make_pin(self, pin: int):
+        self.pin_constructions += 1
+        return machine.Pin(pin, machine.Pin.OUT)
+
+    # Clears the pins in clear_mask, then sets those in set_mask
+    def _store(self, set_mask: int, clear_mask: int) -> None:
+        if clear_mask:
+            machine.mem32[SIO_GPIO_OUT_CLR] = clear_mask
+            self.writes += 1
+        else:
+            self.skipped += 1
+        if set_mask:
+            machine.mem32[SIO_GPIO_OUT_SET] = set_mask
+            self.writes += 1
+        else:
+            self.skipped += 1
+
+    # Drives the pins in managed to match target, writing only the ones that change
+    def _apply(self, target: int, managed: int) -> None:
+        shown = self.shown
+        changed = (shown ^ target) & managed
+        if changed == 0:
+            self.skipped += 2
+            return
+        self.shown = shown ^ changed
+        self._store(changed & target, changed & shown)
+
+    def column_mask(self, bits: int) -> int:
+        return self._low[bits & 0xFF] | self._high[(bits >> 8) & 0xFF]
+
+    # Shows one layer with a precomputed column mask. Every other layer is
+    # switched off in the same write.
+    def show_layer_columns(self, layer: int, columns: int) -> None:
+        self._apply(columns | self.layer_masks[layer], self.all_layers | self.all_columns)
+
+    def show_layer(self, layer: int, bits: int) -> None:
+        self.show_layer_columns(layer, self.column_mask(bits))
+
+    # Enables one layer and switches the others off, leaving the columns alone
+    def select_layer(self, layer: int) -> None:
+        self._apply(self.layer_masks[layer], self.all_layers)
+
+    def set_layer(self, layer: int, on: bool) -> None:
+        mask = self.layer_masks[layer]
+        self._apply(mask if on else 0, mask)
+
+    # index is row * 4 + col
+    def set_column(self, index: int, on: bool) -> None:
+        mask = self.column_masks[index]
+        self._apply(mask if on else 0, mask)
+
+    # One pass over all four layers of a packed frame
+    def render_frame(self, frame) -> None:
+        for layer in range(4):
+            self.show_layer(layer, frame[layer * 2] | (frame[layer * 2 + 1] << 8))
+
+    def off(self) -> None:
+        self._apply(0, self.all_layers | self.all_columns)
+
+
+class MockCubeOutput(CubeOutput):
+    def _make_pin(self, pin: int):
+        self.pin_constructions += 1
+        return pin
+
+    def _store(self, set_mask: int, clear_mask: int) -> None:
+        self.writes += (1 if clear_mask else 0) + (1 if set_mask else 0)
+        self.skipped += (0 if clear_mask else 1) + (0 if set_mask else 1)
+
+    # GPIO levels as a bitmask of pin numbers
+    @property
+    def state(self) -> int:
+        return self.shown
+
+
+# Host benchmark: python ledgpio.py
+if __name__ == "__main__":
+    import time
+    from ledframes import PatternFrames
+
+    layers = [9,8,7,6]
+    grid = [[17, 16, 0, 1],
+            [19, 18, 2, 3],
+            [21, 20, 4, 5],
+            [26, 22, 28, 27]]
+
+    frames = PatternFrames(256)
+    for i in range(len(frames.buf)):
+        frames.buf[i] = (i * 37) & 0xFF
+
+    out = MockCubeOutput(layers, grid)
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            out.render_frame(frame)
+    elapsed = time.perf_counter() - start
+    nframes = rounds * len(frames)
+    print(f"{nframes} frames, {elapsed / nframes * 1e6:.2f} us/frame, "
+          f"{out.writes / nframes:.1f} writes/frame, {out.skipped / nframes:.1f} skipped/frame, "
+          f"{out.pin_constructions} pins built")
@@ -0,0 +1,136 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Timer driven layer multiplexing (persistence of vision).
+#
+# Only one layer of the cube can be shown at a time, so a timer steps through
+# layers 0-3, showing each for one tick. The refresh rate is fixed by the timer
+# rather than by how fast the animation loop runs.
+#
+# The animation side only calls swap() with a complete frame. It is diffed
+# against the previous frame, the GPIO masks of the layers that changed are
+# recomputed into the back buffer, and the timer switches buffers at the start
+# of the next scan, so a frame is never shown half old and half new. A frame
+# identical to the previous one is dropped without touching the buffers.
+#
+# Frames with brightness levels are shown with binary code modulation. Each
+# layer is shown once per bit-plane, and plane p is held for 2**p timer ticks,
+# so a voxel is lit for a time proportional to its level. The GPIOs are still
+# only written once per plane per layer; the ticks in between just count down.
+
+import machine
+
+# Per layer refresh rate. The timer runs four times faster, times the ticks
+# per layer for frames with brightness levels.
+LAYER_HZ = 500
+# The fastest the timer is run. Frames with more bits get a lower layer rate
+# rather than a timer the Pico can't keep up with.
+MAX_TICK_HZ = 8000
+
+class RefreshEngine:
+    def __init__(self, output, layer_hz: int = LAYER_HZ):
+        self.output = output
+        self.layer_hz = layer_hz
+        self.bits = 1
+        # GPIO column masks, plane * 4 + layer
+        self.front = [0, 0, 0, 0]
+        self.back = [0, 0, 0, 0]
+        self.latest = [0, 0, 0, 0]
+        # raw bytes of the last frame handed over
+        self.raw = bytearray(8)
+        self.pending = False
+        self.layer = 0
+        self.plane = 0
+        # ticks left before the next plane
+        self.wait = 0
+        self.scans = 0
+        self.frames_skipped = 0
+        self.layers_changed = 0
+        self.timer = None
+        # bound once, so the timer callback doesn't allocate
+        self._tick_cb = self.tick
+
+    # Timer frequency for the current bits per voxel
+    def tick_hz(self) -> int:
+        ticks = 4 * ((1 << self.bits) - 1)
+        return min(self.layer_hz * ticks, MAX_TICK_HZ // ticks * ticks)
+
+    # Switches to frames with a different number of bit-planes. Allocates,
+    # but only when the depth changes.
+    def set_bits(self, bits: int) -> None:
+        running = self.timer is not None
+        if running:
+            self.timer.deinit()
+            self.timer = None
+        self.bits = bits
+        self.front = [0] * (4 * bits)
+        self.back = [0] * (4 * bits)
+        self.latest = [0] * (4 * bits)
+        self.raw = bytearray(8 * bits)
+        self.pending = False
+        if running:
+            self.start()
+
+    # Hands a complete frame to the scanner
+    def swap(self, frame) -> None:
+        if len(frame) != len(self.raw):
+            self.set_bits(len(frame) // 8)
+        raw = self.raw
+        latest = self.latest
+        changed = False
+        for i in range(0, len(raw), 2):
+            low = frame[i]
+            high = frame[i + 1]
+            if low != raw[i] or high != raw[i + 1]:
+                raw[i] = low
+                raw[i + 1] = high
+                latest[i >> 1] = self.output.column_mask(low | (high << 8))
+                self.layers_changed += 1
+                changed = True
+        if not changed:
+            self.frames_skipped += 1
+            return
+
+        # the timer mustn't pick up the back buffer while it's being filled
+        self.pending = False
+        back = self.back
+        for i in range(len(back)):
+            back[i] = latest[i]
+        self.pending = True
+
+    # Shows the next layer, or plane of a layer. Called from the timer.
+    def tick(self, timer = None) -> None:
+        if self.wait:
+            self.wait -= 1
+            return
+        layer = self.layer
+        plane = self.plane
+        if layer == 0 and plane == 0 and self.pending:
+            self.front, self.back = self.back, self.front
+            self.pending = False
+        self.output.show_layer_columns(layer, self.front[plane * 4 + layer])
+        self.wait = (1 << plane) - 1
+        if plane + 1 < self.bits:
+            self.plane = plane + 1
+            return
+        self.plane = 0
+        if layer == 3:
+            self.layer = 0
+            self.scans += 1
+        else:
+            self.layer = layer + 1
+
+    def start(self) -> None:
+        if self.timer is not None:
+            return
+        self.layer = 0
+        self.plane = 0
+        self.wait = 0
+        self.timer = machine.Timer(-1)
+        self.timer.init(freq = self.tick_hz(), mode = machine.Timer.PERIODIC, callback = self._tick_cb)
+
+    def stop(self) -> None:
+        if self.timer is not None:
+            self.timer.deinit()
+            self.timer = None
+        self.output.off()
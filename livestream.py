@@ -0,0 +1,117 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Live frames pushed over UDP.
+#
+# Each datagram carries one whole frame, little endian:
+#   0   magic b"LEDS"
+#   4   version (1)
+#   5   bits per voxel, as in patternbin
+#   6   sequence number (16-bit), one more for every frame sent
+#   8   the frame, 8 bytes per bit in the ledframes layout
+#
+# UDP suits this better than a stream: a frame that arrives late is no use,
+# and a lost one is simply replaced by the next. LiveReceiver only ever
+# keeps the newest frame. A datagram is read whole into a scratch buffer and
+# checked before it is copied, so a frame is never half updated; the refresh
+# engine's own double buffer then swaps it in between scans.
+#
+# poll() never blocks, and allocates nothing. The stream counts as stopped
+# when no frame has come for timeout_ms, and the player goes back to the
+# pattern it had.
+
+import socket
+import struct
+from time import ticks_ms, ticks_diff
+
+MAGIC = b"LEDS"
+VERSION = 1
+HEADER_SIZE = 8
+LIVE_PORT = 5005
+TIMEOUT_MS = 2000
+
+_HEADER = "<4sBBH"
+
+def pack(frame, seq: int, bits: int = 1) -> bytes:
+    return struct.pack(_HEADER, MAGIC, VERSION, bits, seq & 0xFFFF) + bytes(frame)
+
+class LiveReceiver:
+    def __init__(self, port: int = LIVE_PORT, host: str = "0.0.0.0", timeout_ms: int = TIMEOUT_MS):
+        self.port = port
+        self.host = host
+        self.timeout_ms = timeout_ms
+        # newest frame, bits * 8 bytes
+        self.frame = bytearray(8)
+        self.bits = 1
+        self.seq = -1
+        self.last_ms = 0
+        self.received = 0
+        self.stale = 0
+        self.invalid = 0
+        self.sock = None
+        # one byte spare, so an oversized datagram shows up as the wrong size
+        self._scratch = bytearray(HEADER_SIZE + 8 * 4 + 1)
+        self._read = None
+
+    def start(self) -> None:
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(addr)
+        self.sock.setblocking(False)
+        # MicroPython's sockets only have readinto, CPython's only recv_into
+        self._read = getattr(self.sock, "recv_into", None) or self.sock.readinto
+        print(f"live frames on port {self.port}")
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    # Reads everything waiting. Returns True if a new frame arrived.
+    def poll(self) -> bool:
+        if self.sock is None:
+            return False
+        fresh = False
+        scratch = self._scratch
+        while True:
+            # reading the non-blocking socket until it's empty, rather than
+            # polling first, allocates nothing when there's nothing to read
+            try:
+                n = self._read(scratch)
+            except OSError:
+                break
+            if n is None:
+                break
+            if n < HEADER_SIZE or scratch[0] != MAGIC[0] or scratch[1] != MAGIC[1] \
+                    or scratch[2] != MAGIC[2] or scratch[3] != MAGIC[3] or scratch[4] != VERSION:
+                self.invalid += 1
+                continue
+            bits = scratch[5]
+            if bits < 1 or bits > 4 or n != HEADER_SIZE + 8 * bits:
+                self.invalid += 1
+                continue
+            seq = scratch[6] | (scratch[7] << 8)
+            # older than what we have, within half the sequence space
+            if self.seq >= 0 and 0 < ((self.seq - seq) & 0xFFFF) < 0x8000:
+                self.stale += 1
+                continue
+            if bits != self.bits:
+                self.bits = bits
+                self.frame = bytearray(8 * bits)
+            frame = self.frame
+            for i in range(n - HEADER_SIZE):
+                frame[i] = scratch[HEADER_SIZE + i]
+            self.seq = seq
+            self.received += 1
+            self.last_ms = ticks_ms()
+            fresh = True
+        return fresh
+
+    # True while frames keep coming
+    def active(self) -> bool:
+        return self.seq >= 0 and ticks_diff(ticks_ms(), self.last_ms) < self.timeout_ms
+
+    # Forgets the stream, so the next one is accepted from any sequence number
+    def reset(self) -> None:
+        self.seq = -1
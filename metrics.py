@@ -0,0 +1,319 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Runtime counters, and a status endpoint to read them over the network.
+#
+# Recording is a dict increment, or for a frame a walk over a few histogram
+# bounds, with nothing allocated. Everything costlier (free heap, values read
+# from sources such as the pin write count, JSON) happens only when a
+# snapshot is asked for.
+#
+# StatusServer answers both HTTP on TCP and any UDP datagram on the same port
+# with the snapshot as JSON:
+#   curl http://<pico>:8080/
+#   echo | nc -u -w1 <pico> 8080
+# host/status_check.py tries both on loopback.
+#
+# The server never blocks. poll() checks the sockets with a zero timeout and
+# is meant to be called once per frame, or from a task.
+
+import errno
+import gc
+import json
+import select
+import socket
+from time import ticks_ms, ticks_diff
+
+STATUS_PORT = 8080
+
+# Upper bounds in ms of the frame jitter histogram buckets. The last bucket
+# holds everything above.
+JITTER_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200)
+# A frame shown this much after the start of its slot counts as late
+LATE_MS = 10
+
+counters = {
+    "frames": 0,
+    "late_frames": 0,
+    "dropped_frames": 0,
+    "fetches": 0,
+    "fetch_errors": 0,
+    "cache_hits": 0,
+    "wifi_reconnects": 0,
+}
+jitter = [0] * (len(JITTER_BOUNDS) + 1)
+fetch_last_ms = 0
+fetch_max_ms = 0
+fetch_total_ms = 0
+heap_min = None
+# name -> function returning a value, read at snapshot time
+_sources = {}
+# uptime, added up on each poll, as a single ticks_diff wraps after about
+# 6 days and warm restarts keep the board up for weeks
+uptime_ms = 0
+_uptime_at = ticks_ms()
+server = None
+# ms from boot() to the first frame and to the network coming up, None until
+# they happen
+boot_times = {
+    "first_frame_ms": None,
+    "online_ms": None,
+}
+_boot_ticks = None
+
+def count(name: str, n: int = 1) -> None:
+    counters[name] += n
+
+# A frame was shown jitter_ms after the start of its slot
+def frame(jitter_ms: int) -> None:
+    counters["frames"] += 1
+    if boot_times["first_frame_ms"] is None:
+        milestone("first_frame_ms")
+    if jitter_ms < 0:
+        jitter_ms = -jitter_ms
+    if jitter_ms >= LATE_MS:
+        counters["late_frames"] += 1
+    bucket = 0
+    for bound in JITTER_BOUNDS:
+        if jitter_ms <= bound:
+            break
+        bucket += 1
+    jitter[bucket] += 1
+
+# A fetch that started at start_ticks (ticks_ms) has succeeded. Failed ones
+# are only counted, in fetch_errors.
+def fetch_done(start_ticks: int) -> None:
+    global fetch_last_ms, fetch_max_ms, fetch_total_ms
+    ms = ticks_diff(ticks_ms(), start_ticks)
+    counters["fetches"] += 1
+    fetch_last_ms = ms
+    fetch_total_ms += ms
+    if ms > fetch_max_ms:
+        fetch_max_ms = ms
+    free_heap()
+
+# Starts timing the boot from start_ticks (ticks_ms)
+def boot(start_ticks: int) -> None:
+    global _boot_ticks
+    _boot_ticks = start_ticks
+    for name in boot_times:
+        boot_times[name] = None
+
+# Records the time since boot() the first time name happens
+def milestone(name: str) -> None:
+    if _boot_ticks is None or boot_times[name] is not None:
+        return
+    boot_times[name] = ticks_diff(ticks_ms(), _boot_ticks)
+    print(f"boot: {name} = {boot_times[name]}")
+
+def _uptime() -> int:
+    global uptime_ms, _uptime_at
+    now = ticks_ms()
+    uptime_ms += ticks_diff(now, _uptime_at)
+    _uptime_at = now
+    return uptime_ms
+
+def source(name: str, fn) -> None:
+    _sources[name] = fn
+
+# Free heap in bytes, None where gc can't tell (CPython)
+def free_heap():
+    global heap_min
+    if not hasattr(gc, "mem_free"):
+        return None
+    free = gc.mem_free()
+    if heap_min is None or free < heap_min:
+        heap_min = free
+    return free
+
+def snapshot() -> dict:
+    fetches = counters["fetches"]
+    values = {
+        "uptime_ms": _uptime(),
+        "jitter_bounds_ms": list(JITTER_BOUNDS),
+        "jitter": list(jitter),
+        "fetch_last_ms": fetch_last_ms,
+        "fetch_max_ms": fetch_max_ms,
+        "fetch_avg_ms": fetch_total_ms // fetches if fetches else 0,
+        "heap_free": free_heap(),
+        "heap_min": heap_min,
+    }
+    for name in counters:
+        values[name] = counters[name]
+    for name in boot_times:
+        values[name] = boot_times[name]
+    for name in _sources:
+        try:
+            values[name] = _sources[name]()
+        except Exception:
+            values[name] = None
+    return values
+
+def reset() -> None:
+    global fetch_last_ms, fetch_max_ms, fetch_total_ms, heap_min
+    for name in counters:
+        counters[name] = 0
+    for i in range(len(jitter)):
+        jitter[i] = 0
+    fetch_last_ms = 0
+    fetch_max_ms = 0
+    fetch_total_ms = 0
+    heap_min = None
+
+
+class StatusServer:
+    # Connections waiting for their request line, and connections with part
+    # of a reply still to send. Older ones are dropped.
+    MAX_PENDING = 2
+
+    def __init__(self, port: int = STATUS_PORT, host: str = "0.0.0.0"):
+        self.port = port
+        self.host = host
+        self.tcp = None
+        self.udp = None
+        self.poller = None
+        self.pending = []
+        # [connection, rest of its reply] for replies the socket hasn't taken
+        # all of yet, finished on later polls
+        self.sending = []
+        self.requests = 0
+        # CPython's poll reports file descriptors, MicroPython's the sockets
+        self._by_fd = {}
+
+    def _register(self, sock) -> None:
+        sock.setblocking(False)
+        self.poller.register(sock, select.POLLIN)
+        if hasattr(sock, "fileno"):
+            self._by_fd[sock.fileno()] = sock
+
+    def _unregister(self, sock) -> None:
+        try:
+            self.poller.unregister(sock)
+        except Exception:
+            pass
+        if hasattr(sock, "fileno"):
+            self._by_fd.pop(sock.fileno(), None)
+        sock.close()
+
+    def start(self) -> None:
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self.poller = select.poll()
+        self._ipoll = getattr(self.poller, "ipoll", self.poller.poll)
+
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.tcp.bind(addr)
+        self.tcp.listen(2)
+        self._register(self.tcp)
+
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.udp.bind(addr)
+        self._register(self.udp)
+        print(f"status on port {self.port}")
+
+    def close(self) -> None:
+        for sock in self.pending:
+            self._unregister(sock)
+        self.pending = []
+        for conn, _ in self.sending:
+            self._unregister(conn)
+        self.sending = []
+        for sock in (self.tcp, self.udp):
+            if sock is not None:
+                self._unregister(sock)
+        self.tcp = None
+        self.udp = None
+
+    # Answers whatever is waiting, without blocking
+    def poll(self) -> None:
+        if self.poller is None:
+            return
+        # MicroPython's ipoll doesn't allocate, so the render loop can call
+        # this every frame. It can't carry on past sockets being registered
+        # or closed, so one is handled per call; the rest wait for the next.
+        for obj, _ in self._ipoll(0):
+            sock = self._by_fd.get(obj, obj)
+            try:
+                if sock is self.tcp:
+                    self._accept()
+                elif sock is self.udp:
+                    _, addr = self.udp.recvfrom(64)
+                    self.requests += 1
+                    self.udp.sendto(json.dumps(snapshot()).encode(), addr)
+                elif sock in self.pending:
+                    self._answer(sock)
+                else:
+                    self._send_more(sock)
+            except OSError as e:
+                print(f"status request failed: {e}")
+            break
+
+    def _accept(self) -> None:
+        conn, _ = self.tcp.accept()
+        if len(self.pending) >= self.MAX_PENDING:
+            self._unregister(self.pending.pop(0))
+        self.pending.append(conn)
+        self._register(conn)
+
+    def _answer(self, conn) -> None:
+        self.pending.remove(conn)
+        try:
+            conn.recv(512)
+            self.requests += 1
+            body = json.dumps(snapshot()).encode()
+            head = b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n" \
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+        except BaseException:
+            self._unregister(conn)
+            raise
+        # the socket may not take it all at once; the rest goes when it's
+        # ready for more, without ever blocking the frame loop
+        if len(self.sending) >= self.MAX_PENDING:
+            self._unregister(self.sending.pop(0)[0])
+        self.sending.append([conn, memoryview(head + body)])
+        self.poller.modify(conn, select.POLLOUT)
+        self._send_more(conn)
+
+    def _send_more(self, conn) -> None:
+        for entry in self.sending:
+            if entry[0] is conn:
+                break
+        else:
+            return
+        try:
+            sent = conn.send(entry[1])
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                self.sending.remove(entry)
+                self._unregister(conn)
+                raise
+            sent = 0
+        entry[1] = entry[1][sent or 0:]
+        if not len(entry[1]):
+            self.sending.remove(entry)
+            self._unregister(conn)
+
+# Starts the status server, if it isn't running already
+def serve(port: int = STATUS_PORT, host: str = "0.0.0.0") -> None:
+    global server
+    if server is not None:
+        return
+    try:
+        status = StatusServer(port, host)
+        status.start()
+        server = status
+    except OSError as e:
+        print(f"status server not started: {e}")
+
+def poll() -> None:
+    _uptime()
+    if server is not None:
+        server.poll()
+
+def stop() -> None:
+    global server
+    if server is not None:
+        server.close()
+        server = None
+
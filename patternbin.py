@@ -0,0 +1,114 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Binary pattern container.
+#
+# Layout, all values little endian:
+#   0   magic b"LEDP"
+#   4   version (1)
+#   5   flags, FLAG_REPEATS | FLAG_DURATIONS
+#   6   bits per voxel, 1 for on/off or 2-4 for brightness levels
+#   7   reserved
+#   8   frame count (32-bit)
+#   12  default frame time in ms, 0 for the player's default (16-bit)
+#   14  reserved (16-bit)
+#   16  frame table, 8 bytes per bit per frame in the ledframes layout
+#       repeat counts, 16-bit per frame, if FLAG_REPEATS
+#       frame times in ms, 16-bit per frame, if FLAG_DURATIONS
+#
+# Runs of identical frames are stored once with a repeat count. The frame
+# table is used in place through a memoryview, so loading doesn't copy frames.
+
+import struct
+from ledframes import PatternFrames, FRAME_BYTES
+
+MAGIC = b"LEDP"
+VERSION = 1
+MAX_BITS = 4
+HEADER_SIZE = 16
+FLAG_REPEATS = 1
+FLAG_DURATIONS = 2
+
+_HEADER = "<4sBBBBIHH"
+
+def is_binary(data) -> bool:
+    return len(data) >= 4 and bytes(data[:4]) == MAGIC
+
+# Returns (flags, bits, frame count, default ms)
+def parse_header(data) -> tuple:
+    if len(data) < HEADER_SIZE:
+        raise ValueError("truncated pattern header")
+    magic, version, flags, bits, _, count, default_ms, _ = struct.unpack_from(_HEADER, data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a binary pattern")
+    if version != VERSION:
+        raise ValueError(f"unsupported pattern version {version}")
+    if bits < 1 or bits > MAX_BITS:
+        raise ValueError(f"unsupported bits per voxel {bits}")
+    return flags, bits, count, default_ms
+
+# Total size of a pattern, worked out from its header
+def pattern_size(data) -> int:
+    flags, bits, count, _ = parse_header(data)
+    size = HEADER_SIZE + count * FRAME_BYTES * bits
+    if flags & FLAG_REPEATS:
+        size += count * 2
+    if flags & FLAG_DURATIONS:
+        size += count * 2
+    return size
+
+def load(data) -> PatternFrames:
+    flags, bits, count, default_ms = parse_header(data)
+    if len(data) < pattern_size(data):
+        raise ValueError("truncated pattern")
+
+    view = memoryview(data)
+    pos = HEADER_SIZE
+    end = pos + count * FRAME_BYTES * bits
+    frames = PatternFrames(count, view[pos:end], bits)
+    frames.default_ms = default_ms
+    pos = end
+    if flags & FLAG_REPEATS:
+        frames.repeats = view[pos:pos + count * 2]
+        for index in range(count):
+            if frames.repeat(index) < 1:
+                raise ValueError(f"frame {index} has a repeat count of 0")
+        pos += count * 2
+    if flags & FLAG_DURATIONS:
+        frames.durations = view[pos:pos + count * 2]
+    return frames
+
+# default_ms replaces the pattern's own default frame time if given
+def dump(frames: PatternFrames, rle: bool = True, default_ms: int = None) -> bytearray:
+    if default_ms is None:
+        default_ms = frames.default_ms or 0
+    has_durations = frames.durations is not None
+    # (frame index, repeat count) per stored frame
+    runs = []
+    for index in range(len(frames)):
+        repeat = frames.repeat(index)
+        if rle and runs:
+            last, last_repeat = runs[-1]
+            if last_repeat + repeat <= 0xFFFF \
+                    and bytes(frames[last]) == bytes(frames[index]) \
+                    and frames.duration(last, 0) == frames.duration(index, 0):
+                runs[-1] = (last, last_repeat + repeat)
+                continue
+        runs.append((index, repeat))
+
+    has_repeats = False
+    for _, repeat in runs:
+        if repeat != 1:
+            has_repeats = True
+
+    flags = (FLAG_REPEATS if has_repeats else 0) | (FLAG_DURATIONS if has_durations else 0)
+    out = bytearray(struct.pack(_HEADER, MAGIC, VERSION, flags, frames.bits, 0, len(runs), default_ms, 0))
+    for index, _ in runs:
+        out += frames[index]
+    if has_repeats:
+        for _, repeat in runs:
+            out += struct.pack("<H", repeat)
+    if has_durations:
+        for index, _ in runs:
+            out += struct.pack("<H", frames.duration(index, 0))
+    return out
@@ -0,0 +1,106 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Flash cache for downloaded patterns.
+#
+# Each URL gets two files in CACHE_DIR, named after a hash of the URL: the
+# parsed pattern in the binary format (.led), and the ETag/Last-Modified the
+# server sent with it (.meta). Those are sent back as a conditional GET, so an
+# unchanged pattern costs a 304 with no body and no parsing. The cached copy is
+# also what we fall back to when the network is down.
+
+import os
+import json
+import hashlib
+import binascii
+import patternbin
+from ledframes import PatternFrames
+
+CACHE_DIR = "cache"
+
+def _path(url: str, ext: str) -> str:
+    key = binascii.hexlify(hashlib.sha256(url.encode()).digest()[:8]).decode()
+    return f"{CACHE_DIR}/{key}{ext}"
+
+# Writes a file under a temporary name first, so a reset mid-write can't leave
+# a half written file behind
+def _write(path: str, data) -> None:
+    try:
+        os.mkdir(CACHE_DIR)
+    except OSError:
+        pass
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.rename(path + ".tmp", path)
+
+# Case-insensitive header lookup, as MicroPython keeps the server's spelling
+def get_header(headers, name: str) -> str:
+    if headers is None:
+        return None
+    name = name.lower()
+    for key in headers:
+        if key.lower() == name:
+            return headers[key]
+    return None
+
+def load_meta(url: str) -> dict:
+    try:
+        with open(_path(url, ".meta")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# True if frames has something to play: at least one frame, each shown at
+# least once
+def usable(frames: PatternFrames) -> bool:
+    if frames is None or len(frames) == 0:
+        return False
+    for index in range(len(frames)):
+        if frames.repeat(index) < 1:
+            return False
+    return True
+
+# Returns the cached pattern, or None if there isn't a usable one
+def load(url: str) -> PatternFrames:
+    try:
+        with open(_path(url, ".led"), "rb") as f:
+            frames = patternbin.load(f.read())
+    except OSError:
+        return None
+    except ValueError as e:
+        print(f"cached pattern unusable: {e}")
+        return None
+    if not usable(frames):
+        print("cached pattern unusable: no frames")
+        return None
+    return frames
+
+# A failed write only costs the cache, never the pattern we just downloaded.
+# The old .meta goes first and the new one is only written once the .led is,
+# so its ETag never ends up next to a pattern it wasn't sent with.
+def store(url: str, frames: PatternFrames, headers) -> None:
+    if not usable(frames):
+        print("pattern not cached: no frames")
+        return
+    meta = {
+        "etag": get_header(headers, "ETag"),
+        "last_modified": get_header(headers, "Last-Modified"),
+    }
+    try:
+        try:
+            os.remove(_path(url, ".meta"))
+        except OSError:
+            pass
+        _write(_path(url, ".led"), patternbin.dump(frames))
+        _write(_path(url, ".meta"), json.dumps(meta).encode())
+    except OSError as e:
+        print(f"pattern not cached: {e}")
+
+# Headers for a conditional GET against the cached copy
+def conditional_headers(meta: dict) -> dict:
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
@@ -0,0 +1,222 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Incremental parser for the text pattern format.
+#
+# One line per frame. Within a line, a single space separates rows and a
+# double space separates layers. Voxels are written straight into the packed
+# frame buffer; anything outside the 4x4x4 cube is ignored, missing voxels
+# stay off and blank lines don't produce a frame.
+#
+# A line can end with timing for its frame: @<ms> to show it for that long
+# instead of the default, and *<n> to show it n times in a row, e.g.
+#   1111 1111 1111 1111  0000 0000 0000 0000  0000 0000 0000 0000  1111 1111 1111 1111  @2000 *3
+#
+# Lines starting with # are comments. "#bits 2" (up to 4) before the first
+# frame makes every voxel a brightness level instead of on/off, written as
+# one digit from 0 to 2**bits - 1, hex for 4 bits:
+#   #bits 4
+#   f840 0000 0000 0000  048f 0000 0000 0000  0000 0000 0000 0000  0000 0000 0000 0000
+#
+# Text can be fed in chunks of any size, split anywhere, so a download can be
+# parsed as it arrives without holding the whole file. Each finished frame is
+# passed to on_frame(frames, index). With keep=False only one frame is held
+# at a time, so memory use doesn't depend on the length of the pattern at all.
+
+from ledframes import PatternFrames
+
+_SPACE = 0x20
+_ZERO = 0x30
+_ONE = 0x31
+_NINE = 0x39
+_NEWLINE = 0x0A
+_AT = 0x40
+_STAR = 0x2A
+_HASH = 0x23
+_LOWER_A = 0x61
+_LOWER_F = 0x66
+
+# longest comment line kept, enough for a directive
+_COMMENT_MAX = 32
+
+class PatternParser:
+    def __init__(self, on_frame = None, keep: bool = True):
+        self.on_frame = on_frame
+        self.keep = keep
+        self.frames = PatternFrames(0 if keep else 1)
+        self.count = 0
+        # index of the frame being filled, -1 between frames
+        self._frame = -1
+        self._layer = 0
+        self._row = 0
+        self._col = 0
+        self._flag = False
+        # timing for the current line, -1 if not given
+        self._duration = -1
+        self._repeat = -1
+        # number being read after @ or *, 0 when not reading one
+        self._number = 0
+        self._value = 0
+        # text of the comment being read, None outside comments
+        self._comment = None
+
+    def _start_frame(self) -> int:
+        if self.keep:
+            return self.frames.new_frame()
+        frames = self.frames
+        buf = frames.buf
+        for i in range(frames.frame_bytes):
+            buf[i] = 0
+        if frames.durations is not None:
+            frames.set_duration(0, 0)
+        if frames.repeats is not None:
+            frames.set_repeat(0, 1)
+        return 0
+
+    def _end_number(self) -> None:
+        if self._number == _AT:
+            self._duration = self._value
+        elif self._number == _STAR:
+            # a frame shown no times would leave a pattern with nothing to play
+            if self._value < 1:
+                raise ValueError(f"repeat count {self._value} must be at least 1")
+            self._repeat = self._value
+        self._number = 0
+
+    def _directive(self, text) -> None:
+        words = bytes(text).split()
+        if len(words) == 2 and words[0] == b"bits":
+            self._set_bits(int(words[1]))
+
+    def _set_bits(self, bits: int) -> None:
+        if bits == self.frames.bits:
+            return
+        if bits < 1 or bits > 4:
+            raise ValueError(f"unsupported bits per voxel {bits}")
+        if self.count or self._frame >= 0:
+            raise ValueError("#bits must come before the first frame")
+        self.frames = PatternFrames(0 if self.keep else 1, bits = bits)
+
+    def _end_line(self) -> None:
+        self._end_number()
+        frame = self._frame
+        if frame >= 0:
+            if self._duration >= 0:
+                self.frames.set_duration(frame, self._duration)
+            if self._repeat >= 0:
+                self.frames.set_repeat(frame, self._repeat)
+            self._frame = -1
+            self.count += 1
+            if self.on_frame is not None:
+                self.on_frame(self.frames, frame)
+        self._duration = -1
+        self._repeat = -1
+
+    def feed(self, chunk) -> None:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        frames = self.frames
+        buf = frames.buf
+        bits = frames.bits
+        frame_bytes = frames.frame_bytes
+        top = (1 << bits) - 1
+        frame = self._frame
+        layer = self._layer
+        row = self._row
+        col = self._col
+        flag = self._flag
+
+        for c in chunk:
+            if self._comment is not None:
+                if c != _NEWLINE:
+                    if len(self._comment) < _COMMENT_MAX:
+                        self._comment.append(c)
+                    continue
+                if frame < 0:
+                    self._directive(self._comment)
+                    frames = self.frames
+                    buf = frames.buf
+                    bits = frames.bits
+                    frame_bytes = frames.frame_bytes
+                    top = (1 << bits) - 1
+                self._comment = None
+
+            if self._number:
+                if _ZERO <= c <= _NINE:
+                    self._value = self._value * 10 + c - _ZERO
+                    continue
+                self._end_number()
+
+            if c == _SPACE:
+                if not flag:
+                    flag = True
+                    row += 1
+                else:
+                    flag = False
+                    layer += 1
+                    row = 0
+                col = 0
+                continue
+
+            flag = False
+            level = -1
+            if c == _ZERO or c == _ONE:
+                level = c - _ZERO
+            elif bits > 1:
+                if _ZERO <= c <= _NINE:
+                    level = c - _ZERO
+                elif _LOWER_A <= (c | 0x20) <= _LOWER_F:
+                    level = (c | 0x20) - _LOWER_A + 10
+            if level >= 0:
+                if frame < 0:
+                    frame = self._start_frame()
+                    self._frame = frame
+                    buf = frames.buf
+                if level and layer < 4 and row < 4 and col < 4:
+                    offset = frame * frame_bytes + layer * 2 + (row >> 1)
+                    bit = 1 << ((row & 1) * 4 + col)
+                    if bits == 1:
+                        buf[offset] |= bit
+                    else:
+                        if level > top:
+                            level = top
+                        while level:
+                            if level & 1:
+                                buf[offset] |= bit
+                            level >>= 1
+                            offset += 8
+                col += 1
+                continue
+            if c == _AT or c == _STAR:
+                self._number = c
+                self._value = 0
+                continue
+            if c == _HASH:
+                self._comment = bytearray()
+                continue
+            if c == _NEWLINE:
+                self._frame = frame
+                self._end_line()
+                frame = -1
+                layer = 0
+                row = 0
+                col = 0
+
+        self._frame = frame
+        self._layer = layer
+        self._row = row
+        self._col = col
+        self._flag = flag
+
+    # Completes the last frame if the text didn't end with a newline
+    def finish(self) -> PatternFrames:
+        if self._comment is not None:
+            if self._frame < 0:
+                self._directive(self._comment)
+            self._comment = None
+        self._end_line()
+        self._layer = 0
+        self._row = 0
+        self._col = 0
+        self._flag = False
+        return self.frames
@@ -0,0 +1,110 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Named patterns, so the script can choose what to play.
+#
+# A pattern is either a PatternFrames table, such as a file on flash loaded
+# with register_file, or a procedural one: a function taking no arguments
+# that returns a generator of (frame, duration in ms). frames() turns either
+# kind into the same stream of (frame, ms), and both play through the same
+# render loop and scheduler.
+#
+# A procedural pattern may yield the same buffer every time, so each frame has
+# to be used (swap copies it) before the next one is asked for. A duration of
+# 0 means the player's default.
+#
+# frames() allocates a tuple and a memoryview per frame. The render loop uses
+# FrameCursor instead, which steps through a table without allocating at all.
+
+from ledframes import PatternFrames
+from patternparser import PatternParser
+import patternbin
+
+_patterns = {}
+
+def register(name: str, pattern) -> None:
+    _patterns[name] = pattern
+
+# Registers a pattern file, text or binary
+def register_file(name: str, path: str) -> PatternFrames:
+    with open(path, "rb") as f:
+        data = f.read()
+    if patternbin.is_binary(data):
+        frames = patternbin.load(data)
+    else:
+        parser = PatternParser()
+        parser.feed(data)
+        frames = parser.finish()
+    register(name, frames)
+    return frames
+
+def get(name: str):
+    return _patterns.get(name)
+
+def names() -> list:
+    return list(_patterns)
+
+def frames(pattern, default_ms: int):
+    if isinstance(pattern, PatternFrames):
+        for index in range(len(pattern)):
+            frame = pattern[index]
+            duration = pattern.duration(index, default_ms)
+            for _ in range(pattern.repeat(index)):
+                yield frame, duration
+    else:
+        for frame, duration in pattern():
+            yield frame, duration or default_ms
+
+# Plays a pattern round and round, one frame per next(). After next()
+# returns True, frame holds the frame and ms its time.
+#
+# For a PatternFrames table each frame is copied into one buffer made up
+# front, so stepping through it allocates nothing. A procedural pattern
+# allocates whatever its generator does, and a new generator every pass.
+class FrameCursor:
+    def __init__(self, pattern, default_ms: int):
+        self.pattern = pattern
+        self.default_ms = default_ms
+        self.table = isinstance(pattern, PatternFrames)
+        self.frame = bytearray(pattern.frame_bytes) if self.table else None
+        self.ms = default_ms
+        self.index = -1
+        # times the current frame is still to be shown
+        self.left = 0
+        self._frames = None
+
+    # Moves on to the next frame. False if the pattern has no frames.
+    def next(self) -> bool:
+        if self.table:
+            return self._next_table()
+        for _ in range(2):
+            if self._frames is None:
+                self._frames = self.pattern()
+            for frame, duration in self._frames:
+                self.frame = frame
+                self.ms = duration or self.default_ms
+                return True
+            # a pass ended; a pattern that gives nothing twice running is empty
+            self._frames = None
+        return False
+
+    # Repeat counts are at least 1; the parser and patternbin refuse 0
+    def _next_table(self) -> bool:
+        pattern = self.pattern
+        if self.left:
+            self.left -= 1
+            return True
+        if pattern.count == 0:
+            return False
+        index = self.index + 1
+        if index >= pattern.count:
+            index = 0
+        self.index = index
+        self.left = pattern.repeat(index) - 1
+        self.ms = pattern.duration(index, self.default_ms)
+        buf = pattern.buf
+        frame = self.frame
+        start = index * pattern.frame_bytes
+        for i in range(pattern.frame_bytes):
+            frame[i] = buf[start + i]
+        return True
@@ -1,279 +1,288 @@
 # Original code from https://github.com/sbcshop/PICO-CUBE
-from machine import Pin
-import time
-import random
+#
+# The demo patterns as generators. Each yields (frame, duration in ms) where
+# the original slept, and plays through the same frame buffer, refresh timer
+# and scheduler as downloaded patterns. Importing this registers pattern_1 to
+# pattern_10, and "demo" for all of them in turn, with patternregistry.
+#
+# The originals lit voxels by switching layer and column pins on and off and
+# never multiplexed, so every enabled layer showed every lit column. _Cube
+# keeps that pin state and turns it into frames, which keeps the patterns
+# looking as they always did.
+
+import patternregistry
 
 LAYER = [9,8,7,6]#layers
 
 #columns
-GRID_3D = [[17, 16, 0, 1], 
+GRID_3D = [[17, 16, 0, 1],
            [19, 18, 2, 3],
            [21, 20, 4, 5],
            [26, 22, 28, 27]]
 
 
-def enable_layer(layer):
-    a = Pin(LAYER[layer])
-    a.on()
+class _Cube:
+    def __init__(self):
+        self.frame = bytearray(8)
+        # enabled layers, bit per layer
+        self.layers = 0
+        # lit columns, bit x * 4 + z as in ledframes
+        self.columns = 0
 
-def disable_layer(layer):
-    a = Pin(LAYER[layer])
-    a.value(0)
+    def enable_layer(self, layer):
+        self.layers |= 1 << layer
 
-def light_on(x, y, z):
-    enable_layer(y)
-    a = Pin(GRID_3D[x][z])
-    a.on()
-    
-def light_off(x, y, z):
-    enable_layer(y)
-    a = Pin(GRID_3D[x][z])
-    a.off()
+    def disable_layer(self, layer):
+        self.layers &= ~(1 << layer)
 
+    def light_on(self, x, y, z):
+        self.enable_layer(y)
+        self.columns |= 1 << (x * 4 + z)
 
-def reset(t):
-    for x in range(4):
-        for z in range(4):
-            a = Pin(GRID_3D[x][z])
-            a.off()
-            time.sleep(t)
+    def light_off(self, x, y, z):
+        self.enable_layer(y)
+        self.columns &= ~(1 << (x * 4 + z))
 
-def resetlayer():
-    for i in range(0,4):
-        a = Pin(LAYER[i])
-        a.off()
-        time.sleep(0.01)
+    def reset(self):
+        self.columns = 0
 
-for pin in LAYER:
-    Pin(pin, Pin.OUT)
+    # The pins as they are now, as a frame
+    def show(self):
+        frame = self.frame
+        columns = self.columns
+        for layer in range(4):
+            bits = columns if self.layers & (1 << layer) else 0
+            frame[layer * 2] = bits & 0xFF
+            frame[layer * 2 + 1] = bits >> 8
+        return frame
 
-for x in range(4):
-    for z in range(4):
-        Pin(GRID_3D[x][z], Pin.OUT)
+
+def resetlayer(cube):
+    for i in range(0,4):
+        cube.disable_layer(i)
+        yield cube.show(), 10
 
 
-def pattern_1(): #slowly all bulb turn on ahen slowly all bulb turn off
+def pattern_1(cube = None): #slowly all bulb turn on ahen slowly all bulb turn off
+    cube = cube or _Cube()
     for i in range(4):
         for j in range(4):
-            light_on(i,i,j)
-            time.sleep(0.1)
-    reset(0)
-    
+            cube.light_on(i,i,j)
+            yield cube.show(), 100
+    cube.reset()
+
     for i in reversed(range(4)):
         for j in reversed(range(4)):
-            light_on(i,i,j)
-            time.sleep(0.1)
-    reset(0)
+            cube.light_on(i,i,j)
+            yield cube.show(), 100
+    cube.reset()
 
 
-def pattern_2():
+def pattern_2(cube = None):
+    cube = cube or _Cube()
     for j in range(4):
             for k in range(4):
-                light_on(j,j,k)
-            time.sleep(0.1)
+                cube.light_on(j,j,k)
+            yield cube.show(), 100
 
     for j in range(4):
             for k in range(4):
-                light_off(j,j,k)
-            time.sleep(0.1)
-            
-x = 0         
-def pattern_3():
-    x = 0 
+                cube.light_off(j,j,k)
+            yield cube.show(), 100
+
+def pattern_3(cube = None):
+    cube = cube or _Cube()
+    x = 0
     for i in range(3):
-        light_on(x,0,i)
-        time.sleep(0.1)
-        reset(0)
-           
+        cube.light_on(x,0,i)
+        yield cube.show(), 100
+        cube.reset()
+
     for j in range(4):
-        light_on(x,j,3)
-        time.sleep(0.1)
-        reset(0)
-       
+        cube.light_on(x,j,3)
+        yield cube.show(), 100
+        cube.reset()
+
     for k in reversed(range(3)):
-        light_on(x,3,k)
-        time.sleep(0.1)
-        reset(0)
+        cube.light_on(x,3,k)
+        yield cube.show(), 100
+        cube.reset()
 
     for l in reversed(range(3)):
-        light_on(x,l,0)
-        time.sleep(0.1)
-        reset(0)
-        
-    disable_layer(x)    
-    x +=1 
-    if x > 3:
-        x =0
-
-def pattern_4():
+        cube.light_on(x,l,0)
+        yield cube.show(), 100
+        cube.reset()
+
+    cube.disable_layer(x)
+
+def pattern_4(cube = None):
+    cube = cube or _Cube()
     x = 0
     for i in range(4):
         for j in range(4):
-            light_on(x,i,j)
-    time.sleep(0.15)
-    resetlayer()
-    reset(0)
-    
-    x +=1 
-    if x > 3:
-        x =0
-
-def pattern_5():
-    u = 0.2
+            cube.light_on(x,i,j)
+    yield cube.show(), 150
+    yield from resetlayer(cube)
+    cube.reset()
+
+def pattern_5(cube = None):
+    cube = cube or _Cube()
+    u = 200
     for i in range(4):
-            light_on(i,0,i)
-    time.sleep(u)
-    reset(0)
-               
+            cube.light_on(i,0,i)
+    yield cube.show(), u
+    cube.reset()
+
     for j in range(4):
-            light_on(j,j,3)
-    time.sleep(u)
-    reset(0)
-           
+            cube.light_on(j,j,3)
+    yield cube.show(), u
+    cube.reset()
+
     for k in reversed(range(4)):
-            light_on(k,3,k)
-    time.sleep(u)
-    reset(0)
+            cube.light_on(k,3,k)
+    yield cube.show(), u
+    cube.reset()
 
     for l in reversed(range(4)):
-            light_on(l,l,0)
-    time.sleep(u)
-    reset(0)
-            
+            cube.light_on(l,l,0)
+    yield cube.show(), u
+    cube.reset()
 
-def pattern_6():
+
+def pattern_6(cube = None):
+    cube = cube or _Cube()
     for i in reversed(range(4)):
         for j in reversed(range(4)):
-            light_on(i,j,i)
-            time.sleep(0.02)
-            disable_layer(i)
-    reset(0)        
+            cube.light_on(i,j,i)
+            yield cube.show(), 20
+            cube.disable_layer(i)
+    cube.reset()
     for i in range(4):
         for j in range(4):
-            light_on(i,j,i)
-            time.sleep(0.02)
-            disable_layer(i)
+            cube.light_on(i,j,i)
+            yield cube.show(), 20
+            cube.disable_layer(i)
 
-def pattern_7():
+def pattern_7(cube = None):
+    cube = cube or _Cube()
     for i in reversed(range(4)):
             for j in reversed(range(4)):
-                light_on(0,j,i)
-                time.sleep(0.02)
-                disable_layer(i)
-                
-    reset(0)            
+                cube.light_on(0,j,i)
+                yield cube.show(), 20
+                cube.disable_layer(i)
+
+    cube.reset()
     for i in range(4):
             for j in reversed(range(4)):
-                light_on(1,j,i)
-                time.sleep(0.02)
-                disable_layer(i)
-    reset(0)            
+                cube.light_on(1,j,i)
+                yield cube.show(), 20
+                cube.disable_layer(i)
+    cube.reset()
     for i in reversed(range(4)):
             for j in reversed(range(4)):
-                light_on(2,j,i)
-                time.sleep(0.02)
-                disable_layer(i)
-                
-    reset(0)            
+                cube.light_on(2,j,i)
+                yield cube.show(), 20
+                cube.disable_layer(i)
+
+    cube.reset()
     for i in range(4):
             for j in reversed(range(4)):
-                light_on(3,j,i)
-                time.sleep(0.02)
-                disable_layer(i)
-      
-def pattern_8():
+                cube.light_on(3,j,i)
+                yield cube.show(), 20
+                cube.disable_layer(i)
+
+def pattern_8(cube = None):
+    cube = cube or _Cube()
     for i in range(4):
             for j in range(4):
-                light_on(0,i,j)
-             
+                cube.light_on(0,i,j)
+
     for i in range(4):
             for j in range(4):
-                light_on(3,i,j)
-         
-    time.sleep(0.3)
-    disable_layer(0)
-    disable_layer(3)
-    reset(0) 
+                cube.light_on(3,i,j)
+
+    yield cube.show(), 300
+    cube.disable_layer(0)
+    cube.disable_layer(3)
+    cube.reset()
 
     for i in range(4):
             for j in range(4):
-                light_on(1,i,j)
-                #time.sleep(0.02)
-                #disable_layer(i)
+                cube.light_on(1,i,j)
     for i in range(4):
             for j in range(4):
-                light_on(2,i,j)
-                
-    time.sleep(0.3)
-    disable_layer(1)
-    disable_layer(2)
+                cube.light_on(2,i,j)
 
-def pattern_9():
+    yield cube.show(), 300
+    cube.disable_layer(1)
+    cube.disable_layer(2)
+
+def pattern_9(cube = None):
+    cube = cube or _Cube()
     for i in range(4):
                 for j in range(4):
-                    light_on(0,i,j)
-                 
+                    cube.light_on(0,i,j)
+
     for i in range(4):
                 for j in range(4):
-                    light_on(1,i,j)
-             
-    time.sleep(0.3)
-    disable_layer(0)
-    disable_layer(1)
-    reset(0) 
+                    cube.light_on(1,i,j)
+
+    yield cube.show(), 300
+    cube.disable_layer(0)
+    cube.disable_layer(1)
+    cube.reset()
 
     for i in range(4):
                 for j in range(4):
-                    light_on(2,i,j)
-                    #time.sleep(0.02)
-                    #disable_layer(i)
+                    cube.light_on(2,i,j)
     for i in range(4):
                 for j in range(4):
-                    light_on(3,i,j)
-                    
-    time.sleep(0.3)
-    disable_layer(2)
-    disable_layer(3)
-        
-        
-def pattern_10():       
+                    cube.light_on(3,i,j)
+
+    yield cube.show(), 300
+    cube.disable_layer(2)
+    cube.disable_layer(3)
+
+
+def pattern_10(cube = None):
+    cube = cube or _Cube()
     for i in range(4):
             for j in range(4):
                  for k in range(4):
-                    light_on(i,j,k)
-    time.sleep(1)
+                    cube.light_on(i,j,k)
+    yield cube.show(), 1000
     for i in range(4):
             for j in range(4):
                  for k in range(4):
-                    light_off(i,j,k)
-                 time.sleep(0.1)
-while 1:
-    for i in range(5):
-          pattern_1()
-          
-    for i in range(5):      
-          pattern_2()
-          
-    for i in range(5):
-          pattern_3()
-          
-    for i in range(5):      
-          pattern_4()
-          
-    for i in range(5):
-          pattern_5()
-          
-    for i in range(5):
-          pattern_6()
-          
-    for i in range(5):
-          pattern_7()
-          
-    for i in range(5):
-          pattern_8()
-          
-    for i in range(5):
-          pattern_9()
-          
-    for i in range(5):
-          pattern_10()
+                    cube.light_off(i,j,k)
+                 yield cube.show(), 100
+
+PATTERNS = [pattern_1, pattern_2, pattern_3, pattern_4, pattern_5,
+            pattern_6, pattern_7, pattern_8, pattern_9, pattern_10]
+
+# Every pattern five times over, in order, as the demo always ran
+def demo(cube = None):
+    cube = cube or _Cube()
+    for pattern in PATTERNS:
+        for i in range(5):
+            yield from pattern(cube)
+
+for pattern in PATTERNS:
+    patternregistry.register(pattern.__name__, pattern)
+patternregistry.register("demo", demo)
+
+
+if __name__ == "__main__":
+    from ledgpio import CubeOutput
+    from ledrefresh import RefreshEngine
+    from framescheduler import FrameScheduler
+
+    refresh = RefreshEngine(CubeOutput(LAYER, GRID_3D))
+    schedule = FrameScheduler()
+    refresh.start()
+    while 1:
+        for frame, duration in patternregistry.frames(demo, 100):
+            if schedule.advance(duration):
+                continue
+            refresh.swap(frame)
+            schedule.sleep()
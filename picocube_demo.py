@@ -11,45 +11,37 @@ GRID_3D = [[17, 16, 0, 1],
            [26, 22, 28, 27]]
 
 
+# Pins are built once, rather than on every light_on/light_off
+LAYER_PINS = [Pin(pin, Pin.OUT) for pin in LAYER]
+GRID_PINS = [[Pin(pin, Pin.OUT) for pin in row] for row in GRID_3D]
+
+
 def enable_layer(layer):
-    a = Pin(LAYER[layer])
-    a.on()
+    LAYER_PINS[layer].on()
 
 def disable_layer(layer):
-    a = Pin(LAYER[layer])
-    a.off()
+    LAYER_PINS[layer].off()
 
 def light_on(y,x, z,):
     enable_layer(y)
-    a = Pin(GRID_3D[x][z])
-    a.on()
+    GRID_PINS[x][z].on()
     
 def light_off(y, x, z):
     enable_layer(y)
-    a = Pin(GRID_3D[x][z])
-    a.off()
+    GRID_PINS[x][z].off()
     
 
 def reset(t):
     for x in range(4):
         for z in range(4):
-            a = Pin(GRID_3D[x][z])
-            a.off()
+            GRID_PINS[x][z].off()
             time.sleep(t)
             
 def resetlayer():
     for i in range(0,4):
-        a = Pin(LAYER[i])
-        a.off()
+        LAYER_PINS[i].off()
         time.sleep(0.01)
 
-for pin in LAYER:
-    Pin(pin, Pin.OUT)
-
-for x in range(4):
-    for z in range(4):
-        Pin(GRID_3D[x][z], Pin.OUT)
-
 
 
 while 1:
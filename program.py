@@ -3,22 +3,42 @@
 # version 20240703
 
 import machine
-from time import sleep_ms
+from time import sleep_ms, ticks_ms, ticks_diff
 import ntptime
-import requests
+import httppool
 import network
 import rp2
 import micropython
 import socket
 import struct
 import sys
+import gc
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import scriptcache
+from patterncache import conditional_headers
+import metrics
+
+SCRIPT_URL = "https://pi.hole/pico/ledscript{}.txt"
+# Start playing the cached script as soon as the board is up, and bring Wi-Fi
+# up behind it. Only for scripts with an asyncio entry point; the others need
+# the network first.
+INSTANT_ON = True
 
 EndFlag = False
+# Ends the current cycle early, without ending the program, so the next one
+# starts on fresh content
+RestartFlag = False
 
 # Main program
-def program(WIFI_SSID, WIFI_PASSWORD, COLOUR) -> None:
+# With warm_restart, Wi-Fi and the loaded script are kept from one cycle to
+# the next, and the machine is only reset after a failure or BOOTSEL.
+def program(WIFI_SSID, WIFI_PASSWORD, COLOUR, warm_restart: bool = True) -> None:
     global EndFlag
     EndFlag = False
+    metrics.boot(ticks_ms())
     micropython.alloc_emergency_exception_buf(100)
     bootsel_timer = machine.Timer(-1)
     onboard = machine.Pin("LED", machine.Pin.OUT)
@@ -30,12 +50,16 @@ def program(WIFI_SSID, WIFI_PASSWORD, COLOUR) -> None:
             onboard.off()
 
             # Main program
-            wifi = connect_to_wifi(WIFI_SSID, WIFI_PASSWORD)
-            gatewayip = debugnetwork(wifi)
+            if warm_restart:
+                wifi = start_wifi(WIFI_SSID, WIFI_PASSWORD)
+                supervise(wifi, WIFI_SSID, WIFI_PASSWORD, COLOUR)
+            else:
+                wifi = connect_to_wifi(WIFI_SSID, WIFI_PASSWORD)
+                gatewayip = debugnetwork(wifi)
 
-            script = get_script(COLOUR, gatewayip)
+                script, _ = get_script(COLOUR, gatewayip)
 
-            run_script(script, COLOUR, lambda: EndFlag)
+                run_script(script, COLOUR, lambda: EndFlag)
             print("End of program. Restarting")
         finally:
             if (wifi is not None):
@@ -47,6 +71,7 @@ def program(WIFI_SSID, WIFI_PASSWORD, COLOUR) -> None:
                 except:
                     pass
                 print("disconnected")
+            metrics.stop()
 
     except Exception as e:
         print(f"{type(e)} occurred, {e}.")
@@ -65,6 +90,113 @@ def program(WIFI_SSID, WIFI_PASSWORD, COLOUR) -> None:
     return
 
 
+# Runs the script cycle after cycle without resetting. Wi-Fi is only
+# reconnected if it has dropped, and the script is only run again if it has
+# changed, so the patterns it holds in memory survive. Returns when BOOTSEL
+# is pressed; exceptions go to program() for a full reset.
+#
+# wifi may still be connecting. With INSTANT_ON the first cycle runs the
+# cached script without waiting for it, on the cached pattern, and ends once
+# the network is up so that the next cycle fetches fresh content.
+def supervise(wifi, ssid: str, pwd: str, colour: str) -> None:
+    loaded = None
+    booting = INSTANT_ON
+    metrics.serve()
+    while not EndFlag:
+        if booting:
+            booting = False
+            if not wifi.isconnected():
+                loaded = run_cached_script(wifi, ssid, pwd, colour)
+                continue
+        if not wifi.isconnected():
+            if loaded is not None:
+                print("wifi lost, reconnecting")
+                metrics.count("wifi_reconnects")
+            wifi = connect_to_wifi(ssid, pwd)
+        gatewayip = debugnetwork(wifi)
+
+        script, digest = get_script(colour, gatewayip, loaded)
+        if script is not None:
+            exec(script, globals())
+            loaded = digest
+
+        if "ainnerprogram" in globals():
+            asyncio.run(run_async(wifi, ssid, pwd, colour))
+        else:
+            innerprogram(colour, lambda: EndFlag)
+        gc.collect()
+
+
+# First cycle of an instant-on boot: runs the cached script straight from
+# flash while Wi-Fi connects, if it has an asyncio entry point and was
+# fetched for this colour. Returns the script's hash, or None if there was
+# nothing to run.
+def run_cached_script(wifi, ssid: str, pwd: str, colour: str) -> str:
+    start = ticks_ms()
+    meta = scriptcache.load_meta()
+    if meta.get("url") != SCRIPT_URL.format(colour):
+        print("no cached script for this colour, waiting for wifi")
+        return None
+    code = scriptcache.load_cached()
+    if code is None:
+        print("no cached script, waiting for wifi")
+        return None
+    exec(code, globals())
+    if "ainnerprogram" not in globals():
+        print("cached script needs wifi first")
+        return None
+    print(f"instant on: cached script loaded in {ticks_diff(ticks_ms(), start)} ms")
+    asyncio.run(run_async(wifi, ssid, pwd, colour, booting = True))
+    return meta.get("hash")
+
+# Runs the script's asyncio entry point, with BOOTSEL and Wi-Fi watched by
+# tasks of their own. While booting, the cycle ends once Wi-Fi is up.
+async def run_async(wifi, ssid: str, pwd: str, colour: str, booting: bool = False) -> None:
+    global RestartFlag
+    RestartFlag = False
+    helpers = [
+        asyncio.create_task(bootsel_task()),
+        asyncio.create_task(wifi_task(wifi, ssid, pwd, booting)),
+        asyncio.create_task(status_task()),
+    ]
+    try:
+        await ainnerprogram(colour, lambda: EndFlag or RestartFlag)
+    finally:
+        for task in helpers:
+            task.cancel()
+
+async def bootsel_task() -> None:
+    while not EndFlag:
+        bootsel_callback("")
+        await asyncio.sleep(0.1)
+
+# Reconnects in the background if the connection drops. With booting set,
+# the connection start_wifi began is still coming up; the task waits for it
+# and then ends the cycle.
+async def wifi_task(wifi, ssid: str, pwd: str, booting: bool = False) -> None:
+    global RestartFlag
+    started = True
+    while booting:
+        if await aconnect_to_wifi(wifi, ssid, pwd, started):
+            print("network up, switching to fresh content")
+            RestartFlag = True
+            return
+        started = False
+        await asyncio.sleep(10)
+    while True:
+        await asyncio.sleep(10)
+        if not wifi.isconnected():
+            print("wifi lost, reconnecting")
+            metrics.count("wifi_reconnects")
+            await aconnect_to_wifi(wifi, ssid, pwd)
+
+# Answers status requests between frames
+async def status_task() -> None:
+    while True:
+        metrics.poll()
+        await asyncio.sleep(0.1)
+
+
 def wait_until(poll_time: int, timeout: int) -> None:
     global EndFlag
     nchecks = timeout // poll_time
@@ -74,35 +206,85 @@ def wait_until(poll_time: int, timeout: int) -> None:
             return
         nchecks -= 1
 
-# Function to retrieve the LED pattern from a web server
-def get_script(colour : str, gatewayip : str) -> str:
+# Function to retrieve the LED script from a web server
+# Returns the script compiled and ready to run, with its hash. An unchanged
+# script is loaded already compiled from flash, and the cached copy is used
+# if the fetch fails. If the script matches the hash in loaded, it is already
+# running and (None, loaded) is returned instead.
+def get_script(colour : str, gatewayip : str, loaded : str = None) -> tuple:
     print("retrieving script")
-    response = requests.get(f"https://pi.hole/pico/ledscript{colour}.txt")
-    script = response.text
-    print(f"gateway {gatewayip}, script {colour}, {len(script)} bytes.")
+    url = SCRIPT_URL.format(colour)
+    meta = scriptcache.load_meta()
+    headers = conditional_headers(meta) if meta.get("url") == url else {}
 
-    return script
+    start = ticks_ms()
+    try:
+        response = httppool.get(url, headers)
+        status = response.status_code
+        if status == 304:
+            metrics.count("cache_hits")
+            digest = meta.get("hash")
+            if loaded is not None and digest == loaded:
+                metrics.fetch_done(start)
+                print(f"script {colour} unchanged, already running.")
+                return None, loaded
+            code = scriptcache.load_cached()
+            if code is not None:
+                metrics.fetch_done(start)
+                print(f"script {colour} unchanged.")
+                return code, digest
+            response = httppool.get(url)
+            status = response.status_code
+        if status != 200:
+            response.close()
+            raise OSError(f"script request returned {status}")
+        script = response.text
+        metrics.fetch_done(start)
+    except Exception as e:
+        metrics.count("fetch_errors")
+        if loaded is not None:
+            print(f"{e}. keeping current script")
+            return None, loaded
+        code = scriptcache.load_cached()
+        if code is None:
+            raise
+        metrics.count("cache_hits")
+        print(f"{e}. using cached script")
+        return code, scriptcache.load_meta().get("hash")
+
+    print(f"gateway {gatewayip}, script {colour}, {len(script)} bytes.")
+    digest = scriptcache.hash_source(script)
+    if digest == loaded:
+        print(f"script {colour} unchanged, already running.")
+        return None, loaded
+    return scriptcache.get_code(url, script, response.headers), digest
 
 # Here's where we mine the crypto. Sorry, I mean run the website code
-def run_script(script: str, colour: str, endFlagger) -> None:
+def run_script(script, colour: str, endFlagger) -> None:
     exec(script, globals())
     innerprogram(colour, endFlagger)
 
-# Connect to the Wi-Fi network
-def connect_to_wifi(ssid: str, pwd: str) -> network.WLAN:
-    retries = 50
+# Starts connecting to the Wi-Fi network, without waiting
+def start_wifi(ssid: str, pwd: str) -> network.WLAN:
     wifi = network.WLAN(network.STA_IF)
     rp2.country('GB')
     wifi.active(True)
+    wifi.connect(ssid, pwd)
+    return wifi
+
+# Connect to the Wi-Fi network
+def connect_to_wifi(ssid: str, pwd: str) -> network.WLAN:
+    retries = 50
+    wifi = start_wifi(ssid, pwd)
 
     isConnected = False
-    wifi.connect(ssid, pwd)
     while True:
         print("wifi connecting")
         retries -= 1
         isConnected = wifi.isconnected()
         if isConnected:
             print("wifi connected")
+            metrics.milestone("online_ms")
             wifi.config(pm=network.WLAN.PM_POWERSAVE)
             print("wifi successfully configured")
             return wifi
@@ -112,6 +294,21 @@ def connect_to_wifi(ssid: str, pwd: str) -> network.WLAN:
 
     raise Exception("wifi not connected")
 
+# connect_to_wifi for the asyncio runtime, on an existing WLAN. started
+# waits for a connection that is already under way.
+async def aconnect_to_wifi(wifi, ssid: str, pwd: str, started: bool = False) -> bool:
+    if not started:
+        wifi.connect(ssid, pwd)
+    for _ in range(50):
+        if wifi.isconnected():
+            print("wifi connected")
+            metrics.milestone("online_ms")
+            wifi.config(pm=network.WLAN.PM_POWERSAVE)
+            return True
+        await asyncio.sleep(0.5)
+    print("wifi not connected")
+    return False
+
 def debugnetwork(wifi)-> str:
     ipaddr: str
     subnet : str
@@ -0,0 +1,142 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Flash cache for the remotely fetched LED script.
+#
+# The script source is kept alongside its SHA-256 and a compiled copy. The
+# compiled copy is a marshalled code object (MicroPython 1.23+ with marshal,
+# or CPython), so an unchanged script is run without compiling it again.
+#
+# The compiled file starts with a magic, the hash of the source it was built
+# from and the hash of its own payload. Anything that doesn't check out is
+# thrown away and the source compiled instead.
+
+import os
+import json
+import hashlib
+import binascii
+from patterncache import CACHE_DIR, get_header
+
+try:
+    import marshal
+except ImportError:
+    marshal = None
+
+SOURCE_PATH = f"{CACHE_DIR}/script.txt"
+CODE_PATH = f"{CACHE_DIR}/script.mpy"
+META_PATH = f"{CACHE_DIR}/script.meta"
+
+_MAGIC = b"LSC1"
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+# Hex SHA-256 of a script, as kept in the cache metadata
+def hash_source(source: str) -> str:
+    return binascii.hexlify(_digest(source.encode())).decode()
+
+def _write(path: str, data: bytes) -> None:
+    try:
+        os.mkdir(CACHE_DIR)
+    except OSError:
+        pass
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.rename(path + ".tmp", path)
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def load_meta() -> dict:
+    try:
+        with open(META_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _compile(source: str):
+    return compile(source, "ledscript", "exec")
+
+# Loads the compiled script for a given source hash, or None
+def _load_code(digest: bytes):
+    if marshal is None:
+        return None
+    try:
+        with open(CODE_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    try:
+        header = len(_MAGIC) + 64
+        if data[:len(_MAGIC)] != _MAGIC or data[len(_MAGIC):len(_MAGIC) + 32] != digest:
+            return None
+        payload = data[header:]
+        if data[len(_MAGIC) + 32:header] != _digest(payload):
+            raise ValueError("checksum mismatch")
+        return marshal.loads(payload)
+    except Exception as e:
+        print(f"compiled script unusable: {e}")
+        _remove(CODE_PATH)
+        return None
+
+def _store_code(code, digest: bytes) -> None:
+    if marshal is None:
+        return
+    try:
+        payload = marshal.dumps(code)
+        _write(CODE_PATH, _MAGIC + digest + _digest(payload) + payload)
+    except Exception as e:
+        print(f"compiled script not cached: {e}")
+
+# Returns a code object for source, compiling only if it has changed
+def get_code(url: str, source: str, headers):
+    encoded = source.encode()
+    digest = _digest(encoded)
+    meta = load_meta()
+    if meta.get("hash") == binascii.hexlify(digest).decode():
+        code = _load_code(digest)
+        if code is not None:
+            print("using compiled script from cache")
+            return code
+
+    code = _compile(source)
+    try:
+        _write(SOURCE_PATH, encoded)
+        _store_code(code, digest)
+        meta = {
+            "url": url,
+            "hash": binascii.hexlify(digest).decode(),
+            "etag": get_header(headers, "ETag"),
+            "last_modified": get_header(headers, "Last-Modified"),
+        }
+        _write(META_PATH, json.dumps(meta).encode())
+    except OSError as e:
+        print(f"script not cached: {e}")
+    return code
+
+# The last good script, for when it is unchanged or can't be fetched.
+# Returns None if there isn't one.
+def load_cached():
+    meta = load_meta()
+    if not meta.get("hash"):
+        return None
+    digest = binascii.unhexlify(meta["hash"])
+    code = _load_code(digest)
+    if code is not None:
+        return code
+
+    try:
+        with open(SOURCE_PATH, "rb") as f:
+            encoded = f.read()
+    except OSError:
+        return None
+    if _digest(encoded) != digest:
+        print("cached script corrupt")
+        return None
+    code = _compile(encoded.decode())
+    _store_code(code, digest)
+    return code
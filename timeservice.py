@@ -0,0 +1,301 @@
+# License: MIT
+# Credit: https://github.com/oshah81/
+
+# Local day/night scheduling.
+#
+# The RTC is set once from NTP, or from the pi.hole timestr endpoint if NTP
+# can't be reached, then again every few hours to correct drift. In between,
+# local time and the night windows are worked out from the RTC with the UK
+# daylight saving rules, so checking for night costs no network round trip.
+# The endpoint is only used as a clock; its offset is taken out to get UTC.
+
+import time
+import json
+import machine
+import ntptime
+import httppool
+import asynchttp
+
+RESYNC_MS = 4 * 3600 * 1000
+
+# Offset from UTC outside daylight saving, and whether daylight saving applies
+# (UK/EU rule: last Sunday in March to last Sunday in October, 01:00 UTC)
+STANDARD_OFFSET = 0
+USE_DST = True
+
+# Night window per colour, as (start hour, end hour) local time
+NIGHT_HOURS = {
+    # blue turns off one hour earlier
+    "C3": (22, 8),
+}
+DEFAULT_NIGHT_HOURS = (23, 7)
+
+_synced = False
+# ms since the last sync, added up a step at a time in _since_sync(), as a
+# single ticks_diff wraps after about 6 days
+_since = 0
+_checked_at = 0
+
+
+# Days since 1970-01-01 for a date, without relying on the port's epoch
+# (Howard Hinnant's days_from_civil)
+def days_from_civil(year: int, month: int, day: int) -> int:
+    y = year - 1 if month <= 2 else year
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (month - 3 if month > 2 else month + 9) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+# (year, month, day) for days since 1970-01-01
+def civil_from_days(days: int) -> tuple:
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    return (yoe + era * 400 + (1 if month <= 2 else 0), month, day)
+
+def epoch_seconds(year: int, month: int, day: int, hour: int = 0, minute: int = 0, second: int = 0) -> int:
+    return days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+
+# Day of the month of the last Sunday
+def last_sunday(year: int, month: int) -> int:
+    next_month = days_from_civil(year + 1, 1, 1) if month == 12 else days_from_civil(year, month + 1, 1)
+    last = next_month - 1
+    # 1970-01-01 was a Thursday; count weekdays from Sunday
+    return civil_from_days(last)[2] - (last + 4) % 7
+
+# Seconds since 1970 UTC, from the RTC
+def utc_now() -> int:
+    t = time.gmtime()
+    return epoch_seconds(t[0], t[1], t[2], t[3], t[4], t[5])
+
+def utc_offset(utc: int) -> int:
+    if not USE_DST:
+        return STANDARD_OFFSET
+    year = civil_from_days(utc // 86400)[0]
+    start = epoch_seconds(year, 3, last_sunday(year, 3), 1)
+    end = epoch_seconds(year, 10, last_sunday(year, 10), 1)
+    return STANDARD_OFFSET + (3600 if start <= utc < end else 0)
+
+def _set_rtc(utc: int) -> None:
+    year, month, day = civil_from_days(utc // 86400)
+    secs = utc % 86400
+    # RTC weekday is 0 for Monday
+    weekday = (utc // 86400 + 3) % 7
+    machine.RTC().datetime((year, month, day, weekday, secs // 3600, secs // 60 % 60, secs % 60, 0))
+
+def _set_from_timestr(response_txt: str) -> None:
+    json_struct = json.loads(response_txt)
+    if int(json_struct["status"]) != 0:
+        raise OSError("datetime api returned error")
+    year, month, day, hour, minute, second, _, tz_offset_seconds = parse_isoformat(json_struct["datestr"])
+    _set_rtc(epoch_seconds(year, month, day, hour, minute, second) - tz_offset_seconds)
+
+def _synced_now() -> None:
+    global _synced, _since, _checked_at
+    _synced = True
+    _since = 0
+    _checked_at = time.ticks_ms()
+    print(f"clock synced, UTC offset {utc_offset(utc_now()) // 60} minutes")
+
+# Only right if called at least every few days; the night checks call
+# needs_sync every few hours at most
+def _since_sync() -> int:
+    global _since, _checked_at
+    now = time.ticks_ms()
+    _since += time.ticks_diff(now, _checked_at)
+    _checked_at = now
+    return _since
+
+def needs_sync() -> bool:
+    return not _synced or _since_sync() > RESYNC_MS
+
+# Sets the RTC from NTP, falling back to the timestr endpoint at time_url
+def sync(time_url: str) -> None:
+    try:
+        ntptime.settime()
+    except Exception as e:
+        print(f"ntp failed: {e}, using {time_url}")
+        response = httppool.get(time_url)
+        _set_from_timestr(response.text)
+    _synced_now()
+
+# sync for the asyncio runtime. NTP is a single short UDP exchange, so only
+# the endpoint fallback is made asynchronous.
+async def async_sync(time_url: str) -> None:
+    try:
+        ntptime.settime()
+    except Exception as e:
+        print(f"ntp failed: {e}, using {time_url}")
+        response = await asynchttp.get(time_url)
+        try:
+            response_txt = await response.text()
+        finally:
+            await response.close()
+        _set_from_timestr(response_txt)
+    _synced_now()
+
+# Syncs if due. A failed resync is only an error if the clock was never set.
+def ensure_synced(time_url: str) -> None:
+    if not needs_sync():
+        return
+    try:
+        sync(time_url)
+    except Exception as e:
+        if not _synced:
+            raise
+        print(f"clock resync failed: {e}")
+
+async def async_ensure_synced(time_url: str) -> None:
+    if not needs_sync():
+        return
+    try:
+        await async_sync(time_url)
+    except Exception as e:
+        if not _synced:
+            raise
+        print(f"clock resync failed: {e}")
+
+# Local seconds since midnight
+def local_seconds(utc: int = None) -> int:
+    if utc is None:
+        utc = utc_now()
+    return (utc + utc_offset(utc)) % 86400
+
+def is_night(colour: str, utc: int = None) -> bool:
+    start, end = NIGHT_HOURS.get(colour, DEFAULT_NIGHT_HOURS)
+    hour = local_seconds(utc) // 3600
+    if start > end:
+        return hour >= start or hour < end
+    return start <= hour < end
+
+# Milliseconds until the next switch between day and night
+def ms_until_change(colour: str, utc: int = None) -> int:
+    if utc is None:
+        utc = utc_now()
+    start, end = NIGHT_HOURS.get(colour, DEFAULT_NIGHT_HOURS)
+    now = local_seconds(utc)
+    boundary = end if is_night(colour, utc) else start
+    wait = (boundary * 3600 - now) % 86400
+    # a daylight saving change in between moves the boundary by the difference
+    wait -= utc_offset(utc + wait) - utc_offset(utc)
+    return max(wait, 1) * 1000
+
+
+# datetime reimplementation:
+#
+# All because Micropython doesn't have datetime.fromisoformat().
+#
+# Fine I'll vibe code it myself.
+#
+# prompt from Claude AI:
+# I need to parse a ISO 8601 datetime that was sent from a python web server using datetime.toisoformat(). And in the client,
+# I need to parse out that datetime to extract the (timezone corrected) hour from it. However, the client is using Micropython,
+# where datetime.fromisoformat() is not available. That means you need to rebuild datetime.fromisoformat() from scratch - but you
+# can take shortcuts in validation because I can guarantee that the only datetime you need to read is one generated from a full
+# python datetime.toisoformat()
+# further commands dealt with standardising comments, removing the re import and not using ljust (also unavailable in micropython).
+
+def parse_isoformat(iso_string):
+    # Parse ISO 8601 datetime string generated by Python's datetime.isoformat()
+    # Returns a tuple: (year, month, day, hour, minute, second, microsecond, tz_offset_seconds)
+    
+    # Remove 'T' separator and split date/time parts
+    if 'T' in iso_string:
+        date_part, time_part = iso_string.split('T')
+    else:
+        # Handle space separator (alternative format)
+        date_part, time_part = iso_string.split(' ')
+    
+    # Parse date part: YYYY-MM-DD
+    year, month, day = map(int, date_part.split('-'))
+    
+    # Handle timezone offset
+    tz_offset_seconds = 0
+    if '+' in time_part:
+        time_part, tz_part = time_part.rsplit('+', 1)
+        tz_offset_seconds = parse_timezone_offset('+' + tz_part)
+    elif time_part.count('-') > 0 and time_part.rfind('-') > 2:  # Avoid date separator
+        time_part, tz_part = time_part.rsplit('-', 1)
+        tz_offset_seconds = parse_timezone_offset('-' + tz_part)
+    elif time_part.endswith('Z'):
+        time_part = time_part[:-1]
+        tz_offset_seconds = 0
+    
+    # Parse time part: HH:MM:SS[.ffffff]
+    time_components = time_part.split(':')
+    hour = int(time_components[0])
+    minute = int(time_components[1])
+    
+    # Handle seconds and microseconds
+    second = 0
+    microsecond = 0
+    if len(time_components) > 2:
+        sec_part = time_components[2]
+        if '.' in sec_part:
+            sec_str, microsec_str = sec_part.split('.')
+            second = int(sec_str)
+            # Pad or truncate to 6 digits
+            while len(microsec_str) < 6:
+                microsec_str += '0'
+            microsec_str = microsec_str[:6]
+            microsecond = int(microsec_str)
+        else:
+            second = int(sec_part)
+    
+    return (year, month, day, hour, minute, second, microsecond, tz_offset_seconds)
+
+def parse_timezone_offset(tz_str):
+    # Parse timezone offset string like +05:30 or -08:00
+    # Returns offset in seconds
+    
+    if tz_str in ('Z', '+00:00', '-00:00'):
+        return 0
+    
+    sign = 1 if tz_str[0] == '+' else -1
+    tz_str = tz_str[1:]  # Remove sign
+    
+    if ':' in tz_str:
+        hours, minutes = map(int, tz_str.split(':'))
+    else:
+        # Handle formats like +0530 or +05
+        if len(tz_str) == 4:
+            hours = int(tz_str[:2])
+            minutes = int(tz_str[2:])
+        elif len(tz_str) == 2:
+            hours = int(tz_str)
+            minutes = 0
+        else:
+            hours = int(tz_str)
+            minutes = 0
+    
+    return sign * (hours * 3600 + minutes * 60)
+
+def get_timezone_corrected_hour(iso_string):
+    # Extract the timezone-corrected hour from an ISO 8601 datetime string
+    # Returns the hour (0-23) adjusted for the timezone
+    
+    year, month, day, hour, minute, second, microsecond, tz_offset_seconds = parse_isoformat(iso_string)
+    
+    # Convert to total minutes for easier calculation
+    total_minutes = hour * 60 + minute
+    
+    # Adjust for timezone (convert offset to minutes)
+    tz_offset_minutes = tz_offset_seconds // 60
+    total_minutes += tz_offset_minutes
+    
+    # Handle day rollover
+    total_minutes = total_minutes % (24 * 60)
+    if total_minutes < 0:
+        total_minutes += 24 * 60
+    
+    # Extract the corrected hour
+    corrected_hour = total_minutes // 60
+    
+    return corrected_hour
+